@@ -75,6 +75,83 @@ class TODOCommand(SetupBuildCommand):
                             line_no += 1
 
 
+class BuildTablesCommand(SetupBuildCommand):
+    """
+    Generate the hand evaluator's lookup tables file.
+    """
+
+    description = "writes the hand evaluator lookup tables"
+
+    def run(self):
+        """
+        Writes src/rounder/evaluator.tables, which rounder.evaluator maps at
+        runtime instead of generating the tables in every process.
+        """
+        import sys
+        sys.path.insert(0, os.path.join(self._dir, 'src'))
+        from rounder import evaluator
+
+        path = os.path.join(self._dir, 'src', 'rounder', 'evaluator.tables')
+        evaluator.write_tables(path)
+        print "wrote %s" % path
+
+
+class BuildPreflopCommand(Command):
+    """
+    Generate the heads up preflop equity table.
+    """
+
+    description = "writes the preflop equity table (needs numpy)"
+
+    user_options = [
+        ('samples=', 's', "sampled runouts per class matchup [20000]"),
+        ('processes=', 'j', "worker processes [one per CPU]"),
+        ('validate=', 'v', "matchups checked by full enumeration [3]"),
+        ('seed=', None, "random seed [0]"),
+    ]
+
+    def initialize_options(self):
+        self._dir = os.getcwd()
+        self.samples = 20000
+        self.processes = None
+        self.validate = 3
+        self.seed = 0
+
+    def finalize_options(self):
+        self.samples = int(self.samples)
+        if self.processes is not None:
+            self.processes = int(self.processes)
+        self.validate = int(self.validate)
+        self.seed = int(self.seed)
+
+    def run(self):
+        """
+        Writes src/rounder/preflop.equity after checking a few of its
+        entries against exhaustive enumeration.
+        """
+        import random
+        import sys
+        sys.path.insert(0, os.path.join(self._dir, 'src'))
+        from rounder import preflop
+
+        table = preflop.generate_table(self.samples, self.processes,
+                                       self.seed)
+
+        # Allow for four standard errors of sampling noise:
+        tolerance = 4 * 0.5 / self.samples ** 0.5
+        failures = preflop.validate_table(table, self.validate, tolerance,
+                self.processes, random.Random(self.seed))
+        for first, second, value, expected in failures:
+            print "%s vs %s: table %.4f, exact %.4f" % (first, second,
+                                                        value, expected)
+        if failures:
+            raise SystemExit("preflop table failed validation")
+
+        path = os.path.join(self._dir, 'src', 'rounder', 'preflop.equity')
+        preflop.write_table(table, path)
+        print "wrote %s" % path
+
+
 setup(name="rounder",
     version='0.0.1',
     description='Poker for the Gnome desktop.',
@@ -92,17 +169,18 @@ setup(name="rounder",
         'rounder.ui.gtk': 'src/rounder/ui/gtk',
         'rounder.ui.curses': 'src/rounder/ui/curses',
     },
-    package_data={'rounder.ui.gtk': ['data/*.glade', 'data/*.png',
-        'data/*.svg']},
+    package_data={'rounder': ['evaluator.tables', 'preflop.equity'],
+        'rounder.ui.gtk': ['data/*.glade', 'data/*.png', 'data/*.svg']},
     scripts=['bin/rounder', 'bin/rounder-server',
-        'bin/rounder-randombot'],
+        'bin/rounder-randombot', 'bin/rounder-simulate'],
     # TODO: This sucks.
     #data_files=[('../etc/gconf/schemas', ['data/rounder.schema'])],
 
     # Only valid if we're using setuptools, which we're not due to problems
     # loading glade files inside eggs:
     #test_suite='runtests.suite'
-    cmdclass = {'todo': TODOCommand},
+    cmdclass = {'todo': TODOCommand, 'build_tables': BuildTablesCommand,
+        'build_preflop': BuildPreflopCommand},
 
 )
 
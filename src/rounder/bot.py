@@ -27,6 +27,7 @@ logger = getLogger("rounder.ui.bot")
 from rounder.ui.client import Client, ClientTable
 from rounder.action import *
 from rounder.network.client import RounderNetworkClient
+from rounder.network.codec import CEREALIZER
 
 
 class RandomBot(Client):
@@ -37,14 +38,15 @@ class RandomBot(Client):
     open seat, and proceeds to act completely randomly.
     """
 
-    def __init__(self, host, port, username, password):
+    def __init__(self, host, port, username, password,
+            wire_format=CEREALIZER):
 
         self.host = host
         self.port = port
         self.username = username
         self.password = password
 
-        self.client = RounderNetworkClient(self)
+        self.client = RounderNetworkClient(self, wire_format)
         self.client.connect(self.host, self.port, self.username,
             self.password)
 
@@ -0,0 +1,105 @@
+#   Rounder - Poker for the GNOME Desktop
+#
+#   Copyright (C) 2009 Devan Goodwin <dgoodwin@dangerouslyinc.com>
+#   Copyright (C) 2009 James Bowes <jbowes@dangerouslyinc.com>
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+#   02110-1301  USA
+
+""" Rounder module providing a bounded least recently used cache. """
+
+# Indexes into the linked list entries:
+PREV, NEXT, KEY, VALUE = 0, 1, 2, 3
+
+
+class LRUCache(object):
+
+    """
+    Mapping of at most maxsize entries which evicts the least recently used
+    entry when full. Entries live in a circular doubly linked list so both
+    lookups and evictions are constant time.
+
+    Keeps hit, miss and eviction counters for monitoring.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.clear()
+
+    def clear(self):
+        """ Drop every entry and reset the counters. """
+        self.__entries = {}
+        self.__root = []
+        self.__root[:] = [self.__root, self.__root, None, None]
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def __contains__(self, key):
+        return key in self.__entries
+
+    def get(self, key, default=None):
+        """
+        Return the value for key, marking it as the most recently used, or
+        default if it is not cached.
+        """
+        entry = self.__entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+
+        self.hits += 1
+        # Unlink and move to the most recently used end:
+        entry[PREV][NEXT] = entry[NEXT]
+        entry[NEXT][PREV] = entry[PREV]
+        root = self.__root
+        last = root[PREV]
+        last[NEXT] = root[PREV] = entry
+        entry[PREV] = last
+        entry[NEXT] = root
+        return entry[VALUE]
+
+    def put(self, key, value):
+        """ Cache the value for key, evicting the oldest entry if full. """
+        entry = self.__entries.get(key)
+        if entry is not None:
+            entry[VALUE] = value
+            return
+
+        root = self.__root
+        if len(self.__entries) >= self.maxsize:
+            oldest = root[NEXT]
+            oldest[NEXT][PREV] = root
+            root[NEXT] = oldest[NEXT]
+            del self.__entries[oldest[KEY]]
+            self.evictions += 1
+
+        last = root[PREV]
+        entry = [last, root, key, value]
+        last[NEXT] = root[PREV] = entry
+        self.__entries[key] = entry
+
+    def stats(self):
+        """ Return the counters and current size as a dict. """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': len(self.__entries),
+            'maxsize': self.maxsize,
+        }
@@ -92,12 +92,37 @@ def get_rank_display(intRank):
     return RANK_TO_STRING[intRank]
 
 
+def get_card_id(card):
+    """
+    Return the 0 - 51 id for a Card, a card id or a card string such as
+    'Ah', 'ah' or '10d'.
+    """
+    if isinstance(card, Card):
+        return card.id
+    elif isinstance(card, int):
+        return card
+    return Card.parse(card).id
+
+
+def _card_id(rank, suit):
+    """ Canonical 0 - 51 id for the given integer rank and Suit. """
+    return suit.uniqueInt * 13 + rank - 2
+
+
 class Card(object):
-    """ Standard playing card. """
+    """
+    Standard playing card.
+
+    Only 52 Card objects ever exist, one per id in CARDS. Constructing a card
+    returns the existing object, so cards are immutable and can be compared
+    by identity.
+    """
 
-    def __init__(self, rank, suit=None):
+    __slots__ = ('id', 'rank', 'suit')
+
+    def __new__(cls, rank, suit=None):
         """
-        Create a standard playing card. Card can be created in a number
+        Look up a standard playing card. Card can be created in a number
         of ways, the following are all valid:
 
            (14, 'c')
@@ -106,14 +131,42 @@ class Card(object):
            ('Ac')
         """
         if suit == None:
-            rank = str(rank)
-            if (len(rank) < 2):
-                raise RounderException("Bad card: " + rank)
-            suit = rank[-1:]
-            rank = rank[:-1]
+            return cls.parse(rank)
+
+        return CARDS[_card_id(cls._parse_rank(rank), cls._parse_suit(suit))]
 
-        self.rank = self._parse_rank(rank)
-        self.suit = self._parse_suit(suit)
+    @staticmethod
+    def from_id(card_id):
+        """ Return the card with the given 0 - 51 id. """
+        return CARDS[card_id]
+
+    @staticmethod
+    def parse(card_string):
+        """
+        Return the card for a string such as 'Ac', 'ac' or '10c'. Results
+        are cached so repeated parsing is a single dictionary lookup.
+        """
+        try:
+            return _PARSE_CACHE[card_string]
+        except (KeyError, TypeError):
+            pass
+
+        rank = str(card_string)
+        if (len(rank) < 2):
+            raise RounderException("Bad card: " + rank)
+        suit = rank[-1:].lower()
+        rank = rank[:-1].upper()
+        if rank == '10':
+            rank = 'T'
+
+        card = CARDS[_card_id(Card._parse_rank(rank),
+            Card._parse_suit(suit))]
+        if isinstance(card_string, str):
+            _PARSE_CACHE[card_string] = card
+        return card
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Cards are immutable.")
 
     def __repr__(self):
         return str(self)
@@ -152,6 +205,9 @@ class Card(object):
             else:
                 return 1
 
+    def __hash__(self):
+        return self.id
+
     def get_rank_display(self):
         return get_rank_display(self.rank)
 
@@ -160,3 +216,18 @@ class Card(object):
 
     def get_long_suit_display(self):
         return self.suit.longDisplay
+
+
+def _create_card(card_id):
+    """ Create one of the 52 interned cards, used only to build CARDS. """
+    card = object.__new__(Card)
+    object.__setattr__(card, 'id', card_id)
+    object.__setattr__(card, 'rank', card_id % 13 + 2)
+    object.__setattr__(card, 'suit', ALL_SUITS[card_id / 13])
+    return card
+
+# All 52 cards indexed by id, in the same order as a new Deck:
+CARDS = tuple([_create_card(card_id) for card_id in range(52)])
+
+# Card strings already seen by Card.parse:
+_PARSE_CACHE = {}
@@ -0,0 +1,183 @@
+#   Rounder - Poker for the GNOME Desktop
+#
+#   Copyright (C) 2009 Devan Goodwin <dgoodwin@dangerouslyinc.com>
+#   Copyright (C) 2009 James Bowes <jbowes@dangerouslyinc.com>
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+#   02110-1301  USA
+
+""" Rounder module representing a set of cards as a bitmask. """
+
+from rounder.card import CARDS, get_card_id
+
+# Every card in the deck:
+FULL_DECK_MASK = (1 << 52) - 1
+
+# 13 bits, one per rank, for each suit:
+SUIT_MASK = 0x1FFF
+
+
+def card_mask(cards):
+    """
+    Return the bitmask for the given Cards, card ids or card strings. Bit n
+    is set for the card with id n.
+    """
+    mask = 0
+    for card in cards:
+        mask |= 1 << get_card_id(card)
+    return mask
+
+
+def popcount(mask):
+    """ Number of bits set in the given mask. """
+    return bin(mask).count('1')
+
+
+def mask_ids(mask):
+    """ Return the card ids set in the given mask, lowest first. """
+    ids = []
+    while mask:
+        low_bit = mask & -mask
+        ids.append(low_bit.bit_length() - 1)
+        mask ^= low_bit
+    return ids
+
+
+def canonical_mask(mask):
+    """
+    Return the suit isomorphic canonical form of a card mask: the suits are
+    relabelled so their rank masks are in descending order. Any two masks
+    differing only by a permutation of suits share a canonical mask, which is
+    itself a valid card mask holding the same ranks.
+    """
+    suits = [mask & SUIT_MASK, (mask >> 13) & SUIT_MASK,
+             (mask >> 26) & SUIT_MASK, mask >> 39]
+    suits.sort(reverse=True)
+    return suits[0] | suits[1] << 13 | suits[2] << 26 | suits[3] << 39
+
+
+def canonical_key(pocket_mask, board_mask):
+    """
+    Return a suit isomorphic key for a pocket and board, distinguishing
+    which cards are in the pocket. Pockets and boards differing only by a
+    permutation of suits share a key.
+    """
+    suits = []
+    for shift in (0, 13, 26, 39):
+        suits.append(((board_mask >> shift) & SUIT_MASK) << 13 |
+                     ((pocket_mask >> shift) & SUIT_MASK))
+    suits.sort(reverse=True)
+    return suits[0] | suits[1] << 26 | suits[2] << 52 | suits[3] << 78
+
+
+class CardSet(object):
+
+    """
+    Immutable set of cards stored as a single 52 bit integer, bit n being set
+    for the card with id n. Cards of one suit occupy 13 consecutive bits, so
+    a suit's ranks can be read straight out of the mask.
+    """
+
+    __slots__ = ('mask', )
+
+    def __init__(self, cards=(), mask=0):
+        """
+        Create a set from any mix of Cards, card ids and card strings, or
+        from an existing mask.
+        """
+        self.mask = mask | card_mask(cards)
+
+    @staticmethod
+    def full_deck():
+        """ Return a set of all 52 cards. """
+        return CardSet(mask=FULL_DECK_MASK)
+
+    def __contains__(self, card):
+        return bool(self.mask & (1 << get_card_id(card)))
+
+    def __len__(self):
+        return popcount(self.mask)
+
+    def __nonzero__(self):
+        return self.mask != 0
+
+    def __iter__(self):
+        for card_id in mask_ids(self.mask):
+            yield CARDS[card_id]
+
+    def __or__(self, other):
+        return CardSet(mask=self.mask | other.mask)
+
+    def __and__(self, other):
+        return CardSet(mask=self.mask & other.mask)
+
+    def __sub__(self, other):
+        return CardSet(mask=self.mask & ~other.mask)
+
+    def __xor__(self, other):
+        return CardSet(mask=self.mask ^ other.mask)
+
+    def __invert__(self):
+        return CardSet(mask=FULL_DECK_MASK & ~self.mask)
+
+    def __eq__(self, other):
+        return isinstance(other, CardSet) and self.mask == other.mask
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.mask)
+
+    def __str__(self):
+        return ' '.join([str(card) for card in self])
+
+    def __repr__(self):
+        return "CardSet(%s)" % str(self)
+
+    def union(self, other):
+        return self | other
+
+    def intersection(self, other):
+        return self & other
+
+    def difference(self, other):
+        return self - other
+
+    def isdisjoint(self, other):
+        return self.mask & other.mask == 0
+
+    def issubset(self, other):
+        return self.mask & ~other.mask == 0
+
+    def add(self, card):
+        """ Return a new set with the given card added. """
+        return CardSet(mask=self.mask | (1 << get_card_id(card)))
+
+    def remove(self, card):
+        """ Return a new set without the given card. """
+        return CardSet(mask=self.mask & ~(1 << get_card_id(card)))
+
+    def ids(self):
+        """ Return the card ids in this set, lowest first. """
+        return mask_ids(self.mask)
+
+    def cards(self):
+        """ Return the Cards in this set, ordered by id. """
+        return [CARDS[card_id] for card_id in mask_ids(self.mask)]
+
+    def suit_mask(self, suit):
+        """ Return the 13 bit rank mask for the given Suit. """
+        return (self.mask >> (suit.uniqueInt * 13)) & SUIT_MASK
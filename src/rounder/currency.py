@@ -22,13 +22,224 @@
 
 from rounder.fixedpoint import FixedPoint, DEFAULT_PRECISION
 
+# Currency instances for 0 up to this many cents are shared, see _from_cents:
+CACHE_CENTS = 100000
 
-class Currency(FixedPoint):
 
+def _round_quotient(dividend, divisor):
     """
-    Representation of a monetary amount. Simple subclass of FixedPoint because
-    I prefer the name. :)
+    Divide two integers, rounding to nearest and halves to even as
+    FixedPoint does.
     """
+    if divisor < 0:
+        dividend, divisor = -dividend, -divisor
+    quotient, remainder = divmod(dividend, divisor)
+    c = cmp(remainder << 1, divisor)
+    if c > 0 or (c == 0 and (quotient & 1) == 1):
+        quotient += 1
+    return quotient
 
-    def __init__(self, value=0, precision=DEFAULT_PRECISION):
-        FixedPoint.__init__(self, value, precision)
+
+def _to_cents(value):
+    """
+    Return a value as a whole number of cents, converting ints exactly and
+    anything else the way FixedPoint would, with rounding to the cent.
+    """
+    if isinstance(value, Currency):
+        return value.cents
+    if isinstance(value, (int, long)):
+        return value * 100
+    if isinstance(value, float):
+        # Near whole cents the float's exact binary value rounds to the
+        # same cent, anything else takes FixedPoint's exact conversion:
+        cents = value * 100
+        rounded = round(cents)
+        if abs(cents - rounded) < 0.000001:
+            return int(rounded)
+    return FixedPoint(value, DEFAULT_PRECISION).n
+
+
+class Currency(object):
+
+    """
+    Representation of a monetary amount, an immutable whole number of cents.
+
+    Accepts the same values as FixedPoint, which it used to subclass: ints,
+    longs, floats, strings and other Currency. Arithmetic between amounts
+    is exact integer arithmetic, division and multiplication by another
+    amount round to the cent like FixedPoint does. Amounts up to
+    CACHE_CENTS are shared rather than allocated anew.
+    """
+
+    __slots__ = ('cents', )
+
+    def __new__(cls, value=0, precision=DEFAULT_PRECISION):
+        if precision != DEFAULT_PRECISION:
+            raise ValueError("Currency is always kept to %d decimal places" %
+                DEFAULT_PRECISION)
+        if type(value) is Currency:
+            return value
+        return _from_cents(_to_cents(value))
+
+    @staticmethod
+    def from_cents(cents):
+        """ Return the amount for a whole number of cents. """
+        return _from_cents(cents)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Currency is immutable.")
+
+    def get_precision(self):
+        return DEFAULT_PRECISION
+
+    precision = property(get_precision, None)
+
+    def __str__(self):
+        whole, cents = divmod(abs(self.cents), 100)
+        return "%s%d.%02d" % ("-"[:self.cents < 0], whole, cents)
+
+    def __repr__(self):
+        return "Currency('%s')" % self
+
+    def __reduce__(self):
+        return (_from_cents, (self.cents, ))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    copy = __copy__
+
+    def __hash__(self):
+        # Equal to the hash of an equal int or float:
+        whole, cents = divmod(self.cents, 100)
+        if cents:
+            return hash(self.cents / 100.0)
+        return hash(whole)
+
+    def __eq__(self, other):
+        try:
+            return self.cents == _to_cents(other)
+        except (TypeError, ValueError):
+            return False
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __lt__(self, other):
+        return self.cents < _to_cents(other)
+
+    def __le__(self, other):
+        return self.cents <= _to_cents(other)
+
+    def __gt__(self, other):
+        return self.cents > _to_cents(other)
+
+    def __ge__(self, other):
+        return self.cents >= _to_cents(other)
+
+    def __cmp__(self, other):
+        return cmp(self.cents, _to_cents(other))
+
+    def __nonzero__(self):
+        return self.cents != 0
+
+    def __neg__(self):
+        return _from_cents(-self.cents)
+
+    def __pos__(self):
+        return self
+
+    def __abs__(self):
+        if self.cents < 0:
+            return _from_cents(-self.cents)
+        return self
+
+    def __add__(self, other):
+        return _from_cents(self.cents + _to_cents(other))
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        return _from_cents(self.cents - _to_cents(other))
+
+    def __rsub__(self, other):
+        return _from_cents(_to_cents(other) - self.cents)
+
+    def __mul__(self, other):
+        if isinstance(other, (int, long)):
+            return _from_cents(self.cents * other)
+        return _from_cents(_round_quotient(self.cents * _to_cents(other),
+                                           100))
+
+    __rmul__ = __mul__
+
+    def __div__(self, other):
+        if isinstance(other, (int, long)):
+            divisor = other * 100
+        else:
+            divisor = _to_cents(other)
+        if divisor == 0:
+            raise ZeroDivisionError("Currency division")
+        return _from_cents(_round_quotient(self.cents * 100, divisor))
+
+    __truediv__ = __div__
+
+    def __rdiv__(self, other):
+        return _from_cents(_to_cents(other)) / self
+
+    __rtruediv__ = __rdiv__
+
+    def __divmod__(self, other):
+        divisor = _to_cents(other)
+        if divisor == 0:
+            raise ZeroDivisionError("Currency modulo")
+        quotient = self.cents // divisor
+        return quotient, _from_cents(self.cents - quotient * divisor)
+
+    def __rdivmod__(self, other):
+        return divmod(_from_cents(_to_cents(other)), self)
+
+    def __mod__(self, other):
+        return self.__divmod__(other)[1]
+
+    def __rmod__(self, other):
+        return _from_cents(_to_cents(other)).__mod__(self)
+
+    def __float__(self):
+        return self.cents / 100.0
+
+    def __long__(self):
+        # Truncates towards zero, like FixedPoint:
+        whole = abs(self.cents) // 100
+        if self.cents < 0:
+            whole = -whole
+        return long(whole)
+
+    def __int__(self):
+        return int(self.__long__())
+
+    def frac(self):
+        """ Return the fractional part, x.frac() + long(x) == x. """
+        return self - long(self)
+
+
+_new_currency = object.__new__
+_set_cents = Currency.cents.__set__
+_cache = [None] * (CACHE_CENTS + 1)
+
+
+def _from_cents(cents):
+    """ Return the Currency for a number of cents, shared if small. """
+    if 0 <= cents <= CACHE_CENTS:
+        amount = _cache[cents]
+        if amount is None:
+            amount = _new_currency(Currency)
+            _set_cents(amount, cents)
+            _cache[cents] = amount
+        return amount
+    amount = _new_currency(Currency)
+    _set_cents(amount, cents)
+    return amount
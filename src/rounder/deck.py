@@ -26,7 +26,6 @@ from logging import getLogger
 logger = getLogger("rounder.deck")
 
 from random import shuffle
-from rounder.card import Card
 from rounder.core import RounderException
 
 
@@ -49,10 +48,8 @@ class Deck(object):
     """ Standard 52 card deck. """
 
     def __init__(self):
-        self.cards = []
-        for i in rounder.card.ALL_SUITS:
-            for j in range(2, 15):
-                self.cards.append(Card(j, i))
+        # Cards are interned, so a new deck just needs a new list of them:
+        self.cards = list(rounder.card.CARDS)
         self.__topCard = 0
 
     def __str__(self):
@@ -28,6 +28,7 @@ initially empty it provides a hook for us to change the DTO should the
 engine object later grow to contain sensitive information.
 """
 
+from rounder.core import RounderException
 from rounder.currency import Currency
 
 
@@ -40,6 +41,10 @@ class TableState(object):
 
     def __init__(self, table):
         self.id = table.id
+
+        # Number of the last TableStateDelta this state includes:
+        self.sequence = 0
+
         self.name = table.name
         self.limit = table.limit
         self.hand_underway = (table.gsm.current != None)
@@ -50,7 +55,7 @@ class TableState(object):
         self.pots = []
         self.round_bets = Currency(0.00)
         if table.game != None:
-            self.community_cards = table.game.community_cards
+            self.community_cards = list(table.game.community_cards)
             for pot in table.game.pot_mgr.pots:
                 self.pots.append(PotState(pot))
 
@@ -89,6 +94,73 @@ class TableState(object):
         return '\n'.join(output)
 
 
+# TableState attributes a TableStateDelta carries when they change. The
+# seats are compared one by one:
+DELTA_FIELDS = ('name', 'limit', 'hand_underway', 'community_cards',
+        'dealer_seat_num', 'pots', 'round_bets')
+
+
+def _compare_value(field, value):
+    """ Return something comparable with == for a TableState attribute. """
+    if field == 'pots':
+        return [(pot.amount, pot.is_main_pot) for pot in value]
+    return value
+
+
+def _compare_seat(seat):
+    if seat is None:
+        return None
+    return seat.__dict__
+
+
+class TableStateDelta(object):
+    """
+    The changes between two TableStates of the same table, numbered so a
+    client can tell whether it missed one.
+
+    Holds the new value of each changed attribute in DELTA_FIELDS and the
+    new PlayerState, or None, for each changed seat.
+    """
+
+    def __init__(self, sequence, old, new):
+        self.sequence = sequence
+
+        self.changes = {}
+        for field in DELTA_FIELDS:
+            value = getattr(new, field)
+            if _compare_value(field, getattr(old, field)) != \
+                    _compare_value(field, value):
+                self.changes[field] = value
+
+        self.seat_count = len(new.seats)
+        self.seats = {}
+        for seat_num in range(len(new.seats)):
+            if seat_num >= len(old.seats) or \
+                    _compare_seat(old.seats[seat_num]) != \
+                    _compare_seat(new.seats[seat_num]):
+                self.seats[seat_num] = new.seats[seat_num]
+
+    def apply(self, state):
+        """
+        Bring a TableState up to date. The state must include every delta
+        up to this one.
+        """
+        if state.sequence + 1 != self.sequence:
+            raise RounderException("Cannot apply table state delta %s to "
+                "state %s" % (self.sequence, state.sequence))
+        for field, value in self.changes.items():
+            setattr(state, field, value)
+        del state.seats[self.seat_count:]
+        state.seats.extend([None] * (self.seat_count - len(state.seats)))
+        for seat_num, seat in self.seats.items():
+            state.seats[seat_num] = seat
+        state.sequence = self.sequence
+
+    def __repr__(self):
+        return "TableStateDelta %s: %s seats %s" % (self.sequence,
+            sorted(self.changes.keys()), sorted(self.seats.keys()))
+
+
 class TableListing(object):
     """
     Minimal representation of a table for use in the server window's table
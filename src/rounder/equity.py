@@ -0,0 +1,337 @@
+#   Rounder - Poker for the GNOME Desktop
+#
+#   Copyright (C) 2009 Devan Goodwin <dgoodwin@dangerouslyinc.com>
+#   Copyright (C) 2009 James Bowes <jbowes@dangerouslyinc.com>
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+#   02110-1301  USA
+
+"""
+All-in equity calculations.
+
+Given each player's pocket cards and the board so far, work out how often
+each player wins, ties or loses once the rest of the board is dealt.
+"""
+
+from logging import getLogger
+logger = getLogger("rounder.equity")
+
+from itertools import combinations
+from math import sqrt
+import multiprocessing
+import random
+import time
+
+from rounder.cache import LRUCache
+from rounder.core import RounderException
+from rounder.cardset import FULL_DECK_MASK, SUIT_MASK, card_mask, mask_ids, \
+        popcount
+from rounder.evaluator import evaluate_mask, load_tables
+
+# Enumerations with at least this many runouts are spread over a process
+# pool unless the caller asks otherwise:
+POOL_THRESHOLD = 50000
+
+# Normal quantile used for the 95% confidence intervals of sampled equity:
+CONFIDENCE_Z = 1.96
+
+# Exhaustive equity results, keyed by suit isomorphic deal, see
+# _equity_key(). Check equity_cache.stats() for hit rates:
+EQUITY_CACHE_SIZE = 10000
+equity_cache = LRUCache(EQUITY_CACHE_SIZE)
+
+
+class PlayerEquity(object):
+
+    """ How one player's pocket fared over a set of runouts. """
+
+    def __init__(self, wins, ties, tie_share, runouts):
+        self.wins = wins
+        self.ties = ties
+        self.runouts = runouts
+
+        self.win = float(wins) / runouts
+        self.tie = float(ties) / runouts
+        self.lose = 1.0 - self.win - self.tie
+
+        # Share of the pot won on average, split pots counting for their
+        # fraction:
+        self.equity = (wins + tie_share) / runouts
+
+    def __repr__(self):
+        return "win %.4f tie %.4f lose %.4f equity %.4f" % (self.win,
+            self.tie, self.lose, self.equity)
+
+
+class EquityEstimate(PlayerEquity):
+
+    """
+    PlayerEquity estimated from randomly sampled runouts, along with the
+    standard error of the equity and its 95% confidence interval.
+    """
+
+    def __init__(self, wins, ties, tie_share, tie_share_squares, samples):
+        PlayerEquity.__init__(self, wins, ties, tie_share, samples)
+        self.samples = samples
+
+        # Each runout is worth 1, 0 or a split pot share to this player:
+        mean_square = (wins + tie_share_squares) / samples
+        variance = max(mean_square - self.equity ** 2, 0.0)
+        self.standard_error = sqrt(variance / samples)
+
+        margin = CONFIDENCE_Z * self.standard_error
+        self.confidence_interval = (max(self.equity - margin, 0.0),
+                                    min(self.equity + margin, 1.0))
+
+    def __repr__(self):
+        return "equity %.4f +/- %.4f (%d samples)" % (self.equity,
+            self.standard_error, self.samples)
+
+
+def _pocket_masks(pockets, board, dead):
+    """
+    Convert the cards given to equity() into masks, checking they make
+    sense together. Returns (pocket masks, board mask, dead mask.)
+    """
+    if len(pockets) < 1:
+        raise RounderException("No pockets to calculate equity for.")
+    if len(board) > 5:
+        raise RounderException("Board has more than five cards: %s" % board)
+
+    pocket_masks = [card_mask(pocket) for pocket in pockets]
+    board_mask = card_mask(board)
+    dead_mask = card_mask(dead)
+
+    card_count = len(board) + len(dead)
+    used_mask = board_mask | dead_mask
+    for i in range(len(pockets)):
+        if len(pockets[i]) != 2:
+            raise RounderException("Pocket must have two cards: %s" %
+                (pockets[i], ))
+        card_count += 2
+        used_mask |= pocket_masks[i]
+    if popcount(used_mask) != card_count:
+        raise RounderException("Same card dealt twice.")
+
+    return pocket_masks, board_mask, dead_mask
+
+
+def _equity_key(pocket_masks, board_mask, dead_mask):
+    """
+    Return a cache key for an equity() deal. Suits are relabelled the same
+    way in every mask, so deals differing only by a permutation of suits,
+    which have the same equities, share a key.
+    """
+    masks = pocket_masks + [board_mask, dead_mask]
+    suits = [tuple([(mask >> shift) & SUIT_MASK for mask in masks])
+             for shift in (0, 13, 26, 39)]
+    suits.sort(reverse=True)
+    return tuple(suits)
+
+
+def _score_runout(pocket_masks, full_board, wins, ties, tie_shares):
+    """
+    Evaluate one complete board and record who won it. Returns the indexes
+    of the winning pockets.
+    """
+    values = [evaluate_mask(pocket | full_board) for pocket in pocket_masks]
+    best = max(values)
+    winners = [i for i in range(len(values)) if values[i] == best]
+    if len(winners) == 1:
+        wins[winners[0]] += 1
+    else:
+        share = 1.0 / len(winners)
+        for i in winners:
+            ties[i] += 1
+            tie_shares[i] += share
+    return winners
+
+
+def _remaining_bits(pocket_masks, board_mask, dead_mask):
+    """ Return the single bit masks of every card still in the deck. """
+    used_mask = board_mask | dead_mask
+    for pocket in pocket_masks:
+        used_mask |= pocket
+    return [1 << card_id for card_id in mask_ids(FULL_DECK_MASK & ~used_mask)]
+
+
+def _enumerate_runouts(pocket_masks, board_mask, bits, first, count):
+    """
+    Score every runout of count cards from the given card bits whose
+    lowest card is bits[first]. Returns (wins, ties, tie shares, runouts.)
+
+    Kept at module level so it can be handed to a multiprocessing pool.
+    """
+    players = len(pocket_masks)
+    wins = [0] * players
+    ties = [0] * players
+    tie_shares = [0.0] * players
+    runouts = 0
+
+    board_mask |= bits[first]
+    for rest in combinations(bits[first + 1:], count - 1):
+        _score_runout(pocket_masks, board_mask | sum(rest), wins, ties,
+                      tie_shares)
+        runouts += 1
+
+    return wins, ties, tie_shares, runouts
+
+
+def _enumerate_chunk(args):
+    """ Pool entry point, unpacks the arguments for _enumerate_runouts. """
+    return _enumerate_runouts(*args)
+
+
+def _combination_count(n, k):
+    count = 1
+    for i in range(k):
+        count = count * (n - i) / (i + 1)
+    return count
+
+
+def equity(pockets, board, dead=(), processes=None):
+    """
+    Enumerate every way the board can be completed and return a
+    PlayerEquity for each pocket, in the same order.
+
+    Cards may be given as Card objects, card ids or card strings. Dead cards
+    are known to be out of play, folded hands for instance.
+
+    processes controls the process pool: None spreads large enumerations
+    over every CPU, 1 always runs in this process and anything higher
+    always uses a pool of that size.
+
+    Results are kept in equity_cache, repeated deals and their suit
+    permutations return the same PlayerEquity objects.
+    """
+    pocket_masks, board_mask, dead_mask = _pocket_masks(pockets, board,
+                                                        dead)
+    key = _equity_key(pocket_masks, board_mask, dead_mask)
+    results = equity_cache.get(key)
+    if results is None:
+        results = _enumerate_equity(pocket_masks, board_mask, dead_mask,
+                                    processes)
+        equity_cache.put(key, results)
+    return list(results)
+
+
+def _enumerate_equity(pocket_masks, board_mask, dead_mask, processes):
+    """ Do the enumeration for equity(), which checked the cards. """
+    players = len(pocket_masks)
+    to_deal = 5 - popcount(board_mask)
+
+    if to_deal == 0:
+        wins = [0] * players
+        ties = [0] * players
+        tie_shares = [0.0] * players
+        _score_runout(pocket_masks, board_mask, wins, ties, tie_shares)
+        return [PlayerEquity(wins[i], ties[i], tie_shares[i], 1)
+                for i in range(players)]
+
+    bits = _remaining_bits(pocket_masks, board_mask, dead_mask)
+
+    # One chunk per possible lowest card in the runout:
+    chunks = [(pocket_masks, board_mask, bits, first, to_deal)
+              for first in range(len(bits) - to_deal + 1)]
+
+    total_runouts = _combination_count(len(bits), to_deal)
+    if processes is None:
+        processes = 1
+        if total_runouts >= POOL_THRESHOLD:
+            processes = multiprocessing.cpu_count()
+
+    load_tables()
+    if processes > 1:
+        logger.debug("Enumerating %s runouts over %s processes" %
+            (total_runouts, processes))
+        pool = multiprocessing.Pool(processes)
+        try:
+            results = pool.map(_enumerate_chunk, chunks)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        results = [_enumerate_chunk(chunk) for chunk in chunks]
+
+    wins = [0] * players
+    ties = [0] * players
+    tie_shares = [0.0] * players
+    runouts = 0
+    for chunk_wins, chunk_ties, chunk_tie_shares, chunk_runouts in results:
+        for i in range(players):
+            wins[i] += chunk_wins[i]
+            ties[i] += chunk_ties[i]
+            tie_shares[i] += chunk_tie_shares[i]
+        runouts += chunk_runouts
+
+    return [PlayerEquity(wins[i], ties[i], tie_shares[i], runouts)
+            for i in range(players)]
+
+
+def sample_equity(pockets, board, dead=(), target_error=0.002,
+        time_limit=None, batch_size=1000, max_samples=1000000, rand=None):
+    """
+    Estimate each pocket's equity from random runouts and return an
+    EquityEstimate for each, in the same order.
+
+    Runouts are dealt in batches of batch_size. Sampling stops once the
+    standard error of every player's equity is at most target_error, once
+    time_limit seconds have passed or after max_samples runouts, whichever
+    comes first. Pass a seeded random.Random as rand for repeatable results.
+    """
+    pocket_masks, board_mask, dead_mask = _pocket_masks(pockets, board,
+                                                        dead)
+    players = len(pockets)
+    to_deal = 5 - len(board)
+    bits = _remaining_bits(pocket_masks, board_mask, dead_mask)
+
+    if rand is None:
+        rand = random.Random()
+    sample = rand.sample
+
+    wins = [0] * players
+    ties = [0] * players
+    tie_shares = [0.0] * players
+    tie_share_squares = [0.0] * players
+    samples = 0
+
+    load_tables()
+    start = time.time()
+    while True:
+        for i in xrange(min(batch_size, max_samples - samples)):
+            full_board = board_mask | sum(sample(bits, to_deal))
+            winners = _score_runout(pocket_masks, full_board, wins, ties,
+                                    tie_shares)
+            if len(winners) > 1:
+                share = 1.0 / len(winners)
+                for winner in winners:
+                    tie_share_squares[winner] += share * share
+            samples += 1
+
+        estimates = [EquityEstimate(wins[i], ties[i], tie_shares[i],
+                                    tie_share_squares[i], samples)
+                     for i in range(players)]
+
+        if max([estimate.standard_error for estimate in estimates]) <= \
+                target_error:
+            break
+        if time_limit is not None and time.time() - start >= time_limit:
+            break
+        if samples >= max_samples:
+            break
+
+    logger.debug("Sampled %s runouts in %.3f seconds" % (samples,
+        time.time() - start))
+    return estimates
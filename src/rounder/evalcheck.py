@@ -0,0 +1,140 @@
+#   Rounder - Poker for the GNOME Desktop
+#
+#   Copyright (C) 2009 Devan Goodwin <dgoodwin@dangerouslyinc.com>
+#   Copyright (C) 2009 James Bowes <jbowes@dangerouslyinc.com>
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+#   02110-1301  USA
+
+"""
+Differential testing of evaluator backends.
+
+Two backends are handed the same random deals and must pick the same
+winners. Deals are generated from a seed and numbered, so any disagreement
+can be replayed with random_deal().
+"""
+
+from logging import getLogger
+logger = getLogger("rounder.evalcheck")
+
+import itertools
+import multiprocessing
+import random
+
+from rounder.card import CARDS
+from rounder.evaluator import get_backend, load_tables
+
+# Pocket size and possible board sizes for each game:
+GAME_DEALS = {
+    'holdem': (2, (0, 3, 4, 5)),
+    'omaha': (4, (3, 4, 5)),
+    '5draw': (5, (0, )),
+}
+
+# Deals per pool task:
+CHUNK_SIZE = 500
+
+
+class Disagreement(object):
+
+    """ A deal two backends picked different winners for. """
+
+    def __init__(self, deal_number, pockets, board, results):
+        self.deal_number = deal_number
+        self.pockets = pockets
+        self.board = board
+
+        # Winning pocket indexes, by backend name:
+        self.results = results
+
+    def __repr__(self):
+        return "deal %d: pockets %s board %s winners %s" % (
+            self.deal_number, self.pockets, self.board, self.results)
+
+
+def random_deal(game, seed, deal_number, max_players=10):
+    """
+    Return the (pockets, board) of a numbered deal, card strings such as
+    'Ah'. The same arguments always give the same deal.
+    """
+    rand = random.Random("%s-%d-%d" % (game, seed, deal_number))
+    pocket_size, board_sizes = GAME_DEALS[game]
+    board_size = rand.choice(board_sizes)
+    players = rand.randint(2, min(max_players,
+                                  (52 - board_size) / pocket_size))
+
+    cards = [str(card) for card in
+             rand.sample(CARDS, players * pocket_size + board_size)]
+    pockets = [cards[i * pocket_size:(i + 1) * pocket_size]
+               for i in range(players)]
+    return pockets, cards[players * pocket_size:]
+
+
+def _compare_chunk(args):
+    """
+    Run both backends over a range of deals and return the first
+    Disagreement, or None. Runs in pool workers.
+    """
+    names, game, seed, first, count, max_players = args
+    load_tables()
+    backends = [get_backend(name) for name in names]
+
+    for deal_number in range(first, first + count):
+        pockets, board = random_deal(game, seed, deal_number, max_players)
+        results = [backend.winners(game, pockets, board)
+                   for backend in backends]
+        if results[0] != results[1]:
+            return Disagreement(deal_number, pockets, board,
+                                dict(zip(names, results)))
+    return None
+
+
+def compare_backends(first, second, deals=10000, game='holdem', seed=0,
+        processes=None, max_players=10):
+    """
+    Run two named backends over the same random deals, spread over a
+    process pool in chunks of CHUNK_SIZE, and return the lowest numbered
+    Disagreement or None if they always agreed.
+
+    processes=1 runs everything in this process.
+    """
+    # Fail here rather than in the workers if a backend is unavailable:
+    get_backend(first)
+    get_backend(second)
+    load_tables()
+
+    tasks = [((first, second), game, seed, start,
+              min(CHUNK_SIZE, deals - start), max_players)
+             for start in range(0, deals, CHUNK_SIZE)]
+
+    pool = None
+    if processes == 1:
+        results = itertools.imap(_compare_chunk, tasks)
+    else:
+        # Chunks come back in order, so the first disagreement found is
+        # the lowest numbered one:
+        pool = multiprocessing.Pool(processes)
+        results = pool.imap(_compare_chunk, tasks)
+
+    try:
+        for result in results:
+            if result is not None:
+                logger.info("Backends disagree on %s" % result)
+                return result
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+    return None
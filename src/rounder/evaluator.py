@@ -22,42 +22,829 @@ PyPokerEval compatible hand ranker.
 """
 
 
+import array
+import ConfigParser
+from abc import ABCMeta, abstractmethod
+import ctypes
+import itertools
 import logging
+import mmap
+import os
+import struct
+import sys
+import zlib
+
+# NumPy is only needed for batch evaluation:
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# pypoker-eval is an optional evaluator backend:
+try:
+    import pokereval
+except ImportError:
+    pokereval = None
+
+from rounder.card import Card, get_card_id
+from rounder.core import RounderException
+from rounder.cardset import card_mask, popcount
 
 logger = logging.getLogger("rounder.evaluator")
 
 
-class FullHand(object):
+# Hands are evaluated from integer card codes, the 0 - 51 ids of
+# rounder.card.CARDS: suit * 13 + (rank - 2).
+
+# Per rank keys whose sums are unique for every multiset of 5, 6 or 7 ranks
+# (no more than four of each), so a hand's ranks hash to a single integer:
+RANK_KEYS = (0, 1, 5, 22, 98, 453, 2031, 8698, 22854, 83661, 262349,
+             636345, 1479181)
+
+ROYAL_FLUSH_VALUE = 0x9EDCBA
+
+# Lookup tables, loaded on first use by load_tables(). All of them are
+# views onto _tables_data, rank tables as (slot mask, keys, values) hash
+# tables, see _rank_value():
+_flush_table = None
+_rank_tables = None
+_suit_key_table = None
+
+# The lookup tables are persisted to a versioned binary file so processes
+# can map it rather than generate the tables. Bump TABLES_VERSION whenever
+# the file layout or the hand values change. ROUNDER_EVALUATOR_TABLES may
+# point elsewhere, the default lives next to this module.
+TABLES_MAGIC = "RNDREVAL"
+TABLES_VERSION = 2
+TABLES_FILE = os.environ.get("ROUNDER_EVALUATOR_TABLES",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                 "evaluator.tables"))
+_HEADER = struct.Struct("<8sIII")
+
+# Rank keys are placed in the rank hash tables by multiplicative hashing,
+# with linear probing. Empty slots hold EMPTY_KEY:
+RANK_HASH_MULTIPLIER = 2654435761
+RANK_HASH_SHIFT = 7
+EMPTY_KEY = -1
+
+# Little endian 32 bit ints, as stored in the tables file:
+_INT32 = ctypes.c_int32.__ctype_le__
+
+# The packed tables, the file's memory map or generated in memory, and the
+# (offset, count) of each array in it:
+_tables_data = None
+_tables_sections = None
+
+# NumPy copies of the lookup tables, built on first batch evaluation:
+_numpy_tables = None
+
+
+def _card_strings(codes):
+    """ Convert integer card codes to the strings FullHand expects. """
+    return [str(Card.from_id(code)).lower() for code in codes]
+
+
+def _straight_high(rank_mask):
+    """
+    Return the high rank (5 - 14) of the best straight contained in the
+    13 bit rank mask, or None.
+    """
+    for high in range(14, 5, -1):
+        run = 0x1F << (high - 6)
+        if rank_mask & run == run:
+            return high
+    # Ace low:
+    if rank_mask & 0x100F == 0x100F:
+        return 5
+    return None
+
+
+def _straight_ranks_value(high):
+    """ Ranks portion of a straight value, ace low straights use 1. """
+    hand_value = 0x0
+    scale = 0x010000
+    for rank in range(high, high - 5, -1):
+        hand_value += scale * rank
+        scale /= 0x10
+    return hand_value
+
+
+def _kickers_value(ranks, scale):
+    """ Value of the given descending ranks starting at the given scale. """
+    hand_value = 0x0
+    for rank in ranks:
+        hand_value += scale * rank
+        scale /= 0x10
+    return hand_value
+
+
+def _flush_value(rank_mask):
+    """
+    Relative value of a hand with at least five cards of one suit, whose
+    ranks in that suit are given as a 13 bit mask.
+    """
+    high = _straight_high(rank_mask)
+    if high == 14:
+        return ROYAL_FLUSH_VALUE
+    elif high is not None:
+        return 0x800000 + _straight_ranks_value(high)
+
+    ranks = [rank for rank in range(14, 1, -1)
+             if rank_mask & (1 << (rank - 2))]
+    return 0x500000 + _kickers_value(ranks[:5], 0x010000)
+
+
+def _rank_multiset_value(counts):
+    """
+    Relative value of a hand without a flush, given the number of cards of
+    each rank (indexed by rank - 2.)
+    """
+    quads = []
+    trips = []
+    pairs = []
+    singles = []
+    rank_mask = 0
+    for rank in range(14, 1, -1):
+        count = counts[rank - 2]
+        if count:
+            rank_mask |= 1 << (rank - 2)
+        if count == 4:
+            quads.append(rank)
+        elif count == 3:
+            trips.append(rank)
+        elif count == 2:
+            pairs.append(rank)
+        elif count == 1:
+            singles.append(rank)
+
+    if quads:
+        others = [rank for rank in range(14, 1, -1)
+                  if counts[rank - 2] and rank != quads[0]]
+        return 0x700000 + quads[0] * 0x010000 + \
+            _kickers_value(others[:1], 0x001000)
+
+    if trips and (len(trips) > 1 or pairs):
+        best_pair = max(trips[1:] + pairs)
+        return 0x600000 + trips[0] * 0x010000 + best_pair * 0x001000
+
+    high = _straight_high(rank_mask)
+    if high is not None:
+        return 0x400000 + _straight_ranks_value(high)
+
+    if trips:
+        return 0x300000 + trips[0] * 0x010000 + \
+            _kickers_value(singles[:2], 0x001000)
+
+    if len(pairs) >= 2:
+        kickers = sorted(pairs[2:] + singles, reverse=True)
+        return 0x200000 + pairs[0] * 0x010000 + pairs[1] * 0x001000 + \
+            _kickers_value(kickers[:1], 0x000100)
+
+    if pairs:
+        return 0x100000 + pairs[0] * 0x010000 + \
+            _kickers_value(singles[:3], 0x001000)
+
+    return _kickers_value(singles[:5], 0x010000)
+
+
+def _rank_multisets(size, low=0, counts=None):
+    """ Generate every multiset of ranks of the given size as count lists. """
+    if counts is None:
+        counts = [0] * 13
+    if size == 0:
+        yield counts
+        return
+    for rank in range(low, 13):
+        if counts[rank] < 4:
+            counts[rank] += 1
+            for multiset in _rank_multisets(size - 1, rank, counts):
+                yield multiset
+            counts[rank] -= 1
+
+
+def _generate_tables():
+    """
+    Generate the flush table (indexed by the 13 bit rank mask of a suit),
+    the suit key table giving the RANK_KEYS sum for a suit's rank mask and
+    the rank tables (one per hand size, keyed by the sum of RANK_KEYS.)
+    """
+    flush_table = [0] * 0x2000
+    suit_key_table = [0] * 0x2000
+    for rank_mask in range(0x2000):
+        if bin(rank_mask).count('1') >= 5:
+            flush_table[rank_mask] = _flush_value(rank_mask)
+        for rank in range(13):
+            if rank_mask & (1 << rank):
+                suit_key_table[rank_mask] += RANK_KEYS[rank]
+
+    rank_tables = {}
+    for size in (5, 6, 7):
+        table = {}
+        for counts in _rank_multisets(size):
+            key = 0
+            for rank in range(13):
+                key += counts[rank] * RANK_KEYS[rank]
+            table[key] = _rank_multiset_value(counts)
+        rank_tables[size] = table
+
+    return flush_table, suit_key_table, rank_tables
+
+
+def _int32_array(values):
+    """ Little endian array of 32 bit ints, as stored in the tables file. """
+    values = array.array('i', values)
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return values
+
+
+def _rank_slot(key, mask):
+    """ Home slot of a rank key in a rank hash table. """
+    return (key * RANK_HASH_MULTIPLIER >> RANK_HASH_SHIFT) & mask
+
+
+def _rank_hash_table(table):
+    """
+    Lay a rank table dict out as an open addressing hash table, at most
+    half full. Returns lists of keys and values, one entry per slot.
+    """
+    slots = 1 << (2 * len(table) - 1).bit_length()
+    mask = slots - 1
+    keys = [EMPTY_KEY] * slots
+    values = [0] * slots
+    for key in sorted(table.keys()):
+        slot = _rank_slot(key, mask)
+        while keys[slot] != EMPTY_KEY:
+            slot = (slot + 1) & mask
+        keys[slot] = key
+        values[slot] = table[key]
+    return keys, values
+
+
+def _rank_value(table, key):
+    """
+    Look a rank key up in one of the rank hash tables. Raises KeyError for
+    keys no hand has.
+    """
+    mask, keys, values = table
+    slot = _rank_slot(key, mask)
+    while True:
+        found = keys[slot]
+        if found == key:
+            return values[slot]
+        if found == EMPTY_KEY:
+            raise KeyError(key)
+        slot = (slot + 1) & mask
+
+
+def pack_tables(flush_table, suit_key_table, rank_tables):
+    """
+    Return the contents of a tables file: a header holding the magic,
+    TABLES_VERSION, a CRC32 and the length of the payload, followed by the
+    flush and suit key tables and then, for each hand size, the number of
+    rank hash table slots, their keys and their values.
+
+    Takes the rank tables as dicts of rank key to value, as generated.
+    """
+    payload = [_int32_array(flush_table).tostring(),
+               _int32_array(suit_key_table).tostring()]
+    for size in (5, 6, 7):
+        keys, values = _rank_hash_table(rank_tables[size])
+        payload.append(struct.pack("<I", len(keys)))
+        payload.append(_int32_array(keys).tostring())
+        payload.append(_int32_array(values).tostring())
+    payload = ''.join(payload)
+
+    return _HEADER.pack(TABLES_MAGIC, TABLES_VERSION,
+                        zlib.crc32(payload) & 0xFFFFFFFF,
+                        len(payload)) + payload
+
+
+def unpack_tables(data):
+    """
+    Read the tables out of a writable buffer, a bytearray or a copy on
+    write memory map, holding what pack_tables wrote. The tables returned
+    are ctypes arrays viewing data, nothing is copied.
+
+    Returns (flush table, suit key table, rank tables, sections) where
+    sections maps each array's name to its (offset, count) in data, or None
+    if data is not a tables file for this TABLES_VERSION or is corrupt.
+    """
+    if len(data) < _HEADER.size:
+        return None
+    magic, version, checksum, length = _HEADER.unpack_from(data)
+    if magic != TABLES_MAGIC or version != TABLES_VERSION or \
+            len(data) != _HEADER.size + length or \
+            zlib.crc32(buffer(data, _HEADER.size)) & 0xFFFFFFFF != checksum:
+        return None
+
+    sections = {}
+    offset = [_HEADER.size]
+
+    def view_ints(name, count):
+        values = (_INT32 * count).from_buffer(data, offset[0])
+        sections[name] = (offset[0], count)
+        offset[0] += count * 4
+        return values
+
+    flush_table = view_ints('flush', 0x2000)
+    suit_key_table = view_ints('suit_keys', 0x2000)
+    rank_tables = {}
+    for size in (5, 6, 7):
+        count = struct.unpack_from("<I", data, offset[0])[0]
+        offset[0] += 4
+        keys = view_ints('rank%d_keys' % size, count)
+        values = view_ints('rank%d_values' % size, count)
+        rank_tables[size] = (count - 1, keys, values)
+
+    return flush_table, suit_key_table, rank_tables, sections
+
+
+def write_tables(path=TABLES_FILE):
+    """
+    Generate the lookup tables and write them to path. The file is written
+    under a temporary name and renamed, so readers never see half of it.
+    """
+    data = pack_tables(*_generate_tables())
+    tmp_path = "%s.%d.tmp" % (path, os.getpid())
+    tables_file = open(tmp_path, 'wb')
+    try:
+        tables_file.write(data)
+    finally:
+        tables_file.close()
+    os.rename(tmp_path, path)
+    logger.info("Wrote evaluator tables to %s" % path)
+
+
+def _map_tables(path):
+    """
+    Memory map the tables file at path and return its unpacked tables along
+    with the map, or None if it is missing or stale.
+
+    The map is copy on write, which ctypes needs to view it, but nothing
+    writes to it, so every process mapping the file shares its pages.
+    """
+    try:
+        tables_file = open(path, 'rb')
+    except IOError:
+        return None
+    try:
+        try:
+            tables_map = mmap.mmap(tables_file.fileno(), 0,
+                                   access=mmap.ACCESS_COPY)
+        except (EnvironmentError, ValueError):
+            return None
+    finally:
+        tables_file.close()
+
+    tables = unpack_tables(tables_map)
+    if tables is None:
+        tables_map.close()
+        return None
+    return tables + (tables_map, )
+
+
+def _set_tables(flush_table, suit_key_table, rank_tables, sections,
+        tables_data):
+    global _flush_table, _rank_tables, _suit_key_table
+    global _tables_data, _tables_sections, _numpy_tables
+    _flush_table = flush_table
+    _suit_key_table = suit_key_table
+    _rank_tables = rank_tables
+    _tables_sections = sections
+    _tables_data = tables_data
+    _numpy_tables = None
+
+
+def load_tables(path=TABLES_FILE):
+    """
+    Make sure the lookup tables are ready, mapping the tables file if it is
+    present and current. Otherwise the tables are generated in memory,
+    nothing is written: run "python setup.py build_tables" to create the
+    file.
+
+    Worth calling before forking worker processes so they inherit the
+    tables instead of each loading their own.
+    """
+    if _flush_table is not None:
+        return
+
+    tables = _map_tables(path)
+    if tables is not None:
+        logger.debug("Mapped evaluator tables from %s" % path)
+        _set_tables(*tables)
+        return
+
+    logger.info("Evaluator tables at %s missing or stale, generating." %
+        path)
+    data = bytearray(pack_tables(*_generate_tables()))
+    _set_tables(*(unpack_tables(data) + (data, )))
+
+
+def evaluate(codes):
+    """
+    Return the relative value of the best hand made from five to seven
+    integer card codes. Values are identical to those of FullHand.
+    """
+    if _flush_table is None:
+        load_tables()
+
+    suit_masks = [0, 0, 0, 0]
+    key = 0
+    for code in codes:
+        suit, rank = divmod(code, 13)
+        suit_masks[suit] |= 1 << rank
+        key += RANK_KEYS[rank]
+
+    for rank_mask in suit_masks:
+        hand_value = _flush_table[rank_mask]
+        if hand_value:
+            return hand_value
+
+    return _rank_value(_rank_tables[len(codes)], key)
+
+
+def evaluate_mask(mask):
+    """
+    Return the relative value of the best hand made from the five to seven
+    cards set in a rounder.cardset bitmask.
+    """
+    if _flush_table is None:
+        load_tables()
+
+    key = 0
+    for shift in (0, 13, 26, 39):
+        rank_mask = (mask >> shift) & 0x1FFF
+        hand_value = _flush_table[rank_mask]
+        if hand_value:
+            return hand_value
+        key += _suit_key_table[rank_mask]
+
+    return _rank_value(_rank_tables[popcount(mask)], key)
+
+
+def _build_numpy_tables():
+    """
+    Build array versions of the lookup tables, views onto the same data
+    as the scalar tables. Rank tables become a pair of arrays, the hash
+    table's keys and values.
+    """
+    global _numpy_tables
+    load_tables()
+
+    def table_array(name):
+        offset, count = _tables_sections[name]
+        return numpy.frombuffer(_tables_data, dtype='<i4', count=count,
+                                offset=offset)
+
+    flush_table = table_array('flush')
+    rank_tables = {}
+    for size in (5, 6, 7):
+        rank_tables[size] = (table_array('rank%d_keys' % size),
+                             table_array('rank%d_values' % size))
+
+    _numpy_tables = (flush_table, numpy.array(RANK_KEYS, dtype=numpy.int32),
+                     rank_tables)
+
+
+def evaluate_batch(cards):
+    """
+    Evaluate many hands at once. Takes an (N, 7) integer array of card ids
+    (five or six columns work too) and returns an (N, ) array of relative
+    values, the same values evaluate() would give for each row.
+
+    Raises RounderException if any row holds an id outside 0 - 51 or the
+    same card twice. Requires NumPy.
+    """
+    if numpy is None:
+        raise RounderException("NumPy is required for batch evaluation.")
+    if _numpy_tables is None:
+        _build_numpy_tables()
+    flush_table, rank_keys, rank_tables = _numpy_tables
+
+    cards = numpy.asarray(cards, dtype=numpy.int64)
+    if cards.ndim != 2 or cards.shape[1] not in rank_tables:
+        raise RounderException("Expected an (N, 5-7) array of card ids, "
+            "got shape %s" % (cards.shape, ))
+
+    bad_rows = ((cards < 0) | (cards > 51)).any(axis=1)
+    if bad_rows.any():
+        raise RounderException("Card ids must be 0 - 51, row %d is %s" %
+            (bad_rows.argmax(), cards[bad_rows.argmax()].tolist()))
+    sorted_cards = numpy.sort(cards, axis=1)
+    bad_rows = (sorted_cards[:, 1:] == sorted_cards[:, :-1]).any(axis=1)
+    if bad_rows.any():
+        raise RounderException("Row %d repeats a card: %s" %
+            (bad_rows.argmax(), cards[bad_rows.argmax()].tolist()))
+
+    suits = cards // 13
+    ranks = cards % 13
+    rank_bits = numpy.left_shift(1, ranks)
+
+    flush_values = numpy.zeros(len(cards), dtype=numpy.int32)
+    for suit in range(4):
+        suit_masks = numpy.bitwise_or.reduce(
+            numpy.where(suits == suit, rank_bits, 0), axis=1)
+        flush_values = numpy.maximum(flush_values, flush_table[suit_masks])
+
+    keys, values = rank_tables[cards.shape[1]]
+    mask = len(keys) - 1
+    hand_keys = rank_keys[ranks].sum(axis=1, dtype=numpy.int64)
+    slots = ((hand_keys * RANK_HASH_MULTIPLIER) >> RANK_HASH_SHIFT) & mask
+    # Probe on for the hands not found in their home slot:
+    probing = numpy.flatnonzero(keys[slots] != hand_keys)
+    while len(probing):
+        if (keys[slots[probing]] == EMPTY_KEY).any():
+            # Distinct cards always make a possible hand:
+            raise RounderException("Rank key missing from the tables")
+        slots[probing] = (slots[probing] + 1) & mask
+        probing = probing[keys[slots[probing]] != hand_keys[probing]]
+
+    return numpy.where(flush_values > 0, flush_values, values[slots])
+
+
+# Hand categories, indexed by the top digit of a relative value:
+HAND_CATEGORIES = ('high card', 'one pair', 'two pair', 'trips', 'straight',
+                   'flush', 'full house', 'quads', 'straight flush',
+                   'royal flush')
+
+# All 1326 hole card combinations and their card masks, built on first use:
+_hole_combos = None
+
+
+def _build_hole_combos():
+    global _hole_combos
+    combos = numpy.array(list(itertools.combinations(range(52), 2)),
+                         dtype=numpy.int64)
+    masks = numpy.left_shift(1, combos[:, 0]) | \
+            numpy.left_shift(1, combos[:, 1])
+    _hole_combos = (combos, masks)
+
+
+class RangeStrength(object):
+
+    """
+    Relative values of every possible hole card combination on one board,
+    sorted weakest first.
+
+    combos is an (N, 2) array of card ids, values the matching relative
+    values and percentiles the share of combinations each one beats,
+    counting ties as half. category_counts maps each of HAND_CATEGORIES to
+    the number of combinations making it.
+    """
+
+    def __init__(self, combos, values):
+        order = numpy.argsort(values, kind='mergesort')
+        self.combos = combos[order]
+        self.values = values[order]
+
+        below = numpy.searchsorted(self.values, self.values, 'left')
+        above = numpy.searchsorted(self.values, self.values, 'right')
+        self.percentiles = (below + (above - below) / 2.0) / len(values)
+
+        counts = numpy.bincount(self.values >> 20,
+                                minlength=len(HAND_CATEGORIES))
+        self.category_counts = dict(zip(HAND_CATEGORIES, counts.tolist()))
+
+        # Relative value of the holding passed to range_strength, if any:
+        self.value = None
+
+    def __len__(self):
+        return len(self.values)
+
+    def percentile(self, value=None):
+        """
+        Return the share of combinations a relative value beats, ties
+        counting as half. Defaults to the value of the player's holding.
+        """
+        if value is None:
+            value = self.value
+        below = numpy.searchsorted(self.values, value, 'left')
+        above = numpy.searchsorted(self.values, value, 'right')
+        return (below + (above - below) / 2.0) / len(self.values)
+
+
+def range_strength(board, dead=(), pocket=None):
+    """
+    Evaluate all hole card combinations still possible on a three to five
+    card board in a single evaluate_batch() pass and return a
+    RangeStrength.
+
+    Combinations using a board card or one of the dead cards are left out.
+    If the player's own pocket is given its cards are left out too, and
+    its value is kept as the RangeStrength's value.
+
+    Requires NumPy.
+    """
+    if numpy is None:
+        raise RounderException("NumPy is required for range strength.")
+    board_codes = [get_card_id(card) for card in board]
+    if not 3 <= len(board_codes) <= 5:
+        raise RounderException("Expected a flop, turn or river board, got "
+            "%d cards" % len(board_codes))
+    if _hole_combos is None:
+        _build_hole_combos()
+    combos, masks = _hole_combos
+
+    blocked = card_mask(board_codes) | card_mask([get_card_id(card)
+                                                  for card in dead])
+    if pocket is not None:
+        pocket_codes = [get_card_id(card) for card in pocket]
+        blocked |= card_mask(pocket_codes)
+    combos = combos[(masks & blocked) == 0]
+
+    cards = numpy.empty((len(combos), 2 + len(board_codes)),
+                        dtype=numpy.int64)
+    cards[:, :2] = combos
+    cards[:, 2:] = board_codes
+    strength = RangeStrength(combos, evaluate_batch(cards))
+    if pocket is not None:
+        strength.value = evaluate(pocket_codes + board_codes)
+    return strength
+
+
+class HandState(object):
+
+    """
+    A player's cards so far, kept ready for evaluation as the hand is dealt.
+    Each card added updates the suit and rank masks, per suit and per rank
+    counts and the rank key in place, so evaluating the hand at any street
+    is a couple of table lookups.
+    """
+
+    def __init__(self, cards=()):
+        self.suit_masks = [0, 0, 0, 0]
+        self.suit_counts = [0, 0, 0, 0]
+        self.rank_counts = [0] * 13
+        # Ranks present in any suit, for straight draws and the like:
+        self.rank_mask = 0
+        self.rank_key = 0
+        self.size = 0
+        for card in cards:
+            self.add(card)
+
+    def add(self, card):
+        """ Add a Card, card id or card string to the hand. """
+        suit, rank = divmod(get_card_id(card), 13)
+        self.suit_masks[suit] |= 1 << rank
+        self.suit_counts[suit] += 1
+        self.rank_counts[rank] += 1
+        self.rank_mask |= 1 << rank
+        self.rank_key += RANK_KEYS[rank]
+        self.size += 1
+
+    def add_cards(self, cards):
+        for card in cards:
+            self.add(card)
+
+    def value(self):
+        """
+        Relative value of the best hand so far, or None before there are
+        five cards.
+        """
+        if self.size < 5:
+            return None
+        if _flush_table is None:
+            load_tables()
+
+        for suit in range(4):
+            if self.suit_counts[suit] >= 5:
+                return _flush_table[self.suit_masks[suit]]
+        return _rank_value(_rank_tables[self.size], self.rank_key)
+
+    def hand(self):
+        """ HandValue of the best hand so far, or None before five cards. """
+        hand_value = self.value()
+        if hand_value is None:
+            return None
+        return HandValue(hand_value)
+
+
+class HandValue(object):
+
+    """ Comparable, printable relative value of a poker hand. """
+
+    def __init__(self, relative_value):
+        self._relative_value = relative_value
+
+    def as_str(self, int_rank):
+        if int_rank == 10:
+            return 'T'
+        elif int_rank == 11:
+            return 'J'
+        elif int_rank == 12:
+            return 'Q'
+        elif int_rank == 13:
+            return 'K'
+        elif int_rank == 14:
+            return 'A'
+        else:
+            return str(int_rank)
+
+    def __cmp__(self, other):
+        return cmp(self._relative_value, other._relative_value)
+
+    def _nth_digit(self, n):
+        sig = 0x10 ** n
+        return self.as_str((self._relative_value / sig) % 0x10)
+
+    def _rank_string(self, *ranks):
+        rank_string = "("
+        for rank in ranks:
+            rank_string += self._nth_digit(rank)
+        rank_string += ")"
+        return rank_string
+
+    def __repr__(self):
+        string_repr = ''
+        if self._relative_value >= 0x900000:
+            string_repr = "a royal flush " + self._rank_string(4, 3, 2, 1, 0)
+        elif self._relative_value > 0x800000:
+            string_repr = "a straight flush " + self._rank_string(4, 3, 2,
+                                                                  1, 0)
+        elif self._relative_value > 0x700000:
+            string_repr = "quads " + self._rank_string(4, 4, 4, 4, 3)
+        elif self._relative_value > 0x600000:
+            string_repr = "a full house " + self._rank_string(4, 4, 4, 3, 3)
+        elif self._relative_value > 0x500000:
+            string_repr = "a flush " + self._rank_string(4, 3, 2, 1, 0)
+        elif self._relative_value > 0x400000:
+            string_repr = "a straight " + self._rank_string(4, 3, 2, 1, 0)
+        elif self._relative_value > 0x300000:
+            string_repr = "trips " + self._rank_string(4, 4, 4, 3, 2)
+        elif self._relative_value > 0x200000:
+            string_repr = "two pair " + self._rank_string(4, 4, 3, 3, 2)
+        elif self._relative_value > 0x100000:
+            string_repr = "one pair " + self._rank_string(4, 4, 3, 2, 1)
+        else:
+            string_repr = "a high card " + self._rank_string(4, 3, 2, 1, 0)
+
+        return string_repr
+
+
+class FullHand(HandValue):
 
     def __init__(self, hand, table):
-        fullhand = hand + table
-        fullhand = list(fullhand)
-        fullhand.sort()
-        self.cards = fullhand
-
-        self.ranks = {}
-        for card in self.cards:
-            rank = card[:-1]
-            if not rank in self.ranks.keys():
-                self.ranks[rank] = []
-            self.ranks[rank].append(card[-1])
-
-        self.suits = {}
-        for card in self.cards:
-            suit = card[-1]
-            if not suit in self.suits.keys():
-                self.suits[suit] = []
-            self.suits[suit].append(card[:-1])
-
-        self._relative_value = self._get_relative_value()
-
-        printable_hand = "(%s) (%s)" % (', '.join(hand), ', '.join(table))
-        logger.debug("Hand '%s' has relative value 0x%.6X" % (printable_hand,
-            self._relative_value))
+        # Everything is worked out on demand, most hands are compared once
+        # at most:
+        self._hand = hand
+        self._table = table
+        self.__cards = None
+        self.__ranks = None
+        self.__suits = None
+        self.__relative_value = None
 
         # XXX DIRTY HACK
         self._used_straight_ranks = None
 
+    def __get_cards(self):
+        if self.__cards is None:
+            cards = list(self._hand) + list(self._table)
+            cards.sort()
+            self.__cards = cards
+        return self.__cards
+    cards = property(__get_cards, None)
+
+    def __get_ranks(self):
+        if self.__ranks is None:
+            ranks = {}
+            for card in self.cards:
+                rank = card[:-1]
+                if not rank in ranks:
+                    ranks[rank] = []
+                ranks[rank].append(card[-1])
+            self.__ranks = ranks
+        return self.__ranks
+    ranks = property(__get_ranks, None)
+
+    def __get_suits(self):
+        if self.__suits is None:
+            suits = {}
+            for card in self.cards:
+                suit = card[-1]
+                if not suit in suits:
+                    suits[suit] = []
+                suits[suit].append(card[:-1])
+            self.__suits = suits
+        return self.__suits
+    suits = property(__get_suits, None)
+
+    def __get_relative_value(self):
+        if self.__relative_value is None:
+            if len(self._hand) + len(self._table) >= 5:
+                self.__relative_value = evaluate(
+                    [get_card_id(card) for card in self._hand] +
+                    [get_card_id(card) for card in self._table])
+            else:
+                self.__relative_value = self._get_relative_value()
+
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Hand '(%s) (%s)' has relative value 0x%.6X",
+                    ', '.join(self._hand), ', '.join(self._table),
+                    self.__relative_value)
+        return self.__relative_value
+    _relative_value = property(__get_relative_value, None)
+
     def is_royal(self):
         return self.is_straight(suit_matters=True, ace_high_matters=True)
 
@@ -73,12 +860,12 @@ class FullHand(object):
         counts = [len(x) for x in self.ranks.values()]
         counts.sort()
 
-        return counts in [[1, 1, 2, 3], [2, 2, 3], [1, 3, 3]]
+        return counts[-1] == 3 and len(counts) > 1 and counts[-2] >= 2
 
     def is_flush(self):
         counts = [len(x) for x in self.suits.values()]
         counts.sort()
-        return len(self.suits) in [1, 2, 3] and counts[-1] >= 5
+        return counts[-1] >= 5
 
     def is_straight(self, suit_matters=False, ace_high_matters=False):
         # XXX This needs cleanup, esp for these extra arguments
@@ -90,7 +877,8 @@ class FullHand(object):
 
         # Check for Ace being low case
         if ranks[-1][0] == 2 and ranks[0][0] == 14:
-            logger.debug("Found possible ace low straight")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Found possible ace low straight")
             ranks = ranks + [(1, ranks[0][1])]
 
         # The len math is here for dupes we removed and the low ace we
@@ -124,15 +912,16 @@ class FullHand(object):
     def is_trips(self):
         values = [len(x) for x in self.ranks.values()]
         values.sort()
-        return values == [1, 1, 1, 1, 3]
+        return values[-1] == 3
 
     def is_two_pair(self):
         values = [len(x) for x in self.ranks.values()]
         values.sort()
-        return values in [[1, 1, 1, 2, 2], [1, 2, 2, 2]]
+        return values.count(2) >= 2
 
     def is_one_pair(self):
-        return len(self.ranks) == 6
+        values = [len(x) for x in self.ranks.values()]
+        return 2 in values
 
     def as_int(self, rank):
         if rank =='t':
@@ -148,20 +937,6 @@ class FullHand(object):
         else:
             return int(rank)
 
-    def as_str(self, int_rank):
-        if int_rank == 10:
-            return 'T'
-        elif int_rank == 11:
-            return 'J'
-        elif int_rank == 12:
-            return 'Q'
-        elif int_rank == 13:
-            return 'K'
-        elif int_rank == 14:
-            return 'A'
-        else:
-            return str(int_rank)
-
     @staticmethod
     def _compute_card_values(cards, count, scale):
         hand_value = 0x0
@@ -328,69 +1103,342 @@ class FullHand(object):
         else:
             return self.single_value()
 
-    def __cmp__(self, other):
-        return cmp(self._relative_value, other._relative_value)
 
-    def _nth_digit(self, n):
-        sig = 0x10 ** n
-        return self.as_str((self._relative_value / sig) % 0x10)
+def get_winners(pockets, board):
+    """
+    Return a list of (pocket index, hand) tuples for the pockets holding
+    the best hand on the given board. Cards may be given as Card objects,
+    card ids or card strings.
+    """
+    board_codes = [get_card_id(card) for card in board]
+    board_mask = card_mask(board_codes)
 
-    def _rank_string(self, *ranks):
-        rank_string = "("
-        for rank in ranks:
-            rank_string += self._nth_digit(rank)
-        rank_string += ")"
-        return rank_string
+    hands = []
+    for i in range(len(pockets)):
+        pocket_codes = [get_card_id(card) for card in pockets[i]]
+        if len(pocket_codes) + len(board_codes) >= 5:
+            hand_value = evaluate_mask(card_mask(pocket_codes) | board_mask)
+            hands.append((i, HandValue(hand_value)))
+        else:
+            # Hand ended early, too few cards for the lookup tables:
+            hands.append((i, FullHand(_card_strings(pocket_codes),
+                                      _card_strings(board_codes))))
+
+    return find_winners([hand for (i, hand) in hands])
+
+
+def _partial_hands(codes, size):
+    """
+    Return (suit, rank mask, rank key) tuples for every combination of
+    size cards from codes. Suit is -1 unless all the cards are suited.
+    """
+    partials = []
+    for combo in itertools.combinations(codes, size):
+        suits = set()
+        rank_mask = 0
+        key = 0
+        for code in combo:
+            suit, rank = divmod(code, 13)
+            suits.add(suit)
+            rank_mask |= 1 << rank
+            key += RANK_KEYS[rank]
+        if len(suits) == 1:
+            partials.append((suits.pop(), rank_mask, key))
+        else:
+            partials.append((-1, rank_mask, key))
+    return partials
+
+
+def evaluate_omaha(pocket, board):
+    """
+    Return the relative value of the best Omaha hand made from exactly two
+    of the four pocket codes and three of the board codes.
+
+    Every pocket pair and board triple is reduced to a suit, rank mask and
+    rank key once, so each of the (up to) 60 five card hands costs a
+    single table lookup.
+    """
+    if _flush_table is None:
+        load_tables()
+    if len(board) < 3:
+        raise RounderException("Omaha needs at least three board cards")
+
+    five_card_table = _rank_tables[5]
+    board_partials = _partial_hands(board, 3)
+    best = 0
+    for (pair_suit, pair_mask, pair_key) in _partial_hands(pocket, 2):
+        for (suit, rank_mask, key) in board_partials:
+            if suit == pair_suit and suit >= 0:
+                hand_value = _flush_table[pair_mask | rank_mask]
+            else:
+                hand_value = _rank_value(five_card_table, pair_key + key)
+            if hand_value > best:
+                best = hand_value
+    return best
+
+
+def get_omaha_winners(pockets, board):
+    """
+    Omaha equivalent of get_winners(), each hand must use exactly two
+    pocket cards and three board cards.
+    """
+    board_codes = [get_card_id(card) for card in board]
+    hands = []
+    for pocket in pockets:
+        pocket_codes = [get_card_id(card) for card in pocket]
+        if len(board_codes) >= 3:
+            hands.append(HandValue(evaluate_omaha(pocket_codes,
+                                                  board_codes)))
+        else:
+            # Hand ended before the flop, nothing to choose from:
+            hands.append(FullHand(_card_strings(pocket_codes),
+                                  _card_strings(board_codes)))
+    return find_winners(hands)
 
-    def __repr__(self):
-        string_repr = ''
-        if self._relative_value >= 0x900000:
-            string_repr = "a royal flush " + self._rank_string(4, 3, 2, 1, 0)
-        elif self._relative_value > 0x800000:
-            string_repr = "a straight flush " + self._rank_string(4, 3, 2,
-                                                                  1, 0)
-        elif self._relative_value > 0x700000:
-            string_repr = "quads " + self._rank_string(4, 4, 4, 4, 3)
-        elif self._relative_value > 0x600000:
-            string_repr = "a full house " + self._rank_string(4, 4, 4, 3, 3)
-        elif self._relative_value > 0x500000:
-            string_repr = "a flush " + self._rank_string(4, 3, 2, 1, 0)
-        elif self._relative_value > 0x400000:
-            string_repr = "a straight " + self._rank_string(4, 3, 2, 1, 0)
-        elif self._relative_value > 0x300000:
-            string_repr = "trips " + self._rank_string(4, 4, 4, 3, 2)
-        elif self._relative_value > 0x200000:
-            string_repr = "two pair " + self._rank_string(4, 4, 3, 3, 2)
-        elif self._relative_value > 0x100000:
-            string_repr = "one pair " + self._rank_string(4, 4, 3, 2, 1)
+
+def get_five_card_winners(pockets, board=()):
+    """
+    Five card draw equivalent of get_winners(), each pocket is a complete
+    five card hand and there is no board.
+    """
+    if board:
+        raise RounderException("Five card games have no board")
+    return get_winners(pockets, board)
+
+
+# Showdown entry points, keyed by pypokereval game name:
+GAME_WINNERS = {
+    'holdem': get_winners,
+    'omaha': get_omaha_winners,
+    '5draw': get_five_card_winners,
+}
+
+
+def find_winners(hands):
+    """
+    Return (index, hand) tuples for the best of the given hands, in the
+    order they were given.
+    """
+    top_hand = max(hands)
+    return [(i, hands[i]) for i in range(len(hands)) if hands[i] == top_hand]
+
+
+class EvaluatorBackend(object):
+
+    """
+    Abstract hand ranker that games and PokerEval rank showdowns with.
+    Subclasses set name and implement winners(), and are made available by
+    name with register_backend().
+    """
+
+    __metaclass__ = ABCMeta
+
+    name = None
+
+    @abstractmethod
+    def winners(self, game, pockets, board):
+        """
+        Return the indexes of the pockets holding the best hand, in
+        ascending order.
+
+        game - One of the GAME_WINNERS names, 'holdem', 'omaha' or '5draw'.
+        pockets - List of pockets, each a list of Cards, card ids or card
+            strings.
+        board - The community cards, in the same forms.
+        """
+
+    def showdown(self, game, pockets, board):
+        """
+        Return (pocket index, hand) tuples for the winning pockets, like
+        the GAME_WINNERS functions. The backend picks the winners, their
+        hands are then described with the lookup tables.
+        """
+        return [(i, GAME_WINNERS[game]([pockets[i]], board)[0][1])
+                for i in self.winners(game, pockets, board)]
+
+
+def _top_indexes(values):
+    top_value = max(values)
+    return [i for i in range(len(values)) if values[i] == top_value]
+
+
+def _check_game(game):
+    if game not in GAME_WINNERS:
+        raise RounderException("Unsupported game: %s" % game)
+
+
+class PythonBackend(EvaluatorBackend):
+
+    """ The original pure Python ranker, FullHand's is_* predicates. """
+
+    name = 'python'
+
+    def _value(self, cards):
+        return FullHand(_card_strings(cards), [])._get_relative_value()
+
+    def winners(self, game, pockets, board):
+        _check_game(game)
+        board = [get_card_id(card) for card in board]
+        values = []
+        for pocket in pockets:
+            pocket = [get_card_id(card) for card in pocket]
+            if game == 'omaha' and len(board) >= 3:
+                values.append(max([self._value(list(pair) + list(triple))
+                    for pair in itertools.combinations(pocket, 2)
+                    for triple in itertools.combinations(board, 3)]))
+            else:
+                values.append(self._value(pocket + board))
+        return _top_indexes(values)
+
+
+class TablesBackend(EvaluatorBackend):
+
+    """ The lookup table evaluator, one hand at a time. """
+
+    name = 'tables'
+
+    def winners(self, game, pockets, board):
+        _check_game(game)
+        return [i for (i, hand) in GAME_WINNERS[game](pockets, board)]
+
+    def showdown(self, game, pockets, board):
+        _check_game(game)
+        return GAME_WINNERS[game](pockets, board)
+
+
+class NumpyBackend(EvaluatorBackend):
+
+    """ The lookup tables through evaluate_batch(), all pockets at once. """
+
+    name = 'numpy'
+
+    def winners(self, game, pockets, board):
+        _check_game(game)
+        board = [get_card_id(card) for card in board]
+        pockets = [[get_card_id(card) for card in pocket]
+                   for pocket in pockets]
+
+        if game == 'omaha' and len(board) >= 3:
+            hands = [list(pair) + list(triple)
+                     for pocket in pockets
+                     for pair in itertools.combinations(pocket, 2)
+                     for triple in itertools.combinations(board, 3)]
+            values = evaluate_batch(hands).reshape(len(pockets), -1)
+            values = values.max(axis=1)
+        elif len(pockets[0]) + len(board) >= 5:
+            values = evaluate_batch([pocket + board for pocket in pockets])
         else:
-            string_repr = "a high card " + self._rank_string(4, 3, 2, 1, 0)
+            # Too few cards for the lookup tables:
+            return TablesBackend().winners(game, pockets, board)
+        return _top_indexes(values.tolist())
 
-        return string_repr
 
+class PyPokerEvalBackend(EvaluatorBackend):
 
-def get_winners(pockets, board):
-    winners = []
+    """ The real pypoker-eval library, when it is installed. """
+
+    name = 'pypokereval'
+
+    def __init__(self):
+        self._poker_eval = pokereval.PokerEval()
+
+    def winners(self, game, pockets, board):
+        _check_game(game)
+        pockets = [[str(Card.from_id(get_card_id(card))) for card in pocket]
+                   for pocket in pockets]
+        board = [str(Card.from_id(get_card_id(card))) for card in board]
+        return self._poker_eval.winners(game=game, pockets=pockets,
+                                        board=board)['hi']
+
+
+# Evaluator backends by name:
+BACKENDS = {}
+
+DEFAULT_BACKEND = 'tables'
+
+# The backend PokerEval uses unless told otherwise, see get_backend():
+BACKEND_ENV = "ROUNDER_EVALUATOR_BACKEND"
+_configured_backend = None
 
-    hands = []
-    for i in range(len(pockets)):
-        hands.append((i, FullHand(pockets[i], board)))
 
-    hands.sort(reverse=True, cmp=lambda x, y: cmp(x[1], y[1]))
+def register_backend(backend_class):
+    """ Make an EvaluatorBackend subclass available by its name. """
+    BACKENDS[backend_class.name] = backend_class
 
-    top_hand = hands[0][1]
-    for hand in hands:
-        if not hand[1] == top_hand:
-            break
-        winners.append(hand)
 
-    return winners
+register_backend(PythonBackend)
+register_backend(TablesBackend)
+if numpy is not None:
+    register_backend(NumpyBackend)
+if pokereval is not None:
+    register_backend(PyPokerEvalBackend)
+
+
+def set_default_backend(name):
+    """ Set the backend used when none is requested, None to reset. """
+    global _configured_backend
+    if name is not None and name not in BACKENDS:
+        raise RounderException("Unknown or unavailable evaluator "
+            "backend: %s" % name)
+    _configured_backend = name
+
+
+def read_backend_config(conf_file):
+    """
+    Set the default backend from the "backend" option of the [evaluator]
+    section of an open config file, if it has one.
+    """
+    parser = ConfigParser.SafeConfigParser()
+    parser.readfp(conf_file)
+    if parser.has_option('evaluator', 'backend'):
+        set_default_backend(parser.get('evaluator', 'backend'))
+
+
+def configure_backend(conf_file_locations):
+    """
+    Set the default backend from the first of the given config files that
+    exists, see read_backend_config().
+    """
+    for location in conf_file_locations:
+        path = os.path.expanduser(location)
+        if os.path.exists(path):
+            conf_file = open(path)
+            try:
+                read_backend_config(conf_file)
+            finally:
+                conf_file.close()
+            return
+
+
+def get_backend(name=None):
+    """
+    Return a new instance of the named backend. Without a name, the
+    ROUNDER_EVALUATOR_BACKEND environment variable wins over the configured
+    default, which in turn wins over DEFAULT_BACKEND.
+    """
+    if name is None:
+        name = os.environ.get(BACKEND_ENV) or _configured_backend or \
+                DEFAULT_BACKEND
+    if name not in BACKENDS:
+        raise RounderException("Unknown or unavailable evaluator "
+            "backend: %s" % name)
+    return BACKENDS[name]()
 
 
 class PokerEval(object):
 
+    """
+    pypoker-eval compatible front end to the evaluator backends.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = get_backend(backend)
+
     def winners(self, game=None, pockets=None, board=None):
+        if game is None:
+            game = 'holdem'
+
         results = {}
-        results['hi'] = [x[0] for x in get_winners(pockets, board)]
+        results['hi'] = self.backend.winners(game, pockets, board)
 
         return results
@@ -34,9 +34,11 @@ the actual logging or display takes place.
 
 Likewise the events do not need an actual reference to the table as this is
 handled by the networking code.
-"""
 
-from rounder.dto import TableState
+Events sent to everyone at a table carry a TableStateDelta, the changes to
+the table since the last such event. Clients get a full TableState when they
+open the table and apply the deltas to it.
+"""
 
 
 class Event(object):
@@ -47,7 +49,9 @@ class Event(object):
     """
 
     def __init__(self, table):
-        self.table_state = TableState(table)
+        # Filled in by the table as the event is sent to all observers,
+        # events for a single player carry none:
+        self.state_delta = None
 
 
 class PlayerJoinedTable(Event):
@@ -21,7 +21,7 @@
 
 """ The Rounder Game Module """
 
-from logging import getLogger
+from logging import getLogger, INFO
 logger = getLogger("rounder.game")
 
 from collections import defaultdict
@@ -35,7 +35,7 @@ from rounder.currency import Currency
 from rounder.event import *
 from rounder.utils import find_action_in_list
 from rounder.dto import PotWinner, PotState
-from rounder.evaluator import get_winners
+from rounder.evaluator import TablesBackend, find_winners, get_backend
 
 GAME_ID_COUNTER = 1
 
@@ -64,7 +64,7 @@ def find_next_to_act(players, last_actor_position, raise_count):
             next_to_act = p
             break
 
-    logger.debug("next to act: %s" % str(next_to_act))
+    logger.debug("next to act: %s", next_to_act)
 
     return next_to_act
 
@@ -117,7 +117,7 @@ class GameStateMachine(object):
             raise RounderException("Attempted to advance beyond configured " +
                 "states.")
 
-        logger.debug("Advancing to state: " + self.states[self.current])
+        logger.debug("Advancing to state: %s", self.states[self.current])
 
         # Execute the callback method for this state:
         self.actions[self.states[self.current]]()
@@ -137,6 +137,10 @@ class Game(object):
         """
         Constructor expects the list of players to all be active, no one
         sitting out. (TODO: add check for this)
+
+        A game without a table runs headless: no events are built or sent
+        and players are only prompted through Player.prompt, see
+        rounder.simulator.
         """
         # Every hand played needs a unique ID:
         self.id = ++GAME_ID_COUNTER
@@ -162,9 +166,21 @@ class Game(object):
         self.pot_mgr = PotManager()
 
         # Create a new hand starting event and send to each player:
-        new_hand_event = NewHandStarted(self.table, self.players,
+        self._notify_all(NewHandStarted, self.players,
                 self.players[dealer_index].seat)
-        self.table.notify_all(new_hand_event)
+
+    def _notify_all(self, event_class, *args):
+        """
+        Build an event for the table and send it to everyone there. Headless
+        games skip both.
+        """
+        if self.table is not None:
+            self.table.notify_all(event_class(self.table, *args))
+
+    def _notify(self, username, event_class, *args):
+        """ Build an event and send it to one player, unless headless. """
+        if self.table is not None:
+            self.table.notify(username, event_class(self.table, *args))
 
     def process_action(self, action):
         """
@@ -214,6 +230,13 @@ class TexasHoldemGame(Game):
 
     """ Texas Hold'em, the Cadillac of poker. """
 
+    # Evaluator game name, tells the evaluator backend how to rank hands:
+    game_type = 'holdem'
+    hole_card_count = 2
+    # Players' HandStates follow their cards, they assume Hold'em's two
+    # hole cards:
+    tracks_hand_state = True
+
     def __init__(self, limit, players, dealer_index, sb_index, bb_index,
         callback, table=None, deck=None):
         """
@@ -234,23 +257,29 @@ class TexasHoldemGame(Game):
         self.big_blind = self.players[bb_index]
         self.__last_raise_amount = None
 
-        log_msg = "Starting new TexasHoldemGame: " + str(self.id)
-        log_msg += "\n  Limit: " + str(limit)
-        log_msg += "\n  Players:"
+        # Ranks the showdown, see rounder.evaluator.get_backend:
+        self.evaluator = get_backend()
+
         self.__positions = {} # TODO: Might need a better way to track seats
         i = 0
         for p in self.players:
-            code = ''
-            if p == self.dealer:
-                code += 'dealer '
-            if p == self.small_blind:
-                code += 'sb '
-            if p == self.big_blind:
-                code += 'bb '
-            log_msg += "\n    %s %s" % (p, code)
             self.__positions[p] = i
             i += 1
-        logger.info(log_msg)
+
+        if logger.isEnabledFor(INFO):
+            log_msg = "Starting new TexasHoldemGame: " + str(self.id)
+            log_msg += "\n  Limit: " + str(limit)
+            log_msg += "\n  Players:"
+            for p in self.players:
+                code = ''
+                if p == self.dealer:
+                    code += 'dealer '
+                if p == self.small_blind:
+                    code += 'sb '
+                if p == self.big_blind:
+                    code += 'bb '
+                log_msg += "\n    %s %s" % (p, code)
+            logger.info(log_msg)
         # Map player to their pending actions. Players are popped as they act
         # so an empty map means no pending actions and we're clear to advance
         # to the next state.
@@ -333,18 +362,20 @@ class TexasHoldemGame(Game):
         # self.pot_mgr.pots[0].bet_to_match = self.limit.big_blind
 
     def __deal_hole_cards(self):
-        """ Deal 2 cards face down to each player. """
+        """ Deal hole_card_count cards face down to each player. """
         self._check_if_finished()
-        for i in range(2): # execute loop twice
+        for i in range(self.hole_card_count):
             for p in self.players:
                 card = self._deck.draw_card()
                 p.cards.append(card)
+                if self.tracks_hand_state:
+                    p.hand_state.add(card)
 
         # Send out notifications, done separately so we only have to
         # send one event containing both cards:
-        for p in self.players:
-            hole_card_event = HoleCardsDealt(self.table, p.cards)
-            self.table.notify(p.username, hole_card_event)
+        if self.table is not None:
+            for p in self.players:
+                self._notify(p.username, HoleCardsDealt, p.cards)
 
     def __continue_betting_round(self):
         """
@@ -400,36 +431,47 @@ class TexasHoldemGame(Game):
         """
         Deal the flop and initiate the betting.
         """
-        logger.info("Table %s: Dealing the flop." % self.__get_table_id())
+        logger.info("Table %s: Dealing the flop.", self.__get_table_id())
         self._check_if_finished()
 
+        flop = []
         for i in range(3):
-            self.community_cards.append(self._deck.draw_card())
+            flop.append(self._deck.draw_card())
+        self.__deal_community_cards(flop)
 
-        event = CommunityCardsDealt(self.table, self.community_cards)
-        self.table.notify_all(event)
+        self._notify_all(CommunityCardsDealt, self.community_cards)
         self.__continue_betting_round()
 
     def turn(self):
         """ Deal the turn and initiate the betting. """
         self._check_if_finished()
         turn_card = self._deck.draw_card()
-        self.community_cards.append(turn_card)
+        self.__deal_community_cards([turn_card])
 
-        event = CommunityCardsDealt(self.table, [turn_card])
-        self.table.notify_all(event)
+        self._notify_all(CommunityCardsDealt, [turn_card])
         self.__continue_betting_round()
 
     def river(self):
         """ Deal the river and initiate the betting. """
         self._check_if_finished()
         river_card = self._deck.draw_card()
-        self.community_cards.append(river_card)
+        self.__deal_community_cards([river_card])
 
-        event = CommunityCardsDealt(self.table, [river_card])
-        self.table.notify_all(event)
+        self._notify_all(CommunityCardsDealt, [river_card])
         self.__continue_betting_round()
 
+    def __deal_community_cards(self, cards):
+        """
+        Add cards to the board and, if the game tracks them, to the hand
+        state of everyone still in the hand.
+        """
+        self.community_cards.extend(cards)
+        if not self.tracks_hand_state:
+            return
+        for p in self.players:
+            if not p.folded:
+                p.hand_state.add_cards(cards)
+
     def prompt_player(self, player, actions_list):
         """ Prompt the player with a list of actions. """
         self._check_if_finished()
@@ -449,8 +491,8 @@ class TexasHoldemGame(Game):
             fold = find_action_in_list(Fold, actions_list)
             self.process_action(player, fold)
         else:
-            logger.debug("Prompting %s with actions: %s" % (player.username,
-                actions_list))
+            logger.debug("Prompting %s with actions: %s", player.username,
+                actions_list)
             # TODO: Two prompt calls here, should probably be one:
             player.prompt(actions_list)
             if self.table != None:
@@ -467,14 +509,14 @@ class TexasHoldemGame(Game):
         """
         # If the player sitting out is the one we were currently awaiting a
         # response from, simulate a fold:
-        logger.debug("Player sitting out: %s" % player.username)
+        logger.debug("Player sitting out: %s", player.username)
         if player in self.pending_actions.keys():
             logger.debug("   player had pending actions, simulating fold.")
             fold = find_action_in_list(Fold, self.pending_actions[player])
             self.process_action(player, fold)
 
     def process_action(self, player, action):
-        logger.info("Incoming action: " + str(action))
+        logger.info("Incoming action: %s", action)
         self._check_if_finished()
 
         if isinstance(action, Call):
@@ -485,10 +527,9 @@ class TexasHoldemGame(Game):
             player.bet(req_amount, self.__raise_count)
 
             if action.amount == 0:
-                logger.debug("Table %s: %s checks" % (self.table.id,
-                    player.username))
-            event = PlayerCalled(self.table, player.username, action.amount)
-            self.table.notify_all(event)
+                logger.debug("Table %s: %s checks", self.__get_table_id(),
+                    player.username)
+            self._notify_all(PlayerCalled, player.username, action.amount)
 
         if isinstance(action, Raise):
             req_amount = self.__current_bet + action.amount - \
@@ -505,14 +546,12 @@ class TexasHoldemGame(Game):
             self.__current_bet += action.amount
             player.bet(req_amount, self.__raise_count)
 
-            event = PlayerRaised(self.table, player.username, action.amount)
-            self.table.notify_all(event)
+            self._notify_all(PlayerRaised, player.username, action.amount)
 
         if isinstance(action, Fold):
             player.folded = True
             self.pot_mgr.fold(player)
-            event = PlayerFolded(self. table, player.username)
-            self.table.notify_all(event)
+            self._notify_all(PlayerFolded, player.username)
 
         # Remove this player from the pending actions map:
         self.__last_actor = player
@@ -549,11 +588,10 @@ class TexasHoldemGame(Game):
         self.finished = True
 
         # Before calculating winners, notify clients that the game is ending:
-        event = GameEnding(self.table)
-        self.table.notify_all(event)
+        self._notify_all(GameEnding)
 
         players = filter(lambda x: x.folded == False, self.players)
-        if len(players) > 1:
+        if len(players) > 1 and self.table is not None:
             # Show hole cards for anyone who hasn't folded:
             # TODO: Implement optional showing of cards before we process hand
             # winners here?
@@ -562,12 +600,9 @@ class TexasHoldemGame(Game):
             # loop through from there:
             for p in self.players:
                 if p.in_hand:
-                    event = PlayerShowedCards(self.table, p.username, p.cards)
-                    self.table.notify_all(event)
+                    self._notify_all(PlayerShowedCards, p.username, p.cards)
 
-        board = []
-        for c in self.community_cards:
-            board.append(str(c).lower())
+        board = [card.id for card in self.community_cards]
 
         # List of tuples, (PotState, [PotWinner, ...]):
         results = []
@@ -576,19 +611,25 @@ class TexasHoldemGame(Game):
             winners = []
             players = filter(lambda x: x.folded == False, pot.players)
 
-            cards = self.__cards_for_players(players)
-            result = get_winners(cards, board)
+            if self.game_type == 'holdem' and len(board) == 5 and \
+                    isinstance(self.evaluator, TablesBackend):
+                # Hand states already hold each player's seven cards:
+                result = find_winners([p.hand_state.hand() for p in players])
+            else:
+                cards = self.__cards_for_players(players)
+                result = self.evaluator.showdown(self.game_type, cards,
+                                                 board)
 
             for index, hand in result:
-                logger.debug("%s wins with %s" % (players[index].username,
-                    hand))
+                logger.debug("%s wins with %s", players[index].username,
+                    hand)
                 winners.append((players[index], str(hand)))
 
             pot_winners = self.__payout_pot(pot, winners)
-            results.append((PotState(pot), pot_winners))
+            if self.table is not None:
+                results.append((PotState(pot), pot_winners))
 
-        event = GameOver(self.table, results)
-        self.table.notify_all(event)
+        self._notify_all(GameOver, results)
 
         for p in self.players:
             p.reset()
@@ -611,13 +652,15 @@ class TexasHoldemGame(Game):
         pot_winners = []
         if player_count == 1:
             player, hand = players[0]
-            logger.info("Single winner of pot amount %d" % pot.amount)
+            logger.info("Single winner of pot amount %s", pot.amount)
             player.add_chips(pot.amount)
             pot_winners.append(PotWinner(player.username, pot.amount, hand))
         else:
-            logger.info("Splitting pot of %d between %d winners" %
-                (pot.amount, player_count))
-            per_player = pot.amount / player_count
+            logger.info("Splitting pot of %s between %d winners",
+                pot.amount, player_count)
+            # Round down, the odd cents go out one at a time below:
+            per_player = Currency.from_cents(
+                Currency(pot.amount).cents // player_count)
             remainder = pot.amount - (per_player * player_count)
 
             for player, hand in players:
@@ -628,15 +671,26 @@ class TexasHoldemGame(Game):
 
                 player.add_chips(winnings)
                 pot_winners.append(PotWinner(player.username, winnings, hand))
-                logger.info("%s won %s" % (player.username, winnings))
+                logger.info("%s won %s", player.username, winnings)
 
         return pot_winners
 
     def __cards_for_players(self, players):
         pockets = []
         for player in players:
-            cards = []
-            cards.append(str(player.cards[0]).lower())
-            cards.append(str(player.cards[1]).lower())
-            pockets.append(cards)
+            pockets.append([card.id for card in player.cards])
         return pockets
+
+
+class OmahaGame(TexasHoldemGame):
+
+    """
+    Omaha, played like Hold'em with four hole cards. Hands must use exactly
+    two of them.
+    """
+
+    game_type = 'omaha'
+    hole_card_count = 4
+    # A HandState would mix all four hole cards with the board, players'
+    # stay empty:
+    tracks_hand_state = False
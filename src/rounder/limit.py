@@ -141,9 +141,9 @@ class NoLimit(Limit):
             last_raise=None):
         # NOTE: bet_level ignored for no-limit
         logger.debug("creating no-limit actions")
-        logger.debug("   player: %s" % player)
-        logger.debug("   in_pot: %s" % in_pot)
-        logger.debug("   current_bet: %s" % current_bet)
+        logger.debug("   player: %s", player)
+        logger.debug("   in_pot: %s", in_pot)
+        logger.debug("   current_bet: %s", current_bet)
 
         actions = []
 
@@ -27,7 +27,7 @@ from twisted.cred import credentials
 from logging import getLogger
 logger = getLogger("rounder.network.client")
 
-from rounder.network.serialize import loads
+from rounder.network.codec import CEREALIZER, new_codec
 
 
 class RounderNetworkClient(pb.Referenceable):
@@ -50,14 +50,18 @@ class RounderNetworkClient(pb.Referenceable):
     X_success_failure_cb.
     """
 
-    def __init__(self, ui):
+    def __init__(self, ui, wire_format=CEREALIZER):
         """
         Initializes a network client.
 
             ui = Reference to a client user interface where we can pass
                 responses on to.
+            wire_format = Format to ask the server to send messages in,
+                see rounder.network.codec.
         """
         self.ui = ui
+        self.wire_format = wire_format
+        self.codec = new_codec(wire_format)
         self.tables = {} # Hash of table id's to TableUplink objects
         self.username = None
         self.host = None
@@ -88,6 +92,9 @@ class RounderNetworkClient(pb.Referenceable):
         """ Callback for successful connection. """
         logger.debug("connected!")
         self.perspective = perspective
+        if self.wire_format != CEREALIZER:
+            d = perspective.callRemote("set_wire_format", self.wire_format)
+            d.addErrback(self.log_error)
         # TODO: Need to give a reference to myself? Somebody had a reference to
         # call connect with in the first place...
         self.ui.connect_success(self)
@@ -110,7 +117,7 @@ class RounderNetworkClient(pb.Referenceable):
         logmsg = "got table list:"
         table_listings = []
         for t in data:
-            temp = loads(t)
+            temp = self.codec.loads(t)
             logmsg += "\n   %s" % temp
             table_listings.append(temp)
         logger.debug(logmsg)
@@ -129,10 +136,10 @@ class RounderNetworkClient(pb.Referenceable):
     def open_table_success_cb(self, data):
         """ Callback for a successful table open. """
         table_view = data[0]
-        table_state = loads(data[1])
+        table_state = self.codec.loads(data[1])
         logger.debug("Table opened successfully: %s" % table_state.name)
 
-        table = TableUplink(table_view, table_state)
+        table = TableUplink(table_view, table_state, self.codec)
         table.ui = self.ui
         self.tables[table_state.id] = table
         self.ui.open_table_success(table)
@@ -150,12 +157,27 @@ class RounderNetworkClient(pb.Referenceable):
         """
         Display an incoming event to the user.
         """
-        deserialized_event = loads(event)
+        deserialized_event = self.codec.loads(event)
         logger.debug("Table %s: received event: %s" % (table_id,
             deserialized_event))
         # TODO
         self.tables[table_id].process_event(deserialized_event)
 
+    def remote_notify_many(self, events):
+        """
+        Display several incoming events, a list of (table id, event)
+        tuples in the order they happened.
+        """
+        for table_id, event in events:
+            self.remote_notify(table_id, event)
+
+    def remote_define_names(self, names):
+        """
+        Learn the usernames behind ids in binary messages, always sent
+        before the first message using them.
+        """
+        self.codec.names.define(names)
+
     def remote_print(self, msg):
         logger.warn("Server said: %s" % msg)
 
@@ -168,16 +190,22 @@ class TableUplink(pb.Referenceable):
     Thin wrapper over the Rounder server's Twisted TableView object.
     """
 
-    def __init__(self, table_view, table_state):
+    def __init__(self, table_view, table_state, codec=None):
         """
         Initialize the table with the given remote view and state received
-        from the server.
+        from the server, and the codec for the connection's wire format.
         """
+        if codec is None:
+            codec = new_codec(CEREALIZER)
+        self.codec = codec
         self.__view = table_view
         self.state = table_state
         self.table_id = self.state.id
         self.ui = None
 
+        # True while waiting on a fresh snapshot after missing a delta:
+        self.resyncing = False
+
     def log_error(self, failure):
         self.ui.log_error(failure)
 
@@ -213,7 +241,7 @@ class TableUplink(pb.Referenceable):
         try:
             deserialized_actions = []
             for action in serialized_actions:
-                action = loads(action)
+                action = self.codec.loads(action)
                 logger.debug("   %s" % action)
                 deserialized_actions.append(action)
 
@@ -243,10 +271,47 @@ class TableUplink(pb.Referenceable):
         """
         Called by the parent network client when it receives and event we
         need to display to the user for this table.
+
+        Brings the table state up to date with the event's delta first. If
+        a delta was missed, asks the server for a fresh snapshot and
+        ignores deltas until it arrives.
         """
-        self.state = event.table_state
+        delta = event.state_delta
+        if delta is not None and not self.resyncing:
+            if delta.sequence == self.state.sequence + 1:
+                delta.apply(self.state)
+            elif delta.sequence > self.state.sequence:
+                logger.warn("Table %s: missed table state delta %s, "
+                    "requesting snapshot" % (self.table_id,
+                    self.state.sequence + 1))
+                self.request_snapshot()
         self.ui.process_event(event)
 
+    def request_snapshot(self):
+        """ Ask the server for the current table state. """
+        self.resyncing = True
+        d = self.__view.callRemote("snapshot")
+        d.addCallback(self.request_snapshot_success_cb)
+        d.addErrback(self.request_snapshot_failure_cb)
+
+    def request_snapshot_success_cb(self, data):
+        """ Callback for a snapshot, replaces the table state. """
+        state = self.codec.loads(data)
+        logger.debug("Table %s: received snapshot %s" % (self.table_id,
+            state.sequence))
+        self.resyncing = False
+        if state.sequence >= self.state.sequence:
+            self.state = state
+
+    def request_snapshot_failure_cb(self, failure):
+        """
+        Errback for a snapshot. Stops ignoring deltas, so the next one
+        finds the gap again and asks for another snapshot.
+        """
+        logger.warn("Table %s: snapshot request failed" % self.table_id)
+        self.resyncing = False
+        self.log_error(failure)
+
     def send_chat(self, message):
         """
         Send a text message to the other players at the table.
@@ -0,0 +1,425 @@
+#   Rounder - Poker for the GNOME Desktop
+#
+#   Copyright (C) 2009 Devan Goodwin <dgoodwin@dangerouslyinc.com>
+#   Copyright (C) 2009 James Bowes <jbowes@dangerouslyinc.com>
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+#   02110-1301  USA
+
+"""
+Wire formats.
+
+Each connection picks the format its messages are serialized in. The
+default is cerealizer's, see rounder.network.serialize. The binary format
+is schema driven: it only knows the classes in SCHEMAS, the same ones
+register_message_classes() hands to cerealizer, and writes just their
+attributes in a fixed order behind an integer type tag.
+
+Within the binary format cards are a single byte, their id, Currency is a
+varint number of cents and usernames are varint ids from a NameTable. The
+server hands ids out in one NameTable shared by every connection, so an
+event is still serialized once however many users it goes to, and each
+connection is sent the names behind any ids it has not seen yet before the
+message using them.
+"""
+
+from logging import getLogger
+logger = getLogger("rounder.network.codec")
+
+from rounder.action import PostBlind, Call, Raise, Fold
+from rounder.card import Card, Suit
+from rounder.core import RounderException
+from rounder.currency import Currency
+from rounder.dto import TableState, TableStateDelta, PlayerState, \
+        TableListing, PotState, PotWinner
+from rounder.event import Event, PlayerJoinedTable, PlayerLeftTable, \
+        PlayerPrompted, PlayerSatOut, NewHandStarted, HandCancelled, \
+        PlayerPostedBlind, HoleCardsDealt, CommunityCardsDealt, \
+        PlayerCalled, PlayerRaised, PlayerFolded, GameEnding, \
+        PlayerShowedCards, GameOver, PlayerSentChatMessage
+from rounder.limit import Limit, FixedLimit
+from rounder.network.serialize import dumps, loads
+
+CEREALIZER = 'cerealizer'
+BINARY = 'binary'
+WIRE_FORMATS = (CEREALIZER, BINARY)
+
+# Kinds of schema fields:
+ANY = 0        # any value, behind a type tag
+INT = 1        # zigzag varint
+BOOL = 2       # one byte
+CURRENCY = 3   # zigzag varint of cents
+CARDS = 4      # varint count, then one byte per card
+NAME = 5       # varint id in the NameTable
+
+# Attributes written for each class, in order. A class's type tag is
+# FIRST_CLASS_TAG plus its index here, so only ever append to this list:
+SCHEMAS = [
+    (Suit, (('uniqueInt', INT), ('display', ANY), ('longDisplay', ANY))),
+    (TableState, (('id', INT), ('sequence', INT), ('name', ANY),
+        ('limit', ANY), ('hand_underway', BOOL), ('community_cards', CARDS),
+        ('dealer_seat_num', ANY), ('pots', ANY), ('round_bets', CURRENCY),
+        ('seats', ANY))),
+    (TableStateDelta, (('sequence', INT), ('changes', ANY),
+        ('seat_count', INT), ('seats', ANY))),
+    (TableListing, (('id', INT), ('name', ANY), ('limit', ANY),
+        ('player_count', INT))),
+    (PotState, (('amount', CURRENCY), ('is_main_pot', BOOL))),
+    (PotWinner, (('username', NAME), ('amount', CURRENCY), ('hand', ANY))),
+    (PlayerState, (('username', NAME), ('chips', CURRENCY), ('seat', ANY),
+        ('sitting_out', BOOL), ('folded', BOOL), ('num_cards', INT))),
+    (PostBlind, (('amount', CURRENCY), )),
+    (Call, (('amount', CURRENCY), )),
+    (Raise, (('max_bet', ANY), ('min_bet', CURRENCY),
+        ('current_bet', CURRENCY), ('amount', ANY))),
+    (Fold, ()),
+    (Limit, ()),
+    (FixedLimit, (('small_bet', CURRENCY), ('big_bet', CURRENCY),
+        ('small_blind', CURRENCY), ('big_blind', CURRENCY))),
+
+    (Event, (('state_delta', ANY), )),
+    (PlayerJoinedTable, (('state_delta', ANY), ('username', NAME),
+        ('seat_num', INT))),
+    (PlayerLeftTable, (('state_delta', ANY), ('username', NAME),
+        ('seat_num', INT))),
+    (PlayerPrompted, (('state_delta', ANY), ('username', NAME))),
+    (PlayerSatOut, (('state_delta', ANY), ('username', NAME))),
+    (NewHandStarted, (('state_delta', ANY), ('seats_dealt_in', ANY),
+        ('dealer_seat_num', ANY))),
+    (HandCancelled, (('state_delta', ANY), )),
+    (PlayerPostedBlind, (('state_delta', ANY), ('username', NAME),
+        ('amount', CURRENCY))),
+    (HoleCardsDealt, (('state_delta', ANY), ('cards', CARDS))),
+    (CommunityCardsDealt, (('state_delta', ANY), ('cards', CARDS))),
+    (PlayerCalled, (('state_delta', ANY), ('username', NAME),
+        ('amount', CURRENCY))),
+    (PlayerRaised, (('state_delta', ANY), ('username', NAME),
+        ('amount', CURRENCY))),
+    (PlayerFolded, (('state_delta', ANY), ('username', NAME))),
+    (GameEnding, (('state_delta', ANY), )),
+    (PlayerShowedCards, (('state_delta', ANY), ('username', NAME),
+        ('cards', CARDS))),
+    (GameOver, (('state_delta', ANY), ('results', ANY))),
+    (PlayerSentChatMessage, (('state_delta', ANY), ('username', NAME),
+        ('message', ANY))),
+]
+
+# Type tags of values written as ANY:
+NONE_TAG = 0
+FALSE_TAG = 1
+TRUE_TAG = 2
+INT_TAG = 3
+STR_TAG = 4
+UNICODE_TAG = 5
+LIST_TAG = 6
+TUPLE_TAG = 7
+DICT_TAG = 8
+CURRENCY_TAG = 9
+CARD_TAG = 10
+FIRST_CLASS_TAG = 32
+
+_BYTES = [chr(i) for i in range(256)]
+
+
+class NameTable(object):
+
+    """
+    Usernames and the ids standing in for them in binary messages.
+
+    The server hands out ids in order of first use and never reuses one.
+    Clients learn them through define().
+
+    Nothing is ever released: the server's table keeps every username it
+    has serialized since it started, whether or not any connection still
+    knows it. It grows by one id and one name per distinct username, which
+    is bounded by the user accounts seen and is small next to what each
+    user costs otherwise, but a long running server with heavy account
+    churn will want a restart now and then. Reclaiming an id would need
+    every connection that was sent it gone, and no event still queued or
+    in flight using it, or a client would decode it to the wrong name.
+    """
+
+    def __init__(self):
+        self.ids = {}
+        self.names = {}
+
+    def id_for(self, name):
+        """ Return the id of a name, giving it the next one if it has none. """
+        name_id = self.ids.get(name)
+        if name_id is None:
+            name_id = self.ids[name] = len(self.ids)
+            self.names[name_id] = name
+        return name_id
+
+    def lookup(self, name_ids):
+        """ Return a dict of the names behind some ids. """
+        names = {}
+        for name_id in name_ids:
+            names[name_id] = self.names[name_id]
+        return names
+
+    def define(self, names):
+        """ Learn the names behind ids, a dict as returned by lookup(). """
+        for name_id, name in names.items():
+            self.names[name_id] = name
+            self.ids[name] = name_id
+
+
+def _write_varint(out, value):
+    while value > 0x7f:
+        out.append(_BYTES[value & 0x7f | 0x80])
+        value >>= 7
+    out.append(_BYTES[value])
+
+
+def _read_varint(data, pos):
+    value = 0
+    shift = 0
+    while True:
+        byte = ord(data[pos])
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def _write_signed(out, value):
+    # Zigzag, so small negative numbers stay short:
+    if value >= 0:
+        _write_varint(out, value << 1)
+    else:
+        _write_varint(out, (-value << 1) - 1)
+
+
+def _read_signed(data, pos):
+    value, pos = _read_varint(data, pos)
+    if value & 1:
+        return -((value + 1) >> 1), pos
+    return value >> 1, pos
+
+
+def _write_string(out, value):
+    _write_varint(out, len(value))
+    out.append(value)
+
+
+def _read_string(data, pos):
+    length, pos = _read_varint(data, pos)
+    end = pos + length
+    if end > len(data):
+        raise ValueError("String runs past the end of the message")
+    return data[pos:end], end
+
+
+class BinaryCodec(object):
+
+    """
+    Compact schema driven serialization of the message classes.
+
+    Usernames are looked up in, or on the server added to, the NameTable
+    given. encode() returns the ids a message used along with its bytes,
+    so the caller can make sure the receiving end knows them.
+    """
+
+    wire_format = BINARY
+
+    def __init__(self, names=None):
+        if names is None:
+            names = NameTable()
+        self.names = names
+
+    def encode(self, obj):
+        """ Return the serialized object and the set of name ids it uses. """
+        out = []
+        name_ids = set()
+        self.__write(out, name_ids, obj)
+        return ''.join(out), name_ids
+
+    def dumps(self, obj):
+        return self.encode(obj)[0]
+
+    def loads(self, data):
+        try:
+            obj, pos = self.__read(data, 0)
+        except (IndexError, KeyError, ValueError), e:
+            raise RounderException("Unable to decode message: %r" % e)
+        if pos != len(data):
+            raise RounderException("Unable to decode message: %d bytes "
+                "left over" % (len(data) - pos))
+        return obj
+
+    def __write(self, out, name_ids, value):
+        value_class = value.__class__
+        schema = _CLASS_SCHEMAS.get(value_class)
+        if schema is not None:
+            tag, fields = schema
+            _write_varint(out, tag)
+            attributes = value.__dict__
+            for name, kind in fields:
+                field = attributes[name]
+                if kind == ANY:
+                    self.__write(out, name_ids, field)
+                elif kind == INT:
+                    _write_signed(out, field)
+                elif kind == BOOL:
+                    out.append(field and '\x01' or '\x00')
+                elif kind == CURRENCY:
+                    _write_signed(out, field.cents)
+                elif kind == CARDS:
+                    _write_varint(out, len(field))
+                    out.append(''.join([_BYTES[card.id] for card in field]))
+                else:
+                    name_id = self.names.id_for(field)
+                    name_ids.add(name_id)
+                    _write_varint(out, name_id)
+        elif value is None:
+            out.append(_BYTES[NONE_TAG])
+        elif value_class is bool:
+            out.append(_BYTES[value and TRUE_TAG or FALSE_TAG])
+        elif value_class is int or value_class is long:
+            out.append(_BYTES[INT_TAG])
+            _write_signed(out, value)
+        elif value_class is Currency:
+            out.append(_BYTES[CURRENCY_TAG])
+            _write_signed(out, value.cents)
+        elif value_class is Card:
+            out.append(_BYTES[CARD_TAG])
+            out.append(_BYTES[value.id])
+        elif value_class is str:
+            out.append(_BYTES[STR_TAG])
+            _write_string(out, value)
+        elif value_class is unicode:
+            out.append(_BYTES[UNICODE_TAG])
+            _write_string(out, value.encode('utf-8'))
+        elif value_class is list or value_class is tuple:
+            out.append(_BYTES[value_class is list and LIST_TAG or TUPLE_TAG])
+            _write_varint(out, len(value))
+            for item in value:
+                self.__write(out, name_ids, item)
+        elif value_class is dict:
+            out.append(_BYTES[DICT_TAG])
+            _write_varint(out, len(value))
+            for key, item in value.items():
+                self.__write(out, name_ids, key)
+                self.__write(out, name_ids, item)
+        else:
+            raise RounderException("Cannot serialize %s" % value_class)
+
+    def __read(self, data, pos):
+        tag, pos = _read_varint(data, pos)
+        if tag >= FIRST_CLASS_TAG:
+            value_class, fields = SCHEMAS[tag - FIRST_CLASS_TAG]
+            attributes = {}
+            for name, kind in fields:
+                if kind == ANY:
+                    field, pos = self.__read(data, pos)
+                elif kind == INT:
+                    field, pos = _read_signed(data, pos)
+                elif kind == BOOL:
+                    field = data[pos] != '\x00'
+                    pos += 1
+                elif kind == CURRENCY:
+                    cents, pos = _read_signed(data, pos)
+                    field = Currency.from_cents(cents)
+                elif kind == CARDS:
+                    count, pos = _read_varint(data, pos)
+                    field = [Card.from_id(ord(byte)) for byte in
+                             data[pos:pos + count]]
+                    if len(field) != count:
+                        raise ValueError("Cards run past the end of the "
+                            "message")
+                    pos += count
+                else:
+                    name_id, pos = _read_varint(data, pos)
+                    field = self.names.names[name_id]
+                attributes[name] = field
+            value = value_class.__new__(value_class)
+            value.__dict__ = attributes
+            return value, pos
+
+        if tag == NONE_TAG:
+            return None, pos
+        if tag == FALSE_TAG:
+            return False, pos
+        if tag == TRUE_TAG:
+            return True, pos
+        if tag == INT_TAG:
+            return _read_signed(data, pos)
+        if tag == CURRENCY_TAG:
+            cents, pos = _read_signed(data, pos)
+            return Currency.from_cents(cents), pos
+        if tag == CARD_TAG:
+            return Card.from_id(ord(data[pos])), pos + 1
+        if tag == STR_TAG:
+            return _read_string(data, pos)
+        if tag == UNICODE_TAG:
+            value, pos = _read_string(data, pos)
+            return value.decode('utf-8'), pos
+        if tag == LIST_TAG or tag == TUPLE_TAG:
+            count, pos = _read_varint(data, pos)
+            items = []
+            for i in xrange(count):
+                item, pos = self.__read(data, pos)
+                items.append(item)
+            if tag == TUPLE_TAG:
+                return tuple(items), pos
+            return items, pos
+        if tag == DICT_TAG:
+            count, pos = _read_varint(data, pos)
+            items = {}
+            for i in xrange(count):
+                key, pos = self.__read(data, pos)
+                item, pos = self.__read(data, pos)
+                items[key] = item
+            return items, pos
+        raise ValueError("Unknown type tag %d" % tag)
+
+
+# Type tag and fields by class:
+_CLASS_SCHEMAS = dict([(value_class, (FIRST_CLASS_TAG + i, fields))
+                       for i, (value_class, fields) in enumerate(SCHEMAS)])
+
+
+class CerealizerCodec(object):
+
+    """
+    The original wire format, register_message_classes() must have been
+    called. Messages carry usernames in full, so there is no NameTable.
+    """
+
+    wire_format = CEREALIZER
+    names = None
+
+    def encode(self, obj):
+        return dumps(obj), ()
+
+    def dumps(self, obj):
+        return dumps(obj)
+
+    def loads(self, data):
+        return loads(data)
+
+
+def new_codec(wire_format, names=None):
+    """
+    Return a codec for the named wire format. Binary codecs use the given
+    NameTable, or a new one.
+    """
+    if wire_format == CEREALIZER:
+        return CerealizerCodec()
+    if wire_format == BINARY:
+        return BinaryCodec(names)
+    raise RounderException("Unknown wire format: %s" % wire_format)
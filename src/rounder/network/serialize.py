@@ -24,8 +24,8 @@ from logging import getLogger
 logger = getLogger("rounder.serialize")
 
 import cerealizer
-from rounder.dto import TableState, PlayerState, TableListing, \
-        PotState, PotWinner
+from rounder.dto import TableState, TableStateDelta, PlayerState, \
+        TableListing, PotState, PotWinner
 from rounder.card import Card, Suit
 from rounder.currency import Currency
 from rounder.action import PostBlind, Call, Raise, Fold
@@ -33,16 +33,54 @@ from rounder.limit import Limit, FixedLimit
 from rounder.event import ALL_EVENTS
 
 
+class CardHandler(cerealizer.Handler):
+    """
+    Cerealizer handler sending a Card as its integer id, so the receiving
+    side gets back one of the interned cards rather than a new object.
+    """
+
+    classname = "rounder.card.Card\n"
+
+    def dump_obj(self, obj, dumper, s):
+        s.write("%s%d\n" % (self.classname, obj.id))
+
+    def undump_obj(self, dumper, s):
+        return Card.from_id(int(s.readline()))
+
+
+class CurrencyHandler(cerealizer.Handler):
+    """
+    Cerealizer handler sending a Currency as its whole number of cents.
+    Currency is immutable and small amounts are shared, so it cannot be
+    rebuilt attribute by attribute.
+    """
+
+    classname = "rounder.currency.Currency\n"
+
+    def dump_obj(self, obj, dumper, s):
+        s.write("%s%d\n" % (self.classname, obj.cents))
+
+    def undump_obj(self, dumper, s):
+        return Currency.from_cents(int(s.readline()))
+
+
 def register_message_classes():
     """ Registers all classes we'll be serializing with cerealizer. """
+    for message_class, handler in ((Card, CardHandler()),
+            (Currency, CurrencyHandler())):
+        try:
+            cerealizer.register(message_class, handler)
+        except ValueError:
+            logger.debug("Class already registered w/ cerealizer: %s" %
+                message_class)
+
     l = [
-        Card,
         Suit,
         TableState,
+        TableStateDelta,
         TableListing,
         PotState,
         PotWinner,
-        Currency,
         PlayerState,
         PostBlind,
         Call,
@@ -23,22 +23,197 @@
 from zope.interface import implements
 from twisted.spread import pb
 from twisted.cred import checkers, portal, credentials, error
-from twisted.internet import reactor, defer
+from twisted.internet import reactor, defer, interfaces
 from twisted.python import failure
 
+import time
+
 from logging import getLogger
 logger = getLogger("rounder.network.server")
 
 from rounder.limit import FixedLimit
 from rounder.table import Table
 from rounder.currency import Currency
-from rounder.dto import TableState, TableListing
+from rounder.dto import TableListing
 from rounder.player import Player
 from rounder.core import RounderException
-from rounder.network.serialize import register_message_classes, dumps
+from rounder.network.serialize import register_message_classes
+from rounder.network.codec import CEREALIZER, WIRE_FORMATS, NameTable, \
+        new_codec
 
 DEFAULT_SERVER_PORT = 35100
 
+# Limits on each user's backlog of messages: events queued to be sent, plus
+# calls sent but not yet answered, and bytes of queued events. Over either
+# high watermark, or with the connection's write buffer full, the user is
+# sent nothing more but prompts, and loses events about tables they only
+# observe, until what is already on its way to them is back under the low
+# watermark and the write buffer has drained:
+HIGH_WATER_MESSAGES = 2000
+LOW_WATER_MESSAGES = 500
+HIGH_WATER_BYTES = 512 * 1024
+
+# How long a user can stay over the limits before being sat out at the
+# tables they play at, and before being disconnected:
+SIT_OUT_SECONDS = 10
+DISCONNECT_SECONDS = 30
+
+# How often a held back queue is checked again:
+RETRY_SECONDS = 0.25
+
+
+class WriteBufferWatch(object):
+
+    """
+    Push producer registered on a user's connection only to learn when its
+    write buffer is full: the transport pauses it while it holds more unsent
+    data than it wants to buffer, and resumes it once that has drained. This
+    works the same over TCP and TLS, and nothing is ever produced.
+
+    A transport takes a single producer. If the connection has none to
+    offer, or already has one, the watch stays unregistered and never
+    reports the buffer full, the user's backlog is then measured on queued
+    and unanswered events alone. Rounder sends no pb.Pager pages, which is
+    what the broker registers its own producer for.
+    """
+
+    implements(interfaces.IPushProducer)
+
+    def __init__(self):
+        self.transport = None
+        self.paused = False
+
+    def register(self, remote):
+        """
+        Watch the connection behind a remote reference, returns True if
+        the transport took the watch.
+        """
+        transport = getattr(getattr(remote, 'broker', None), 'transport',
+            None)
+        # TLS connections register producers without declaring IConsumer:
+        if not hasattr(transport, 'registerProducer'):
+            logger.warn("Not watching write buffer, transport %r takes no "
+                "producers" % transport)
+            return False
+        try:
+            transport.registerProducer(self, True)
+        except RuntimeError, e:
+            logger.warn("Not watching write buffer: %s" % e)
+            return False
+        self.transport = transport
+        return True
+
+    def unregister(self):
+        """ Stop watching the connection, if still watched. """
+        if self.transport is not None:
+            self.transport.unregisterProducer()
+        self.transport = None
+        self.paused = False
+
+    def pauseProducing(self):
+        self.paused = True
+
+    def resumeProducing(self):
+        self.paused = False
+
+    def stopProducing(self):
+        # The connection is gone, and has dropped its producer:
+        self.transport = None
+        self.paused = False
+
+
+class EventCounter(object):
+
+    """
+    Running totals for one type of event sent to clients: how many were
+    sent, time spent serializing them, their serialized size and how many
+    users each was fanned out to.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.events = 0
+        self.serialize_seconds = 0.0
+        self.bytes = 0
+        self.recipients = 0
+
+    def add(self, seconds, size, recipients):
+        self.events += 1
+        self.serialize_seconds += seconds
+        self.bytes += size
+        self.recipients += recipients
+
+    def __repr__(self):
+        if not self.events:
+            return "%s: none sent" % self.name
+        return "%s: %d sent, %.1fus to serialize, %d bytes, %.1f " \
+            "recipients each" % (self.name, self.events,
+            self.serialize_seconds / self.events * 1e6,
+            self.bytes / self.events, float(self.recipients) / self.events)
+
+
+class OutboundQueue(object):
+
+    """
+    Events waiting to be sent to one user, and running totals on the
+    user's backlog.
+    """
+
+    def __init__(self):
+        # (table id, serialized event, observer only) tuples:
+        self.events = []
+        self.bytes = 0
+
+        # Events and prompts sent but not yet answered:
+        self.unanswered = 0
+
+        # True from going over a high watermark until back under both low
+        # watermarks, the time it went over, and whether the user has been
+        # sat out since:
+        self.over_limit = False
+        self.over_limit_since = None
+        self.sat_out = False
+
+        # Running totals:
+        self.sent = 0
+        self.calls = 0
+        self.dropped = 0
+        self.times_over_limit = 0
+        self.peak_messages = 0
+        self.peak_bytes = 0
+
+    def add(self, table_id, serialized_event, observer_only):
+        self.events.append((table_id, serialized_event, observer_only))
+        self.bytes += len(serialized_event)
+
+    def take(self):
+        """ Empty the queue, returning (table id, event) tuples. """
+        events = [(table_id, event) for table_id, event, observer_only
+                  in self.events]
+        self.events = []
+        self.bytes = 0
+        return events
+
+    def drop_observer_only(self):
+        """
+        Drop queued events about tables the user only observes. The
+        client notices the gap in table state deltas and asks for a
+        snapshot once it catches up.
+        """
+        kept = [entry for entry in self.events if not entry[2]]
+        if len(kept) == len(self.events):
+            return
+        self.dropped += len(self.events) - len(kept)
+        self.events = kept
+        self.bytes = sum([len(entry[1]) for entry in kept])
+
+    def __repr__(self):
+        return "%d queued (%d bytes), %d unanswered, %d sent in %d calls, " \
+            "%d dropped, peak %d messages %d bytes, over limit %d times" % (
+            len(self.events), self.bytes, self.unanswered, self.sent,
+            self.calls, self.dropped, self.peak_messages, self.peak_bytes,
+            self.times_over_limit)
+
 
 class RounderNetworkServer(object):
 
@@ -55,6 +230,18 @@ class RounderNetworkServer(object):
         self.users = {} # hash of usernames to their perspectives
         self.table_views = {}
 
+        # Codecs by wire format, binary messages from every connection share
+        # one table of username ids:
+        self.names = NameTable()
+        self.codecs = {}
+        for wire_format in WIRE_FORMATS:
+            self.codecs[wire_format] = new_codec(wire_format, self.names)
+
+        # EventCounters by wire format, then event class name:
+        self.event_counters = {}
+        for wire_format in WIRE_FORMATS:
+            self.event_counters[wire_format] = {}
+
     def add_user(self, username, perspective):
         """
         Add a user perspective.
@@ -86,11 +273,21 @@ class RounderNetworkServer(object):
         self.table_views[table.id] = view
         return table
 
-    def list_tables(self):
+    def dumps(self, user, obj):
+        """
+        Serialize an object in a user's wire format, first sending them any
+        usernames it refers to by an id they don't know yet.
+        """
+        serialized, name_ids = self.codecs[user.wire_format].encode(obj)
+        if name_ids:
+            user.define_names(name_ids)
+        return serialized
+
+    def list_tables(self, user):
         """ Returns a list of visible tables to the client. """
         tables = []
         for t in self.table_views.values():
-            tables.append(dumps(TableListing(t.table)))
+            tables.append(self.dumps(user, TableListing(t.table)))
         return tables
 
     def open_table(self, table_id, user):
@@ -106,8 +303,8 @@ class RounderNetworkServer(object):
         # TODO: check if user should be allowed to observe this table.
         table = self.table_views[table_id].table
         table.add_observer(user.username)
-        state = TableState(table)
-        return (self.table_views[table_id], dumps(state))
+        state = table.state_snapshot()
+        return (self.table_views[table_id], self.dumps(user, state))
 
     def seat_player(self, user, table, seat_num):
         """ Seat a player at a table in a specific seat. """
@@ -124,6 +321,22 @@ class RounderNetworkServer(object):
         player = table.seats.players_by_username[user.username]
         table.sit_out(player)
 
+    def sit_out_slow_user(self, user):
+        """ Sit a user out at every table they are playing at. """
+        for view in user.table_views.values():
+            player = view.table.seats.players_by_username.get(user.username)
+            if player is not None and not player.sitting_out:
+                logger.warn("Table %s: Sitting out %s, too far behind on "
+                    "messages" % (view.table.id, user.username))
+                view.table.sit_out(player)
+
+    def queue_depths(self):
+        """ Return the OutboundQueue of every user by username. """
+        depths = {}
+        for username, user in self.users.items():
+            depths[username] = user.outbound
+        return depths
+
     def game_over(self, table):
         """ Called by a table whenever a game ends. """
         logger.debug("Table %s: game over")
@@ -132,16 +345,62 @@ class RounderNetworkServer(object):
         """ Called by a table to prompt a player with a list of actions. """
         log_msg = "Table %s: Prompting %s with actions:" % (table.id,
             username)
+        user = self.users[username]
         serialized_actions = []
         for action in actions:
             log_msg += "\n  %s" % action
-            serialized_actions.append(dumps(action))
+            serialized_actions.append(self.dumps(user, action))
         logger.debug(log_msg)
-        self.users[username].prompt(table.id, serialized_actions)
+        user.prompt(table.id, serialized_actions)
+
+    def __serialize_event(self, event, wire_format, recipients):
+        """
+        Serialize an event, counting the time taken and its size. Returns
+        the serialized event and the username ids it uses.
+        """
+        start = time.time()
+        serialized_event, name_ids = self.codecs[wire_format].encode(event)
+        seconds = time.time() - start
+
+        counters = self.event_counters[wire_format]
+        name = event.__class__.__name__
+        counter = counters.get(name)
+        if counter is None:
+            counter = counters[name] = EventCounter(name)
+        counter.add(seconds, len(serialized_event), recipients)
+        return serialized_event, name_ids
 
     def notify(self, table_id, username, event):
-        serialized_event = dumps(event)
-        self.users[username].notify(table_id, serialized_event)
+        user = self.users[username]
+        serialized_event, name_ids = self.__serialize_event(event,
+            user.wire_format, 1)
+        if name_ids:
+            user.define_names(name_ids)
+        user.notify(table_id, serialized_event)
+
+    def broadcast(self, table_id, usernames, event):
+        """
+        Send an event to several users. The event is serialized once per
+        wire format in use and every user is handed the same string as the
+        others using their format.
+        """
+        if not usernames:
+            return
+        users_by_format = {}
+        for username in usernames:
+            user = self.users[username]
+            users_by_format.setdefault(user.wire_format, []).append(user)
+
+        # Users who aren't playing can lose the event if they fall behind:
+        seated = self.table_views[table_id].table.seats.players_by_username
+        for wire_format, users in users_by_format.items():
+            serialized_event, name_ids = self.__serialize_event(event,
+                wire_format, len(users))
+            for user in users:
+                if name_ids:
+                    user.define_names(name_ids)
+                user.notify(table_id, serialized_event,
+                    user.username not in seated)
 
     def process_action(self, table, user, action_index, params):
         """ Process an incoming action from a player. """
@@ -168,7 +427,20 @@ class RounderRealm(object):
 
 class User(pb.Avatar):
 
-    """ An authenticated user's perspective. """
+    """
+    An authenticated user's perspective.
+
+    Events for the user are queued and sent together in one notify_many
+    call once the reactor gets back around, so the several events one
+    action produces cost a single remote call.
+
+    A user whose backlog goes over the high watermarks has their events
+    held back, bar prompts, and loses those about tables they only observe.
+    Staying over the limits gets them sat out and then disconnected.
+    """
+
+    # Schedules sending the queued events, replaced by a task.Clock in tests:
+    clock = reactor
 
     def __init__(self, username, server):
         self.username = username
@@ -177,11 +449,28 @@ class User(pb.Avatar):
         self.remote = None
         self.table_views = {}
 
+        # Format messages to this user are serialized in, and the username
+        # ids they have been sent for it:
+        self.wire_format = CEREALIZER
+        self.known_names = set()
+
+        # Events waiting to be sent, the delayed call that will send them,
+        # and the watch on the connection's write buffer:
+        self.outbound = OutboundQueue()
+        self.flush_call = None
+        self.write_buffer = WriteBufferWatch()
+
     def attached(self, mind):
         self.remote = mind
+        self.write_buffer.register(mind)
 
     def detached(self, mind):
         self.remote = None
+        self.write_buffer.unregister()
+        self.outbound.take()
+        if self.flush_call is not None:
+            self.flush_call.cancel()
+            self.flush_call = None
         self.server.remove_user(self.username)
 
         for tv in self.table_views.values():
@@ -192,7 +481,16 @@ class User(pb.Avatar):
 
     def perspective_list_tables(self):
         """ Lists available tables. """
-        return self.server.list_tables()
+        return self.server.list_tables(self)
+
+    def perspective_set_wire_format(self, wire_format):
+        """ Switch the format messages to this user are serialized in. """
+        if wire_format not in WIRE_FORMATS:
+            raise RounderException("Unknown wire format: %s" % wire_format)
+        logger.info("User %s using wire format: %s" % (self.username,
+            wire_format))
+        self.wire_format = wire_format
+        self.known_names = set()
 
     def perspective_open_table(self, table_id):
         """ Process a users request to view a table. """
@@ -208,7 +506,11 @@ class User(pb.Avatar):
         nothing.
         """
         if self.remote != None:
+            # Events leading up to the prompt go first, even to a user who
+            # is behind:
+            self.flush(force=True)
             d = self.remote.callRemote("prompt", table_id, serialized_actions)
+            self.__sent(d, 1)
             d.addCallback(self.prompt_success_cb, self.prompt_failure_cb)
 
     def prompt_success_cb(self, data, failure_cb):
@@ -219,13 +521,146 @@ class User(pb.Avatar):
         """ Failed prompt callback. """
         logger.debug("Prompt failed.")
 
-    def notify(self, table_id, serialized_event):
+    def define_names(self, name_ids):
         """
-        Pass an Event along to the client.
+        Make sure the client knows the usernames behind some ids before a
+        message using them is sent.
+        """
+        new_ids = [name_id for name_id in name_ids
+                   if name_id not in self.known_names]
+        if new_ids:
+            self.known_names.update(new_ids)
+            self.send_names(self.server.names.lookup(new_ids))
+
+    def send_names(self, names):
+        """
+        Send the client a dict of usernames by id.
+
+        Remote could be None in the case of testing, in which case we do
+        nothing.
         """
         if self.remote != None:
-            d = self.remote.callRemote("notify", table_id, serialized_event)
-            d.addCallback(self.notify_success_cb, self.notify_failure_cb)
+            self.remote.callRemote("define_names", names)
+
+    def notify(self, table_id, serialized_event, observer_only=False):
+        """
+        Queue an Event to be passed along to the client with any others
+        sent before the reactor gets back around.
+
+        Events about a table the user only observes are dropped while the
+        user is over the limits.
+        """
+        if self.remote != None:
+            if observer_only and self.outbound.over_limit:
+                self.outbound.dropped += 1
+                return
+            self.outbound.add(table_id, serialized_event, observer_only)
+            if self.flush_call is None:
+                self.flush_call = self.clock.callLater(0, self.flush)
+
+    def flush(self, force=False):
+        """
+        Send the client all queued events in one call, unless they are over
+        the limits, in which case try again shortly. Passing force sends the
+        events regardless.
+        """
+        if self.flush_call is not None:
+            if self.flush_call.active():
+                self.flush_call.cancel()
+            self.flush_call = None
+        queue = self.outbound
+        if self.remote == None or not (queue.events or queue.over_limit):
+            return
+
+        if self.check_backlog():
+            if not force:
+                queue.drop_observer_only()
+                self.enforce_limits()
+            # Keep checking until the user catches up:
+            if self.remote != None and self.flush_call is None:
+                self.flush_call = self.clock.callLater(RETRY_SECONDS,
+                    self.flush)
+            if not force:
+                return
+        if self.remote == None or not queue.events:
+            return
+        events = queue.take()
+        d = self.remote.callRemote("notify_many", events)
+        self.__sent(d, len(events))
+        d.addCallback(self.notify_success_cb, self.notify_failure_cb)
+
+    def __sent(self, d, messages):
+        """ Count messages as unanswered until the call returns. """
+        queue = self.outbound
+        queue.unanswered += messages
+        queue.sent += messages
+        queue.calls += 1
+
+        def answered(result):
+            queue.unanswered -= messages
+            return result
+        d.addBoth(answered)
+
+    def check_backlog(self):
+        """
+        Measure the user's backlog against the watermarks, returns True
+        while they are over the limits.
+        """
+        queue = self.outbound
+        messages = len(queue.events) + queue.unanswered
+        size = queue.bytes
+        buffer_full = self.write_buffer.paused
+        queue.peak_messages = max(queue.peak_messages, messages)
+        queue.peak_bytes = max(queue.peak_bytes, size)
+
+        now = self.clock.seconds()
+        if queue.over_limit:
+            # Events held back don't count, they go once the user catches
+            # up:
+            if messages - len(queue.events) <= LOW_WATER_MESSAGES and \
+                    not buffer_full:
+                logger.info("User %s caught up on messages" % self.username)
+                queue.over_limit = False
+                queue.over_limit_since = None
+                queue.sat_out = False
+        elif messages > HIGH_WATER_MESSAGES or size > HIGH_WATER_BYTES or \
+                buffer_full:
+            logger.warn("User %s over the message limits: %d messages, %d "
+                "bytes, write buffer %s" % (self.username, messages, size,
+                buffer_full and "full" or "not full"))
+            queue.over_limit = True
+            queue.over_limit_since = now
+            queue.times_over_limit += 1
+
+        return queue.over_limit
+
+    def enforce_limits(self):
+        """
+        Sit out or disconnect a user who has been over the limits for too
+        long. Only called from a scheduled flush, as sitting a player out
+        from within the game could pull the hand out from under it.
+        """
+        queue = self.outbound
+        seconds = self.clock.seconds() - queue.over_limit_since
+        if seconds >= DISCONNECT_SECONDS:
+            self.disconnect()
+        elif seconds >= SIT_OUT_SECONDS and not queue.sat_out:
+            queue.sat_out = True
+            self.server.sit_out_slow_user(self)
+
+    def disconnect(self):
+        """ Drop the user's connection, they will be detached. """
+        logger.warn("Disconnecting %s, too far behind on messages: %s" %
+            (self.username, self.outbound))
+        transport = getattr(getattr(self.remote, 'broker', None),
+            'transport', None)
+        # A registered producer holds the connection open until it is
+        # unregistered:
+        self.write_buffer.unregister()
+        if transport is not None:
+            transport.loseConnection()
+        else:
+            self.detached(self.remote)
 
     def notify_success_cb(self, data, failure_cb):
         """ Successful notify callback. """
@@ -285,6 +720,15 @@ class TableView(pb.Viewable):
         self.server.process_action(self.table, from_user, action_index,
                 params)
 
+    def view_snapshot(self, from_user):
+        """
+        Called by clients who missed a table state delta, returns the
+        current snapshot to start over from.
+        """
+        logger.debug("Table %s: Sending snapshot to %s" % (self.table.id,
+            from_user.username))
+        return self.server.dumps(from_user, self.table.state_snapshot())
+
     def view_chat_message(self, from_user, message):
         """
         Callled by clients to send a chat message to the table.
@@ -27,6 +27,7 @@ from rounder.core import InvalidPlay
 logger = getLogger("rounder.player")
 
 from rounder.core import RounderException
+from rounder.evaluator import HandState
 
 
 class Player(object):
@@ -56,6 +57,9 @@ class Player(object):
     def reset(self):
         """ Reset player state specific to a hand. """
         self.cards = []
+        # Tracks the strength of the hole cards plus community cards as
+        # they are dealt, in Hold'em:
+        self.hand_state = HandState()
         self.allin = False
         self.current_bet = Currency(0)
         self.final_hand = None
@@ -69,7 +73,7 @@ class Player(object):
         amount = self.current_bet
         self.current_bet = Currency(0)
         self.raise_count = -1
-        logger.debug("Player bet: " + str(amount))
+        logger.debug("Player bet: %s", amount)
         return amount
 
     def can_act(self, raise_count):
@@ -125,7 +129,7 @@ class Player(object):
 
     def clear_pending_actions(self):
         """ Clear any actions pending for this player. """
-        logger.debug("Clearing pending actions: " + str(self.pending_actions))
+        logger.debug("Clearing pending actions: %s", self.pending_actions)
         self.pending_actions = []
 
     def sit_out(self):
@@ -141,8 +145,7 @@ class Player(object):
         """ Add chips to the players stack. """
         if amount < 0:
             raise RounderException("Negative amount, subtract_chips instead.")
-        logger.debug("Adding chips to " + str(self.username) + ": " +
-                str(amount))
+        logger.debug("Adding chips to %s: %s", self.username, amount)
         self.chips = self.chips + amount
 
     def subtract_chips(self, amount):
@@ -150,8 +153,7 @@ class Player(object):
         # NOTE: Separate function to hopefully help prevent errors.
         if amount < 0:
             raise RounderException("Negative amount, use add_chips instead.")
-        logger.debug("Subtracting chips from " + str(self.username) + ": " +
-            str(amount))
+        logger.debug("Subtracting chips from %s: %s", self.username, amount)
         self.chips = self.chips - amount
 
     def __in_hand(self):
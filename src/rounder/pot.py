@@ -23,6 +23,8 @@
 
 from logging import getLogger
 logger = getLogger("rounder.pot")
+from operator import itemgetter
+
 from currency import Currency
 
 
@@ -30,12 +32,19 @@ class Pot(object):
     """
     A single pot, used for both main and side pots.
 
+    Eligibility is a bitmask over the players known to the pot manager, a
+    player who folds drops out of every pot at once.
+
     NOTE: Do not try to smoke!
     """
 
-    def __init__(self, players, is_main_pot=False):
-        # Players eligible for this pot:
-        self.players = players[:]
+    def __init__(self, players, is_main_pot=False, manager=None):
+        if manager is None:
+            manager = PotManager()
+        self.__manager = manager
+
+        # Players eligible for this pot, folded or not:
+        self.eligible_mask = manager.player_mask(players)
         self.amount = Currency(0)
         self.is_main_pot = is_main_pot # False for side pots
 
@@ -43,11 +52,18 @@ class Pot(object):
         self.amount += amount
         return self
 
+    def __get_players(self):
+        """ Players still eligible for this pot, in the order first seen. """
+        return self.__manager.mask_players(self.eligible_mask &
+                                           ~self.__manager.folded_mask)
+    players = property(__get_players, None)
+
     def is_player_eligible(self, player):
         """
         True if player is eligible to win this pot, False otherwise.
         """
-        return player in self.players
+        bit = self.__manager.player_bit(player)
+        return bool(self.eligible_mask & bit & ~self.__manager.folded_mask)
 
     def debug(self):
         logger.debug("Pot: $%s" % self.amount)
@@ -56,43 +72,99 @@ class Pot(object):
 
 class PotManager(object):
 
+    """
+    Builds the main and side pots from each round's bets.
+
+    Each player gets a bit the first time they are seen, pots hold a mask
+    of the players eligible for them and folding sets the player's bit in
+    folded_mask.
+    """
+
     def __init__(self):
         self.pots = []
         self.createNew = True
-
-    def __add_players_to_pot(self, players, amount):
-        if self.createNew == True:
-            self.createNew = False
-            is_main_pot = False
-            if len(self.pots) == 0:
-                is_main_pot = True
-            # NOTE: New pots inserted at start of the list, i.e. the main
-            # pot will always be the last:
-            self.pots.insert(0, Pot(players, is_main_pot))
-
-        self.pots[0] += amount * len(players)
+        self.folded_mask = 0
+
+        # Bit of each player and players by bit index:
+        self.__bits = {}
+        self.__seen = []
+
+    def player_bit(self, player):
+        """ Return the bit for this player, assigning one if need be. """
+        bit = self.__bits.get(player)
+        if bit is None:
+            bit = 1 << len(self.__seen)
+            self.__bits[player] = bit
+            self.__seen.append(player)
+        return bit
+
+    def player_mask(self, players):
+        """ Return the mask of a list of players. """
+        mask = 0
+        for player in players:
+            mask |= self.player_bit(player)
+        return mask
+
+    def mask_players(self, mask):
+        """ Return the players in a mask, in the order first seen. """
+        players = []
+        while mask:
+            low = mask & -mask
+            players.append(self.__seen[low.bit_length() - 1])
+            mask ^= low
+        return players
 
     # Called only once per betting round
 
     def add(self, player_amounts):
-        amounts = player_amounts.keys()
-        amounts.sort()
-        players = []
-        map(players.extend, player_amounts.values())
+        """
+        Add a round of bets, a dict of players by the amount they put in,
+        in one pass over the amounts from smallest to largest.
+
+        Every level is paid by all the players who put in at least that
+        much. When a player is all in at a level, whatever is bet above it
+        goes to a new side pot for the players still left.
+        """
+        bits = self.__bits
+        remaining = 0
+        count = 0
+        levels = []
+        for amount, players in player_amounts.iteritems():
+            for player in players:
+                remaining |= bits.get(player) or self.player_bit(player)
+            count += len(players)
+            levels.append((Currency(amount).cents, players))
+        levels.sort(key=itemgetter(0))
+
+        # Totals are kept in cents until each pot is done with:
         already_in = 0
-        for amount in amounts:
-            self.__add_players_to_pot(players, amount - already_in)
-            already_in = amount
-            for player in player_amounts[amount]:
+        added = 0
+        for cents, players in levels:
+            if self.createNew:
+                self.createNew = False
+                if added:
+                    self.pots[0] += Currency.from_cents(added)
+                    added = 0
+                # NOTE: New pots inserted at start of the list, i.e. the
+                # main pot will always be the last:
+                pot = Pot([], not self.pots, self)
+                pot.eligible_mask = remaining
+                self.pots.insert(0, pot)
+
+            added += (cents - already_in) * count
+            already_in = cents
+            for player in players:
                 if player.allin:
                     self.createNew = True
-                players.remove(player)
+                remaining &= ~bits[player]
+                count -= 1
+
+        if added:
+            self.pots[0] += Currency.from_cents(added)
 
     def fold(self, player):
         """ Make this player no longer eligible for any of the pots. """
-        for pot in self.pots:
-            if player in pot.players:
-                pot.players.remove(player)
+        self.folded_mask |= self.player_bit(player)
 
     def total_value(self):
         return reduce(lambda x, y: x + y.amount, self.pots, 0)
@@ -0,0 +1,369 @@
+#   Rounder - Poker for the GNOME Desktop
+#
+#   Copyright (C) 2009 Devan Goodwin <dgoodwin@dangerouslyinc.com>
+#   Copyright (C) 2009 James Bowes <jbowes@dangerouslyinc.com>
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+#   02110-1301  USA
+
+"""
+Precomputed heads up preflop all-in equity.
+
+The 1326 starting hands fall into 169 classes: 13 pairs, 78 suited and 78
+offsuit hands. The preflop table holds the equity of every class against
+every other, averaged over all of their non-conflicting combinations, so
+looking up a matchup is a couple of array reads.
+
+The table is generated by generate_table() and shipped in preflop.equity,
+see "python setup.py build_preflop".
+"""
+
+from logging import getLogger
+logger = getLogger("rounder.preflop")
+
+import array
+from itertools import combinations
+import multiprocessing
+import os
+import random
+import struct
+import sys
+import zlib
+
+# NumPy is only needed to generate the table:
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from rounder.card import RANK_TO_STRING, get_card_id
+from rounder.cardset import canonical_key, card_mask
+from rounder.core import RounderException
+from rounder.equity import equity
+from rounder.evaluator import evaluate_batch, load_tables
+
+TABLE_MAGIC = "RNDRPREF"
+TABLE_VERSION = 1
+TABLE_FILE = os.environ.get("ROUNDER_PREFLOP_TABLE",
+        os.path.join(os.path.dirname(__file__), "preflop.equity"))
+
+_HEADER = struct.Struct("<8sIII")
+
+CLASS_COUNT = 169
+
+# Equities are stored as 16 bit fractions of this:
+EQUITY_SCALE = 0xFFFF
+
+# Lazily loaded table, CLASS_COUNT * CLASS_COUNT equities of the row class
+# against the column class:
+_table = None
+
+
+def class_index(pocket):
+    """
+    Return the 0 - 168 class of a two card pocket, given as Cards, card ids
+    or card strings.
+
+    Classes are laid out as the usual 13x13 grid, ranks descending from
+    aces: pairs on the diagonal, suited hands above it and offsuit hands
+    below it. AA is 0, AKs 1, AKo 13 and 22 is 168.
+    """
+    if len(pocket) != 2:
+        raise RounderException("Preflop pockets hold two cards: %s" %
+            (pocket, ))
+    first, second = [get_card_id(card) for card in pocket]
+    if first == second:
+        raise RounderException("Pocket holds the same card twice")
+
+    first_suit, first_rank = divmod(first, 13)
+    second_suit, second_rank = divmod(second, 13)
+    high = 12 - max(first_rank, second_rank)
+    low = 12 - min(first_rank, second_rank)
+    if first_suit == second_suit:
+        return high * 13 + low
+    return low * 13 + high
+
+
+def _class_names():
+    names = []
+    for row in range(13):
+        for column in range(13):
+            high = RANK_TO_STRING[14 - min(row, column)]
+            low = RANK_TO_STRING[14 - max(row, column)]
+            if row == column:
+                names.append(high + low)
+            elif row < column:
+                names.append(high + low + "s")
+            else:
+                names.append(high + low + "o")
+    return names
+
+
+# Class names, such as 'AA', 'AKs' or '72o', by class index:
+CLASS_NAMES = _class_names()
+CLASS_INDEXES = dict([(name, i) for i, name in enumerate(CLASS_NAMES)])
+
+
+def _class_combos():
+    combos = [[] for i in range(CLASS_COUNT)]
+    for pocket in combinations(range(52), 2):
+        combos[class_index(pocket)].append(pocket)
+    return combos
+
+
+# Pockets in each class, as sorted pairs of card ids:
+CLASS_COMBOS = _class_combos()
+
+
+def class_combos(index):
+    """ Return the pockets in a class as sorted pairs of card ids. """
+    return CLASS_COMBOS[index]
+
+
+def pack_table(table):
+    """
+    Return the contents of a table file: a header holding the magic,
+    TABLE_VERSION, a CRC32 and the length of the payload, followed by the
+    equities as little endian 16 bit fractions of EQUITY_SCALE.
+    """
+    values = array.array('H', [int(round(value * EQUITY_SCALE))
+                               for value in table])
+    if sys.byteorder != 'little':
+        values.byteswap()
+    payload = values.tostring()
+    return _HEADER.pack(TABLE_MAGIC, TABLE_VERSION,
+                        zlib.crc32(payload) & 0xFFFFFFFF,
+                        len(payload)) + payload
+
+
+def unpack_table(data):
+    """
+    Read the equities written by pack_table, or return None if data is not
+    a table for this TABLE_VERSION or is corrupt.
+    """
+    if len(data) < _HEADER.size:
+        return None
+    magic, version, checksum, length = _HEADER.unpack_from(data)
+    payload = data[_HEADER.size:]
+    if magic != TABLE_MAGIC or version != TABLE_VERSION or \
+            length != CLASS_COUNT * CLASS_COUNT * 2 or \
+            len(payload) != length or \
+            zlib.crc32(payload) & 0xFFFFFFFF != checksum:
+        return None
+
+    values = array.array('H')
+    values.fromstring(payload)
+    if sys.byteorder != 'little':
+        values.byteswap()
+    scale = float(EQUITY_SCALE)
+    return [value / scale for value in values]
+
+
+def write_table(table, path=TABLE_FILE):
+    """ Write the table to path, under a temporary name first. """
+    data = pack_table(table)
+    tmp_path = "%s.%d.tmp" % (path, os.getpid())
+    table_file = open(tmp_path, 'wb')
+    try:
+        table_file.write(data)
+    finally:
+        table_file.close()
+    os.rename(tmp_path, path)
+    logger.info("Wrote preflop equity table to %s" % path)
+
+
+def load_table(path=TABLE_FILE):
+    """ Load the table file unless it is already loaded. """
+    global _table
+    if _table is not None:
+        return
+
+    try:
+        table_file = open(path, 'rb')
+    except IOError, e:
+        raise RounderException("Unable to open preflop table: %s" % e)
+    try:
+        data = table_file.read()
+    finally:
+        table_file.close()
+
+    table = unpack_table(data)
+    if table is None:
+        raise RounderException("Preflop table %s is stale or corrupt" %
+            path)
+    _table = table
+
+
+def class_equity(first, second):
+    """
+    Return the average equity of one starting hand class against another,
+    given as class indexes or names such as 'AKs'.
+    """
+    if _table is None:
+        load_table()
+    if isinstance(first, basestring):
+        first = CLASS_INDEXES[first]
+    if isinstance(second, basestring):
+        second = CLASS_INDEXES[second]
+    return _table[first * CLASS_COUNT + second]
+
+
+def preflop_equity(first, second):
+    """
+    Return the heads up all-in equity of the first pocket against the
+    second, as the share of the pot it wins on average.
+
+    Equity is that of the pockets' classes, the exact figure for these
+    particular suits may differ by a few percent. Raises RounderException
+    unless each pocket holds two cards and no card is in both.
+    """
+    first_class = class_index(first)
+    second_class = class_index(second)
+    if set([get_card_id(card) for card in first]) & \
+            set([get_card_id(card) for card in second]):
+        raise RounderException("Pockets share a card: %s %s" %
+            (first, second))
+    return class_equity(first_class, second_class)
+
+
+def _sample_row(args):
+    """
+    Sampled equities of one class against each class from itself onwards.
+    Runs in pool workers.
+    """
+    row, samples, seed = args
+    load_tables()
+    generator = numpy.random.RandomState(seed)
+    first_combos = numpy.array(class_combos(row))
+    row_index = numpy.arange(samples)
+
+    results = []
+    for column in range(row, CLASS_COUNT):
+        second_combos = numpy.array(class_combos(column))
+        first = first_combos[generator.randint(len(first_combos),
+                                               size=samples)]
+        second = second_combos[generator.randint(len(second_combos),
+                                                 size=samples)]
+
+        # Uniform over non-conflicting pairs of combos:
+        keep = (first[:, 0] != second[:, 0]) & \
+                (first[:, 0] != second[:, 1]) & \
+                (first[:, 1] != second[:, 0]) & \
+                (first[:, 1] != second[:, 1])
+        first = first[keep]
+        second = second[keep]
+        kept = row_index[:len(first)]
+
+        # Deal each board as the five lowest random keys, pockets excluded:
+        keys = generator.random_sample((len(first), 52))
+        for pocket in (first, second):
+            keys[kept, pocket[:, 0]] = 2.0
+            keys[kept, pocket[:, 1]] = 2.0
+        board = numpy.argpartition(keys, 5, axis=1)[:, :5]
+
+        first_values = evaluate_batch(numpy.hstack((first, board)))
+        second_values = evaluate_batch(numpy.hstack((second, board)))
+        points = 2 * numpy.count_nonzero(first_values > second_values) + \
+                numpy.count_nonzero(first_values == second_values)
+        results.append(points / (2.0 * len(first)))
+    return row, results
+
+
+def generate_table(samples=20000, processes=None, seed=0):
+    """
+    Estimate every class matchup from samples random combination pairs
+    and boards, one row of the table per pool task. Returns the table as a
+    flat list, the row class's equity against the column class.
+
+    The standard error of each entry is at most 0.5 / sqrt(samples).
+    Entries on the diagonal are exactly 0.5 and the table is kept
+    consistent, a against b being 1 - b against a.
+    """
+    if numpy is None:
+        raise RounderException("Generating the preflop table needs numpy")
+
+    load_tables()
+    tasks = [(row, samples, seed + row) for row in range(CLASS_COUNT)]
+    if processes == 1:
+        rows = map(_sample_row, tasks)
+    else:
+        pool = multiprocessing.Pool(processes)
+        try:
+            rows = pool.map(_sample_row, tasks)
+        finally:
+            pool.close()
+            pool.join()
+
+    table = [0.5] * (CLASS_COUNT * CLASS_COUNT)
+    for row, results in rows:
+        for offset, value in enumerate(results[1:]):
+            column = row + 1 + offset
+            table[row * CLASS_COUNT + column] = value
+            table[column * CLASS_COUNT + row] = 1.0 - value
+    return table
+
+
+def exact_class_equity(first, second, processes=None):
+    """
+    Enumerate every board for every non-conflicting pair of combos to get
+    the exact equity of one class against another. Combination pairs which
+    are suit permutations of each other are enumerated once.
+
+    Slow, seconds per distinct pair of combinations, and meant for
+    validating generated tables.
+    """
+    groups = {}
+    for first_pocket in class_combos(first):
+        for second_pocket in class_combos(second):
+            if set(first_pocket) & set(second_pocket):
+                continue
+            key = canonical_key(card_mask(first_pocket),
+                                card_mask(second_pocket))
+            if key in groups:
+                groups[key][1] += 1
+            else:
+                groups[key] = [(first_pocket, second_pocket), 1]
+
+    total = 0.0
+    weights = 0
+    for pockets, weight in groups.values():
+        total += equity(list(pockets), [], processes=processes)[0].equity * \
+                weight
+        weights += weight
+    return total / weights
+
+
+def validate_table(table, count=3, tolerance=0.01, processes=None,
+        rand=None):
+    """
+    Compare count randomly chosen off diagonal entries of table against
+    exhaustive enumeration. Returns a list of (first, second, table equity,
+    exact equity) tuples for entries further than tolerance from the exact
+    figure.
+    """
+    if rand is None:
+        rand = random.Random()
+
+    failures = []
+    for i in range(count):
+        first, second = rand.sample(range(CLASS_COUNT), 2)
+        expected = exact_class_equity(first, second, processes)
+        value = table[first * CLASS_COUNT + second]
+        logger.info("%s vs %s: table %.4f exact %.4f" %
+            (CLASS_NAMES[first], CLASS_NAMES[second], value, expected))
+        if abs(value - expected) > tolerance:
+            failures.append((CLASS_NAMES[first], CLASS_NAMES[second], value,
+                             expected))
+    return failures
@@ -0,0 +1,318 @@
+#   Rounder - Poker for the GNOME Desktop
+#
+#   Copyright (C) 2009 Devan Goodwin <dgoodwin@dangerouslyinc.com>
+#   Copyright (C) 2009 James Bowes <jbowes@dangerouslyinc.com>
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+#   02110-1301  USA
+
+"""
+Hand ranges.
+
+A range is the set of two card combinations a player might hold, each with
+a weight, written in the usual notation:
+
+    QQ+, AQs+, KJo, T9s-T7s, 66-44, AhKh, A5s:0.5
+
+Pairs, suited ('s'), offsuit ('o') or both (no suffix) hands, '+' for
+everything up to the next rank, dash separated spans, specific
+combinations and an optional ':weight' on any of them.
+"""
+
+from logging import getLogger
+logger = getLogger("rounder.ranges")
+
+from itertools import combinations
+import random
+import re
+
+# NumPy is needed for range against range equity:
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from rounder.card import get_card_id
+from rounder.cardset import FULL_DECK_MASK, card_mask, mask_ids
+from rounder.core import RounderException
+from rounder.evaluator import evaluate_batch
+
+# Rank characters, in the order of card id ranks:
+RANKS = '23456789TJQKA'
+
+_CLASS_RE = re.compile(r'^([2-9TJQKA])([2-9TJQKA])([so]?)(\+?)$')
+_COMBO_RE = re.compile(r'^([2-9TJQKA][sdch])([2-9TJQKA][sdch])$')
+
+# range_equity() compares every pair of combinations on several boards at
+# once, as many boards as keep that to about this many pairs:
+PAIRS_PER_CHUNK = 1 << 21
+
+
+class HandRange(object):
+
+    """
+    Weighted set of two card combinations.
+
+    combos holds each combination once as a (low id, high id) tuple, in
+    ascending order, with matching lists of weights and card masks, and
+    indexes maps each combination to its position in them.
+    """
+
+    def __init__(self, weights=None):
+        if weights is None:
+            weights = {}
+        self.combos = sorted([combo for combo in weights
+                              if weights[combo] > 0])
+        self.weights = [weights[combo] for combo in self.combos]
+        self.masks = [card_mask(combo) for combo in self.combos]
+        self.indexes = dict([(combo, i) for i, combo
+                             in enumerate(self.combos)])
+
+    def __len__(self):
+        return len(self.combos)
+
+    def __iter__(self):
+        return iter(self.combos)
+
+    def __contains__(self, pocket):
+        return _combo(pocket) in self.indexes
+
+    def weight(self, pocket):
+        """ Return the weight of a pocket, 0 if it is not in the range. """
+        i = self.indexes.get(_combo(pocket))
+        if i is None:
+            return 0
+        return self.weights[i]
+
+    def total_weight(self):
+        """ Weighted number of combinations in the range. """
+        return sum(self.weights)
+
+    def remove_dead(self, dead):
+        """
+        Return a new HandRange without the combinations using any of the
+        dead cards.
+        """
+        dead_mask = card_mask([get_card_id(card) for card in dead])
+        weights = {}
+        for i in range(len(self.combos)):
+            if not self.masks[i] & dead_mask:
+                weights[self.combos[i]] = self.weights[i]
+        return HandRange(weights)
+
+
+def _combo(pocket):
+    """ Normalise a pocket to a (low id, high id) tuple. """
+    first, second = [get_card_id(card) for card in pocket]
+    return (min(first, second), max(first, second))
+
+
+def _class_combos(high, low, suitedness):
+    """
+    Return the combos of a starting hand class. Ranks are 0 - 12 indexes
+    into RANKS, suitedness 's', 'o' or '' for both.
+    """
+    combos = []
+    for first_suit in range(4):
+        for second_suit in range(4):
+            if high == low and second_suit <= first_suit:
+                continue
+            if suitedness == 's' and first_suit != second_suit:
+                continue
+            if suitedness == 'o' and first_suit == second_suit:
+                continue
+            combos.append(_combo((first_suit * 13 + high,
+                                  second_suit * 13 + low)))
+    return combos
+
+
+def _parse_class(token):
+    """ Return (high rank, low rank, suitedness, plus) for a class token. """
+    match = _CLASS_RE.match(token)
+    if match is None:
+        return None
+    high, low, suitedness, plus = match.groups()
+    high = RANKS.index(high)
+    low = RANKS.index(low)
+    if high < low:
+        high, low = low, high
+    if high == low and suitedness:
+        raise RounderException("Pairs cannot be suited or offsuit: %s" %
+            token)
+    return high, low, suitedness, plus == '+'
+
+
+def _token_combos(token):
+    """ Return the combos for one comma separated range token. """
+    match = _COMBO_RE.match(token)
+    if match is not None:
+        combo = _combo(match.groups())
+        if combo[0] == combo[1]:
+            raise RounderException("Same card twice in range: %s" % token)
+        return [combo]
+
+    if '-' in token:
+        start, end = [_parse_class(part) for part in token.split('-', 1)]
+        if start is None or end is None or start[3] or end[3] or \
+                start[2] != end[2]:
+            raise RounderException("Bad range span: %s" % token)
+        if start[0] == start[1] and end[0] == end[1]:
+            # Span of pairs:
+            ranks = [(rank, rank) for rank in
+                     range(min(start[0], end[0]), max(start[0], end[0]) + 1)]
+        elif start[0] == end[0] and start[0] != start[1] and \
+                end[0] != end[1]:
+            # Span of kickers below one high card:
+            ranks = [(start[0], rank) for rank in
+                     range(min(start[1], end[1]), max(start[1], end[1]) + 1)]
+        else:
+            raise RounderException("Bad range span: %s" % token)
+        suitedness = start[2]
+    else:
+        parsed = _parse_class(token)
+        if parsed is None:
+            raise RounderException("Bad range token: %s" % token)
+        high, low, suitedness, plus = parsed
+        if not plus:
+            ranks = [(high, low)]
+        elif high == low:
+            ranks = [(rank, rank) for rank in range(high, 13)]
+        else:
+            ranks = [(high, rank) for rank in range(low, high)]
+
+    combos = []
+    for high, low in ranks:
+        combos.extend(_class_combos(high, low, suitedness))
+    return combos
+
+
+def parse_range(text):
+    """
+    Parse range notation into a HandRange. Tokens are comma separated,
+    a combination named more than once takes the weight it was given last.
+    """
+    weights = {}
+    for token in text.split(','):
+        token = token.strip()
+        if not token:
+            continue
+
+        weight = 1.0
+        if ':' in token:
+            token, weight_text = token.split(':', 1)
+            try:
+                weight = float(weight_text)
+            except ValueError:
+                raise RounderException("Bad range weight: %s" % weight_text)
+            if not 0 <= weight <= 1:
+                raise RounderException("Range weights must be between 0 "
+                    "and 1: %s" % weight_text)
+
+        # Ranks are upper case, suits lower case:
+        token = ''.join([char in 'sdcho' and char or char.upper()
+                         for char in token.strip().lower()])
+        for combo in _token_combos(token):
+            weights[combo] = weight
+
+    return HandRange(weights)
+
+
+def _boards(board_mask, dead_mask, to_deal, max_boards, rand):
+    """
+    Return every runout of to_deal cards, as lists of card ids, or
+    max_boards random ones if there are more than that.
+    """
+    remaining = mask_ids(FULL_DECK_MASK & ~(board_mask | dead_mask))
+    count = 1
+    for i in range(to_deal):
+        count = count * (len(remaining) - i) / (i + 1)
+
+    if count <= max_boards:
+        return [list(runout) for runout in combinations(remaining, to_deal)]
+    return [rand.sample(remaining, to_deal) for i in range(max_boards)]
+
+
+def range_equity(first, second, board=(), dead=(), max_boards=2000,
+        rand=None):
+    """
+    Return the equity of the first HandRange against the second, the share
+    of the pot it wins on average with ties split.
+
+    Every pair of non-conflicting combinations counts in proportion to the
+    product of their weights. Each runout of the board is evaluated for
+    every combination of both ranges in one evaluate_batch() call. Runouts
+    are enumerated when there are at most max_boards of them and sampled
+    otherwise, pass a seeded random.Random as rand for repeatable results.
+
+    Requires NumPy.
+    """
+    if numpy is None:
+        raise RounderException("NumPy is required for range equity.")
+    if rand is None:
+        rand = random.Random()
+
+    board = [get_card_id(card) for card in board]
+    if len(board) > 5:
+        raise RounderException("Board has more than five cards: %s" % board)
+    board_mask = card_mask(board)
+    dead_mask = card_mask([get_card_id(card) for card in dead])
+
+    first = first.remove_dead(board + mask_ids(dead_mask))
+    second = second.remove_dead(board + mask_ids(dead_mask))
+    if not len(first) or not len(second):
+        raise RounderException("Range is empty once dead cards are removed")
+
+    combos = numpy.array(first.combos + second.combos, dtype=numpy.int64)
+    masks = numpy.array(first.masks + second.masks, dtype=numpy.int64)
+    split = len(first)
+
+    # Weight of every pair of combinations that can be dealt together:
+    pair_weights = numpy.outer(first.weights, second.weights)
+    pair_weights *= (masks[:split, None] & masks[None, split:]) == 0
+
+    boards = _boards(board_mask, dead_mask, 5 - len(board), max_boards, rand)
+    chunk = max(1, PAIRS_PER_CHUNK / pair_weights.size)
+    points = 0.0
+    total = 0.0
+    for start in range(0, len(boards), chunk):
+        runouts = numpy.array([board + runout for runout in
+                               boards[start:start + chunk]],
+                              dtype=numpy.int64).reshape(-1, 5)
+        runout_masks = numpy.bitwise_or.reduce(
+            numpy.left_shift(1, runouts), axis=1)
+
+        # Combinations blocked by a runout are scored on a stand in hand
+        # and weighted out below:
+        live = (masks[None, :] & runout_masks[:, None]) == 0
+        hands = numpy.empty((len(runouts), len(combos), 7),
+                            dtype=numpy.int64)
+        hands[:, :, :2] = combos[None, :, :]
+        hands[:, :, 2:] = runouts[:, None, :]
+        hands[~live] = numpy.arange(7)
+        values = evaluate_batch(hands.reshape(-1, 7)).reshape(len(runouts),
+                                                              len(combos))
+
+        first_values = values[:, :split, None]
+        second_values = values[:, None, split:]
+        weights = pair_weights[None, :, :] * live[:, :split, None] * \
+                live[:, None, split:]
+        points += (weights * ((first_values > second_values) +
+                              0.5 * (first_values == second_values))).sum()
+        total += weights.sum()
+
+    if total == 0:
+        raise RounderException("No combinations of the ranges can be dealt "
+            "together")
+    return points / total
@@ -0,0 +1,191 @@
+#   Rounder - Poker for the GNOME Desktop
+#
+#   Copyright (C) 2009 Devan Goodwin <dgoodwin@dangerouslyinc.com>
+#   Copyright (C) 2009 James Bowes <jbowes@dangerouslyinc.com>
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+#   02110-1301  USA
+
+"""
+Headless hand simulation.
+
+Plays hands of a game with no table, server or clients. Games without a
+table build no events, and every prompt is answered in process by a
+strategy: a callable taking the game, the player to act and the list of
+actions they may take, and returning one of those actions.
+
+Meant for evaluating bots and for regression runs over many hands, see
+bin/rounder-simulate.
+"""
+
+from logging import getLogger
+logger = getLogger("rounder.simulator")
+
+import random
+import time
+
+from rounder.action import Call, Raise, Fold
+from rounder.core import RounderException
+from rounder.currency import Currency
+from rounder.deck import Deck
+from rounder.game import OmahaGame, TexasHoldemGame
+from rounder.limit import FixedLimit
+from rounder.player import Player
+from rounder.utils import find_action_in_list
+
+# Game classes by name:
+GAMES = {
+    'holdem': TexasHoldemGame,
+    'omaha': OmahaGame,
+}
+
+
+def always_call(game, player, actions):
+    """ Strategy that checks or calls everything. """
+    return find_action_in_list(Call, actions)
+
+
+def random_strategy(rand=None):
+    """
+    Return a strategy acting at random like the random bot: raising and
+    calling more often than folding, and checking rather than folding.
+    """
+    if rand is None:
+        rand = random.Random()
+
+    def strategy(game, player, actions):
+        choice = rand.random()
+        if choice < 0.1:
+            call = find_action_in_list(Call, actions)
+            if call.amount == 0:
+                return call
+            return find_action_in_list(Fold, actions)
+        if choice < 0.4:
+            raise_action = find_action_in_list(Raise, actions)
+            if raise_action is not None:
+                return raise_action
+        return find_action_in_list(Call, actions)
+    return strategy
+
+
+# Strategies by name, each a function of a random.Random returning the
+# strategy callable:
+STRATEGIES = {
+    'call': lambda rand: always_call,
+    'random': random_strategy,
+}
+
+
+class Simulator(object):
+
+    """
+    Plays hands between strategies, one per seat, moving the button a
+    seat each hand.
+
+    Every hand starts from the same stacks, so results are the chips each
+    seat won or lost per hand rather than a freezeout. Pass a seeded
+    random.Random as rand to replay the same cards.
+    """
+
+    def __init__(self, strategies, stacks=None, limit=None,
+            game_class=TexasHoldemGame, rand=None):
+        if len(strategies) < 2:
+            raise RounderException("Need at least two strategies to play")
+        if limit is None:
+            limit = FixedLimit(small_bet=Currency(2), big_bet=Currency(4))
+        if stacks is None:
+            stacks = [Currency(1000)] * len(strategies)
+        if len(stacks) != len(strategies):
+            raise RounderException("Need one stack per strategy")
+        if rand is None:
+            rand = random.Random()
+
+        self.strategies = strategies
+        self.stacks = stacks
+        self.limit = limit
+        self.game_class = game_class
+        self.rand = rand
+
+        self.players = [Player("player%d" % seat, seat=seat, chips=stack)
+                        for seat, stack in enumerate(stacks)]
+        self.dealer_index = 0
+
+        # Totals over every hand played:
+        self.hands = 0
+        self.seconds = 0.0
+        self.winnings = [Currency(0)] * len(strategies)
+
+    def play_hand(self):
+        """
+        Play one hand and return the chips each seat won or lost.
+        """
+        players = self.players
+        for player, stack in zip(players, self.stacks):
+            player.chips = stack
+
+        deck = Deck()
+        self.rand.shuffle(deck.cards)
+
+        count = len(players)
+        if count == 2:
+            # Heads up the button posts the small blind:
+            sb_index = self.dealer_index
+        else:
+            sb_index = (self.dealer_index + 1) % count
+        bb_index = (sb_index + 1) % count
+
+        game = self.game_class(limit=self.limit, players=list(players),
+            dealer_index=self.dealer_index, sb_index=sb_index,
+            bb_index=bb_index, callback=self.__game_over, table=None,
+            deck=deck)
+        game.advance()
+
+        strategies = self.strategies
+        pending = game.pending_actions
+        while not game.finished:
+            if not pending:
+                raise RounderException("Game stopped with no one to act")
+            player, actions = pending.items()[0]
+            action = strategies[player.seat](game, player, actions)
+            if isinstance(action, Raise) and action.amount is None:
+                action.amount = action.min_bet
+            game.process_action(player, action)
+
+        results = [player.chips - stack
+                   for player, stack in zip(players, self.stacks)]
+        for seat in range(count):
+            self.winnings[seat] += results[seat]
+        self.dealer_index = (self.dealer_index + 1) % count
+        self.hands += 1
+        return results
+
+    def __game_over(self):
+        pass
+
+    def run(self, hands):
+        """ Play a number of hands and return the hands played per second. """
+        start = time.time()
+        for i in xrange(hands):
+            self.play_hand()
+        seconds = time.time() - start
+        self.seconds += seconds
+        logger.info("Played %d hands in %.2f seconds", hands, seconds)
+        return hands / max(seconds, 1e-9)
+
+    def __get_hands_per_sec(self):
+        if not self.seconds:
+            return 0.0
+        return self.hands / self.seconds
+    hands_per_sec = property(__get_hands_per_sec, None)
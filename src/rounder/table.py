@@ -28,6 +28,7 @@ from rounder.core import RounderException
 from rounder.game import GameStateMachine, TexasHoldemGame
 from rounder.utils import find_action_in_list
 from rounder.event import *
+from rounder.dto import TableState, TableStateDelta
 
 STATE_SMALL_BLIND = "small_blind"
 STATE_BIG_BLIND = "big_blind"
@@ -208,6 +209,9 @@ class Table(object):
         self.game_over_event_queue = []
         self.game = None
 
+        # TableState as of the last delta sent to observers:
+        self.__state = None
+
         # Optional server object represents a parent object that creates
         # tables. If provided, it will be used for any communication with
         # players, as well as notified whenever a hand has ended.
@@ -500,12 +504,36 @@ class Table(object):
             self.sit_out(player, left_table=True)
 
     def notify_all(self, event):
-        """ Notify observers of this table that a player was seated. """
-        for o in self.observers:
-            logger.debug("Table %s: Notifying %s: %s" % (self.id, o,
-                event))
-            if self.server != None:
-                self.server.notify(self.id, o, event)
+        """
+        Notify every observer of this table of an event. The server
+        serializes it once for all of them.
+        """
+        logger.debug("Table %s: Notifying %s: %s", self.id, self.observers,
+            event)
+        if self.server != None:
+            event.state_delta = self.state_delta()
+            self.server.broadcast(self.id, self.observers, event)
+
+    def state_snapshot(self):
+        """
+        Return the TableState observers hold once they have applied every
+        delta sent so far. Sent to clients opening the table, or who
+        missed a delta.
+        """
+        if self.__state is None:
+            self.__state = TableState(self)
+        return self.__state
+
+    def state_delta(self):
+        """
+        Return a TableStateDelta of the changes since the last one, and
+        take the current state as the new snapshot.
+        """
+        old = self.state_snapshot()
+        new = TableState(self)
+        new.sequence = old.sequence + 1
+        self.__state = new
+        return TableStateDelta(new.sequence, old, new)
 
     def notify(self, player, event):
         """
@@ -376,16 +376,13 @@ class TableWindow(ClientTable):
         """
         Display the incoming event to the user.
 
-        Currently the event's all contain a table state DTO object which we
-        can use to display the entire table. This obviously duplicates a lot
-        of data and may have to change in the future to reduce bandwidth.
-        For now we can get away with just using the table state to update
-        everything at the table.
+        The table uplink has already applied the event's changes to its
+        table state, which we use to update everything at the table.
         """
 
         # Render the generic table state first, let the event specific code
         # expand on this:
-        self.__render_table_state(event.table_state)
+        self.__render_table_state(self.table_uplink.state)
 
         if isinstance(event, PlayerJoinedTable):
             self.__username_to_seat[event.username] = \
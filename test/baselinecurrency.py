@@ -0,0 +1,49 @@
+#   Rounder - Poker for the GNOME Desktop
+#
+#   Copyright (C) 2009 Devan Goodwin <dgoodwin@dangerouslyinc.com>
+#   Copyright (C) 2009 James Bowes <jbowes@dangerouslyinc.com>
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+#   02110-1301  USA
+
+"""
+The FixedPoint based Currency, as it was before amounts became integer
+cents. Kept as the baseline test/chips-benchmark.py measures the current
+rounder.currency.Currency against.
+"""
+
+from rounder.fixedpoint import FixedPoint, DEFAULT_PRECISION
+
+
+class FixedPointCurrency(FixedPoint):
+
+    """
+    Representation of a monetary amount. Simple subclass of FixedPoint.
+
+    cents and from_cents() let code written for the integer cents Currency
+    run on top of it, both go through FixedPoint.
+    """
+
+    def __init__(self, value=0, precision=DEFAULT_PRECISION):
+        FixedPoint.__init__(self, value, precision)
+
+    def __get_cents(self):
+        return long(self * 100)
+
+    cents = property(__get_cents, None)
+
+    @classmethod
+    def from_cents(cls, cents):
+        return cls(cents) / 100
@@ -0,0 +1,191 @@
+#   Rounder - Poker for the GNOME Desktop
+#
+#   Copyright (C) 2009 Devan Goodwin <dgoodwin@dangerouslyinc.com>
+#   Copyright (C) 2009 James Bowes <jbowes@dangerouslyinc.com>
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+#   02110-1301  USA
+
+""" Rounder Benchmark Utilities """
+
+import gc
+import json
+import platform
+import sys
+import time
+
+from timeit import default_timer
+
+# tracemalloc is only available on newer Pythons (or with the pytracemalloc
+# backport), byte figures are left out without it. Allocation counts come
+# from ConstructionCounter and work everywhere:
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+
+class ConstructionCounter(object):
+
+    """
+    Counts calls to the functions objects are constructed through, such as
+    a class's __init__ or a module's allocation helper, while active.
+
+    Targets are (label, owner, attribute) tuples, owner being the class or
+    module holding the function. The counts are allocations made, whether
+    or not the objects are still alive afterwards.
+    """
+
+    def __init__(self, targets):
+        self.targets = targets
+        self.counts = dict([(label, 0) for label, owner, attribute
+                            in targets])
+        self.__originals = []
+
+    def start(self):
+        for label, owner, attribute in self.targets:
+            original = vars(owner)[attribute]
+            self.__originals.append((owner, attribute, original))
+            setattr(owner, attribute, self.__wrap(label, original))
+
+    def stop(self):
+        for owner, attribute, original in self.__originals:
+            setattr(owner, attribute, original)
+        self.__originals = []
+
+    def reset(self):
+        for label in self.counts:
+            self.counts[label] = 0
+
+    def __wrap(self, label, original):
+        counts = self.counts
+
+        def counted(*args, **kwargs):
+            counts[label] += 1
+            return original(*args, **kwargs)
+        return counted
+
+
+def percentile(sorted_values, fraction):
+    """ Nearest rank percentile of an already sorted list. """
+    if not sorted_values:
+        return None
+    index = int(round(fraction * (len(sorted_values) - 1)))
+    return sorted_values[index]
+
+
+def measure(name, calls, units_per_call=1, counter=None, **details):
+    """
+    Run every callable in calls once, timing each one, then run them all
+    again counting allocations. Returns a result dict holding throughput in
+    units (hands, operations...) per second, call latency percentiles in
+    microseconds, the average number of objects each call constructed by
+    label if a ConstructionCounter is given and, if tracemalloc is
+    available, the average peak and retained bytes allocated per call.
+    """
+    gc.collect()
+    latencies = []
+    start = default_timer()
+    for call in calls:
+        call_start = default_timer()
+        call()
+        latencies.append(default_timer() - call_start)
+    elapsed = default_timer() - start
+    latencies.sort()
+
+    result = {
+        'name': name,
+        'calls': len(calls),
+        'seconds': elapsed,
+        'units_per_sec': len(calls) * units_per_call / elapsed,
+        'latency_us': {
+            'p50': percentile(latencies, 0.50) * 1e6,
+            'p90': percentile(latencies, 0.90) * 1e6,
+            'p99': percentile(latencies, 0.99) * 1e6,
+            'max': latencies[-1] * 1e6,
+        },
+        'allocations_per_call': None,
+        'alloc_peak_bytes_per_call': None,
+        'alloc_retained_bytes_per_call': None,
+    }
+    result.update(details)
+
+    if counter is not None:
+        counter.reset()
+        counter.start()
+        try:
+            for call in calls:
+                call()
+        finally:
+            counter.stop()
+        allocations = {}
+        for label, count in counter.counts.items():
+            allocations[label] = float(count) / len(calls)
+        result['allocations_per_call'] = allocations
+
+    if tracemalloc is not None:
+        gc.collect()
+        peak_total = 0
+        retained_total = 0
+        tracemalloc.start()
+        for call in calls:
+            # Clearing the traces also resets the peak:
+            tracemalloc.clear_traces()
+            call()
+            current, peak = tracemalloc.get_traced_memory()
+            peak_total += peak
+            retained_total += current
+        tracemalloc.stop()
+
+        result['alloc_peak_bytes_per_call'] = float(peak_total) / len(calls)
+        result['alloc_retained_bytes_per_call'] = \
+                float(retained_total) / len(calls)
+
+    return result
+
+
+def print_result(result, units="units"):
+    """ Print a one line summary of a measure() result. """
+    latency = result['latency_us']
+    line = "%-40s %10.0f %s/sec  p50 %8.1fus  p99 %8.1fus" % (
+        result['name'], result['units_per_sec'], units, latency['p50'],
+        latency['p99'])
+    if result['allocations_per_call'] is not None:
+        line += "  %8.1f allocs/call" % sum(
+            result['allocations_per_call'].values())
+    if result['alloc_peak_bytes_per_call'] is not None:
+        line += "  %8.0f B/call" % result['alloc_peak_bytes_per_call']
+    print line
+
+
+def write_results(path, results, **details):
+    """
+    Write results to path as JSON, along with enough about the environment
+    to tell whether two result files are comparable.
+    """
+    document = {
+        'created': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'allocations_traced': tracemalloc is not None,
+        'results': results,
+    }
+    document.update(details)
+
+    results_file = open(path, 'w')
+    try:
+        json.dump(document, results_file, indent=2, sort_keys=True)
+    finally:
+        results_file.close()
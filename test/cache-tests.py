@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+
+#   Rounder - Poker for the GNOME Desktop
+#
+#   Copyright (C) 2009 Devan Goodwin <dgoodwin@dangerouslyinc.com>
+#   Copyright (C) 2009 James Bowes <jbowes@dangerouslyinc.com>
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+#   02110-1301  USA
+
+""" Tests for the rounder.cache module. """
+
+import unittest
+
+from rounder.cache import LRUCache
+
+
+class LRUCacheTests(unittest.TestCase):
+
+    def test_get_put(self):
+        cache = LRUCache(10)
+        cache.put('a', 1)
+        self.assertEquals(1, cache.get('a'))
+        self.assertEquals(None, cache.get('b'))
+        self.assertEquals(1, cache.hits)
+        self.assertEquals(1, cache.misses)
+
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.get('a')
+        cache.put('c', 3)
+        self.assertEquals(2, len(cache))
+        self.assertTrue('a' in cache)
+        self.assertFalse('b' in cache)
+        self.assertTrue('c' in cache)
+        self.assertEquals(1, cache.evictions)
+
+    def test_update_existing(self):
+        cache = LRUCache(2)
+        cache.put('a', 1)
+        cache.put('a', 2)
+        self.assertEquals(1, len(cache))
+        self.assertEquals(2, cache.get('a'))
+
+    def test_stats_and_clear(self):
+        cache = LRUCache(1)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.get('b')
+        self.assertEquals({'hits': 1, 'misses': 0, 'evictions': 1,
+            'size': 1, 'maxsize': 1}, cache.stats())
+        cache.clear()
+        self.assertEquals(0, len(cache))
+        self.assertEquals(0, cache.evictions)
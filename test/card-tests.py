@@ -27,7 +27,7 @@ from rounder.card import DIAMOND
 from rounder.card import HEART
 from rounder.card import CLUB
 
-from rounder.card import Card
+from rounder.card import Card, CARDS, get_card_id
 from rounder.core import RounderException
 
 from utils import *
@@ -71,3 +71,34 @@ class CardTests(unittest.TestCase):
 
         kingOfHearts = Card("Kh")
         self.assertEquals("Kh", str(kingOfHearts))
+
+    def testCardsAreInterned(self):
+        self.assertTrue(Card('Ah') is Card(14, HEART))
+        self.assertTrue(Card('ah') is Card('A', 'h'))
+        self.assertTrue(Card('10c') is Card('Tc'))
+
+    def testIds(self):
+        self.assertEquals(52, len(CARDS))
+        for i in range(52):
+            self.assertEquals(i, CARDS[i].id)
+            self.assertTrue(Card.from_id(i) is CARDS[i])
+            self.assertTrue(Card.parse(str(CARDS[i])) is CARDS[i])
+        self.assertEquals(0, Card('2s').id)
+        self.assertEquals(51, Card('Ah').id)
+
+    def testImmutable(self):
+        card = Card('Kh')
+        self.assertRaises(AttributeError, setattr, card, 'rank', 2)
+
+    def testParseInvalid(self):
+        self.assertRaises(RounderException, Card.parse, 'Ax')
+        self.assertRaises(RounderException, Card.parse, '1c')
+        self.assertRaises(RounderException, Card.parse, 'A')
+
+    def testGetCardId(self):
+        self.assertEquals(0, get_card_id('2s'))
+        self.assertEquals(12, get_card_id('as'))
+        self.assertEquals(21, get_card_id('td'))
+        self.assertEquals(21, get_card_id('10d'))
+        self.assertEquals(51, get_card_id(Card('Ah')))
+        self.assertEquals(7, get_card_id(7))
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+
+#   Rounder - Poker for the GNOME Desktop
+#
+#   Copyright (C) 2009 Devan Goodwin <dgoodwin@dangerouslyinc.com>
+#   Copyright (C) 2009 James Bowes <jbowes@dangerouslyinc.com>
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+#   02110-1301  USA
+
+""" Tests for the rounder.cardset module. """
+
+import unittest
+
+from rounder.card import Card, SPADE, HEART
+from rounder.cardset import CardSet, canonical_key, canonical_mask, \
+        card_mask
+from rounder.evaluator import evaluate, evaluate_mask
+
+
+class CardSetTests(unittest.TestCase):
+
+    def test_create_from_cards(self):
+        cards = CardSet([Card('As'), 'kd', 0])
+        self.assertEquals(3, len(cards))
+        self.assertTrue(Card('As') in cards)
+        self.assertTrue('Kd' in cards)
+        self.assertTrue(Card('2s') in cards)
+        self.assertFalse('Ah' in cards)
+
+    def test_duplicates_collapse(self):
+        self.assertEquals(1, len(CardSet(['As', 'as', Card('As')])))
+
+    def test_iteration_ordered_by_id(self):
+        cards = CardSet(['Ah', '2s', 'Kd'])
+        self.assertEquals([Card('2s'), Card('Kd'), Card('Ah')],
+                list(cards))
+        self.assertEquals([0, 24, 51], cards.ids())
+
+    def test_set_operations(self):
+        first = CardSet(['As', 'Ks', 'Qs'])
+        second = CardSet(['Qs', 'Js'])
+        self.assertEquals(CardSet(['As', 'Ks', 'Qs', 'Js']), first | second)
+        self.assertEquals(CardSet(['Qs']), first & second)
+        self.assertEquals(CardSet(['As', 'Ks']), first - second)
+        self.assertFalse(first.isdisjoint(second))
+        self.assertTrue(CardSet(['Qs']).issubset(first))
+        self.assertEquals(49, len(~first))
+
+    def test_immutable_add_remove(self):
+        cards = CardSet(['As'])
+        more = cards.add('Ks')
+        self.assertEquals(1, len(cards))
+        self.assertEquals(2, len(more))
+        self.assertEquals(cards, more.remove('Ks'))
+
+    def test_full_deck(self):
+        deck = CardSet.full_deck()
+        self.assertEquals(52, len(deck))
+        self.assertEquals(list(Card.from_id(i) for i in range(52)),
+                deck.cards())
+
+    def test_suit_mask(self):
+        cards = CardSet(['2s', 'As', 'Ah', 'Kd'])
+        self.assertEquals(0x1001, cards.suit_mask(SPADE))
+        self.assertEquals(0x1000, cards.suit_mask(HEART))
+
+    def test_evaluate_mask(self):
+        hands = [['as', 'ks', 'qs', 'js', 'ts', '2d', '3c'],
+                 ['7s', '7d', '7c', 'ts', 'tc', 'ac'],
+                 ['2h', '3d', '4c', '5s', '9h']]
+        for hand in hands:
+            codes = [Card(card).id for card in hand]
+            self.assertEquals(evaluate(codes), evaluate_mask(card_mask(hand)))
+
+
+class CanonicalTests(unittest.TestCase):
+
+    def test_suit_permutations_share_canonical_mask(self):
+        first = card_mask(['as', 'ks', '2d', '2h', '7c'])
+        second = card_mask(['ah', 'kh', '2c', '2s', '7d'])
+        self.assertEquals(canonical_mask(first), canonical_mask(second))
+        self.assertEquals(evaluate_mask(first),
+                evaluate_mask(canonical_mask(first)))
+
+    def test_different_hands_differ(self):
+        first = card_mask(['as', 'ks', '2d', '2h', '7c'])
+        second = card_mask(['as', 'kd', '2d', '2h', '7c'])
+        self.assertNotEquals(canonical_mask(first), canonical_mask(second))
+
+    def test_pocket_and_board_key(self):
+        board = card_mask(['2s', '7d', 'jc'])
+        self.assertEquals(
+                canonical_key(card_mask(['ah', 'kh']), board),
+                canonical_key(card_mask(['ac', 'kc']),
+                    card_mask(['2s', '7d', 'jh'])))
+        # Same cards overall, but a different pocket:
+        self.assertNotEquals(
+                canonical_key(card_mask(['ah', 'kh']), board),
+                canonical_key(card_mask(['2s', 'kh']),
+                    card_mask(['ah', '7d', 'jc'])))
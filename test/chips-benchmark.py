@@ -0,0 +1,370 @@
+#!/usr/bin/env python
+
+#   Rounder - Poker for the GNOME Desktop
+#
+#   Copyright (C) 2009 Devan Goodwin <dgoodwin@dangerouslyinc.com>
+#   Copyright (C) 2009 James Bowes <jbowes@dangerouslyinc.com>
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+#   02110-1301  USA
+
+"""
+Chip accounting benchmark.
+
+Replays fixed seed betting sequences through Player.bet, Player.new_round,
+PotManager.add and TexasHoldemGame's pot payout, each on its own and all
+together as whole hands. Every target runs once with rounder.currency's
+integer cents Currency and once with the FixedPoint based Currency it
+replaced, kept in test/baselinecurrency.py. Reports operations per second,
+the Currency and FixedPoint objects constructed per hand and, where
+tracemalloc is available, bytes allocated per hand. Not part of the test
+suite, run it directly:
+
+    PYTHONPATH=src python test/chips-benchmark.py -o results.json
+
+and diff the results file before and after touching rounder.currency or
+rounder.fixedpoint.
+"""
+
+import random
+import sys
+from collections import defaultdict
+from optparse import OptionParser
+
+import settestpath
+
+import rounder.currency
+import rounder.game
+import rounder.player
+import rounder.pot
+from rounder.currency import Currency
+from rounder.fixedpoint import FixedPoint
+from rounder.game import TexasHoldemGame
+from rounder.player import Player
+from rounder.pot import PotManager
+
+from baselinecurrency import FixedPointCurrency
+
+from benchutils import ConstructionCounter, measure, print_result, \
+        write_results
+
+# Currency implementations to compare, name and class:
+CURRENCIES = [
+    ('cents', Currency),
+    ('fixedpoint', FixedPointCurrency),
+]
+
+# Modules the measured code looks Currency up in, this one included:
+CURRENCY_MODULES = [rounder.game, rounder.player, rounder.pot,
+                    sys.modules[__name__]]
+
+# Fixed limit bet sizes per street, and the stacks players start with. Short
+# stacks make for all-ins and side pots. Made into Currency as hands are
+# recorded:
+BET_SIZES = (2, 2, 4, 4)
+STACKS = (1000, 1000, 1000, 250, 60, 15, '7.50')
+
+# The payout method is private to the game, but only needs an instance:
+_game = TexasHoldemGame.__new__(TexasHoldemGame)
+payout_pot = _game._TexasHoldemGame__payout_pot
+
+# Every cents Currency not served from the small amount cache is built
+# through _new_currency, including those made by arithmetic. The baseline
+# builds a FixedPoint for every amount:
+ALLOCATIONS = [
+    ('Currency', rounder.currency, '_new_currency'),
+    ('FixedPoint', FixedPoint, '__init__'),
+]
+
+
+class Hand(object):
+
+    """
+    One recorded hand: starting stacks, the bets and folds of each betting
+    round and the showdown order of the seats.
+    """
+
+    def __init__(self, stacks, rounds, ranking):
+        self.stacks = stacks
+
+        # Per round, a list of ('bet', seat, amount, raise count) and
+        # ('fold', seat) actions in order:
+        self.rounds = rounds
+
+        # Seats best hand first, each entry a list of seats that tie:
+        self.ranking = ranking
+
+        self.players = [Player("player%d" % seat, seat=seat, chips=stack)
+                        for seat, stack in enumerate(stacks)]
+
+    def reset_players(self):
+        """ Put the players back as they were at the start of the hand. """
+        for player, stack in zip(self.players, self.stacks):
+            player.chips = stack
+            player.allin = False
+            player.folded = False
+            player.current_bet = Currency(0)
+            player.raise_count = -1
+
+    def operation_count(self):
+        bets = sum([len([action for action in actions if action[0] == 'bet'])
+                    for actions in self.rounds])
+        return bets + len(self.rounds) * (len(self.players) + 1)
+
+
+def record_hand(rand, seats):
+    """ Play out a hand of random but legal fixed limit betting. """
+    stacks = [Currency(rand.choice(STACKS)) for i in range(seats)]
+    chips = list(stacks)
+    live = range(seats)
+    rounds = []
+
+    for bet_size in BET_SIZES:
+        bet_size = Currency(bet_size)
+        actions = []
+        rounds.append(actions)
+        acting = [seat for seat in live if chips[seat] > 0]
+        if len(acting) < 2:
+            continue
+
+        current = [Currency(0)] * seats
+        to_match = Currency(0)
+        raise_count = 0
+        # One pass where anyone may raise, then the callers catch up:
+        for final_pass in (False, True):
+            for seat in list(acting):
+                if chips[seat] == 0 or current[seat] == to_match and \
+                        final_pass:
+                    continue
+                choice = rand.random()
+                # Someone who is not all in has to stay in to the end, or
+                # nobody would be left for the side pots:
+                can_fold = len(live) > 2 and \
+                        len([other for other in acting if chips[other]]) > 1
+                if choice < 0.15 and can_fold:
+                    actions.append(('fold', seat))
+                    live.remove(seat)
+                    acting.remove(seat)
+                    continue
+                if choice > 0.75 and not final_pass:
+                    raise_count += 1
+                    to_match += bet_size
+                amount = min(to_match - current[seat], chips[seat])
+                actions.append(('bet', seat, amount, raise_count))
+                chips[seat] -= amount
+                current[seat] += amount
+
+    ranking = []
+    order = list(live)
+    rand.shuffle(order)
+    while order:
+        # Occasionally split with the next best seat:
+        size = 1
+        if len(order) > 1 and rand.random() < 0.1:
+            size = 2
+        ranking.append(order[:size])
+        order = order[size:]
+
+    return Hand(stacks, rounds, ranking)
+
+
+def play_bets(hand):
+    players = hand.players
+    for actions in hand.rounds:
+        for action in actions:
+            if action[0] == 'bet':
+                players[action[1]].bet(action[2], action[3])
+        for player in players:
+            player.new_round()
+
+
+def collect_round(hand, pot_mgr, actions):
+    players = hand.players
+    for action in actions:
+        if action[0] == 'bet':
+            players[action[1]].bet(action[2], action[3])
+        else:
+            players[action[1]].folded = True
+            pot_mgr.fold(players[action[1]])
+
+    amounts = defaultdict(list)
+    for player in players:
+        amount = player.new_round()
+        if amount > 0:
+            amounts[amount].append(player)
+    pot_mgr.add(amounts)
+
+
+def pay_pots(hand, pot_mgr):
+    for pot in pot_mgr.pots:
+        for seats in hand.ranking:
+            winners = [(hand.players[seat], "a hand") for seat in seats
+                       if hand.players[seat] in pot.players]
+            if winners:
+                payout_pot(pot, winners)
+                break
+
+
+def play_hand(hand):
+    pot_mgr = PotManager()
+    for actions in hand.rounds:
+        collect_round(hand, pot_mgr, actions)
+    pay_pots(hand, pot_mgr)
+    return pot_mgr
+
+
+def check_hand(hand):
+    """ Play a hand and make sure no chips went missing. """
+    hand.reset_players()
+    pot_mgr = play_hand(hand)
+    total = sum([player.chips for player in hand.players], Currency(0))
+    if total != sum(hand.stacks, Currency(0)):
+        raise Exception("Chips went missing: %s" % hand.rounds)
+    return pot_mgr
+
+
+def use_currency(currency_class):
+    """ Make the players, pots and games measured use currency_class. """
+    for module in CURRENCY_MODULES:
+        module.Currency = currency_class
+
+
+def bet_call(hand):
+    def call():
+        hand.reset_players()
+        play_bets(hand)
+    return call
+
+
+def new_round_call(hand):
+    def call():
+        for player in hand.players:
+            player.current_bet = Currency(5)
+        for actions in hand.rounds:
+            for player in hand.players:
+                player.new_round()
+    return call
+
+
+def pot_call(hand):
+    # Every round's bets, already gathered the way the game hands them to
+    # the pot manager:
+    hand.reset_players()
+    gathered = []
+    folds = []
+    for actions in hand.rounds:
+        for action in actions:
+            if action[0] == 'bet':
+                hand.players[action[1]].bet(action[2], action[3])
+        amounts = defaultdict(list)
+        for player in hand.players:
+            amount = player.new_round()
+            if amount > 0:
+                amounts[amount].append(player)
+        gathered.append(dict(amounts))
+        folds.append([hand.players[action[1]] for action in actions
+                      if action[0] == 'fold'])
+    allin = [player for player in hand.players if player.allin]
+
+    def call():
+        for player in hand.players:
+            player.allin = player in allin
+        pot_mgr = PotManager()
+        for amounts, folded in zip(gathered, folds):
+            for player in folded:
+                pot_mgr.fold(player)
+            pot_mgr.add(amounts)
+    return call
+
+
+def payout_call(hand):
+    hand.reset_players()
+    pot_mgr = play_hand(hand)
+
+    def call():
+        pay_pots(hand, pot_mgr)
+    return call
+
+
+def hand_call(hand):
+    def call():
+        hand.reset_players()
+        play_hand(hand)
+    return call
+
+
+# name, call factory, operations per hand:
+TARGETS = [
+    ('Player.bet', bet_call, lambda hand: sum([
+        len([action for action in actions if action[0] == 'bet'])
+        for actions in hand.rounds])),
+    ('Player.new_round', new_round_call,
+        lambda hand: len(hand.rounds) * len(hand.players)),
+    ('PotManager.add', pot_call, lambda hand: len(hand.rounds)),
+    ('payout', payout_call, lambda hand: len(check_hand(hand).pots)),
+    ('whole hand', hand_call, lambda hand: hand.operation_count()),
+]
+
+
+def main():
+    parser = OptionParser()
+    parser.add_option("-s", "--seed", dest="seed", default=1234, type="int",
+        help="random seed for the betting (default: 1234)")
+    parser.add_option("-n", "--hands", dest="hands", default=2000,
+        type="int", help="hands per table size (default: 2000)")
+    parser.add_option("-o", "--output", dest="output",
+        default="chips-benchmark.json",
+        help="results file (default: chips-benchmark.json)")
+    (options, args) = parser.parse_args()
+
+    counter = ConstructionCounter(ALLOCATIONS)
+    results = []
+    try:
+        for currency_name, currency_class in CURRENCIES:
+            use_currency(currency_class)
+            for seats in (2, 6, 10):
+                # Same seed, so both implementations replay the same hands:
+                rand = random.Random(options.seed)
+                hands = [record_hand(rand, seats)
+                         for i in range(options.hands)]
+                for target_name, factory, operations in TARGETS:
+                    calls = [factory(hand) for hand in hands]
+                    ops_per_hand = float(sum([operations(hand)
+                                              for hand in hands])) \
+                            / len(hands)
+                    name = "%s %d-handed [%s]" % (target_name, seats,
+                                                  currency_name)
+                    result = measure(name, calls,
+                                     units_per_call=ops_per_hand,
+                                     counter=counter, target=target_name,
+                                     currency=currency_name, seats=seats,
+                                     ops_per_hand=ops_per_hand)
+                    # Every call replays one hand:
+                    result['hands_per_sec'] = \
+                            result['calls'] / result['seconds']
+                    result['allocations_per_hand'] = \
+                            result['allocations_per_call']
+                    print_result(result, units="ops")
+                    results.append(result)
+    finally:
+        use_currency(rounder.currency.Currency)
+
+    write_results(options.output, results, seed=options.seed,
+                  hands=options.hands)
+    print "wrote %s" % options.output
+
+
+if __name__ == "__main__":
+    main()
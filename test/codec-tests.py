@@ -0,0 +1,200 @@
+#   Rounder - Poker for the GNOME Desktop
+#
+#   Copyright (C) 2009 Devan Goodwin <dgoodwin@dangerouslyinc.com>
+#   Copyright (C) 2009 James Bowes <jbowes@dangerouslyinc.com>
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+#   02110-1301  USA
+
+""" Tests for the rounder.network.codec module. """
+
+import unittest
+
+from rounder.action import PostBlind, Call, Raise, Fold
+from rounder.card import Card, SPADE
+from rounder.core import RounderException
+from rounder.currency import Currency
+from rounder.dto import TableState, TableStateDelta, TableListing, \
+        PlayerState, PotState, PotWinner
+from rounder.event import ALL_EVENTS, Event, PlayerJoinedTable, \
+        PlayerLeftTable, PlayerPrompted, PlayerSatOut, NewHandStarted, \
+        HandCancelled, PlayerPostedBlind, HoleCardsDealt, \
+        CommunityCardsDealt, PlayerCalled, PlayerRaised, PlayerFolded, \
+        GameEnding, PlayerShowedCards, GameOver, PlayerSentChatMessage
+from rounder.limit import Limit, FixedLimit
+from rounder.network.codec import SCHEMAS, BinaryCodec, CerealizerCodec, \
+        NameTable, new_codec, BINARY, CEREALIZER
+from rounder.network.serialize import dumps, register_message_classes
+from rounder.pot import Pot
+
+from utils import create_table
+
+register_message_classes()
+
+
+def sample_messages():
+    """ Return an instance of every class the binary codec knows. """
+    limit, table, players = create_table([1000, 500, 250], 0)
+    old_state = TableState(table)
+    players[1].sitting_out = True
+    state = TableState(table)
+    state.community_cards = [Card('As'), Card('Td'), Card('2c')]
+    state.pots = [PotState(Pot(players, is_main_pot=True))]
+    state.dealer_seat_num = 2
+    state.sequence = 7
+    delta = TableStateDelta(8, old_state, state)
+    pot_winner = PotWinner('player0', Currency('12.34'), 'a pair of aces')
+
+    raise_action = Raise(Currency(4), Currency(2), Currency(1))
+    raise_action.amount = Currency(3)
+
+    joined = PlayerJoinedTable(table, 'player0', 0)
+    joined.state_delta = delta
+    return [
+        SPADE,
+        state,
+        delta,
+        TableListing(table),
+        PotState(Pot(players)),
+        pot_winner,
+        PlayerState(players[0]),
+        PostBlind(Currency(1)),
+        Call(Currency('0.50')),
+        raise_action,
+        Raise(None, Currency(2), Currency(0)),
+        Fold(),
+        Limit(),
+        limit,
+
+        Event(table),
+        joined,
+        PlayerLeftTable(table, 'player1', 1),
+        PlayerPrompted(table, 'player2'),
+        PlayerSatOut(table, 'player1'),
+        NewHandStarted(table, players, 0),
+        HandCancelled(table),
+        PlayerPostedBlind(table, 'player1', Currency(1)),
+        HoleCardsDealt(table, [Card('Ah'), Card('Kh')]),
+        CommunityCardsDealt(table, [Card('2d')]),
+        PlayerCalled(table, 'player2', Currency(2)),
+        PlayerRaised(table, 'player0', Currency(2)),
+        PlayerFolded(table, 'player1'),
+        GameEnding(table),
+        PlayerShowedCards(table, 'player0', [Card('Ah'), Card('Kh')]),
+        GameOver(table, [(PotState(Pot(players)), [pot_winner])]),
+        PlayerSentChatMessage(table, 'player2', u'gl \xe9veryone'),
+    ]
+
+
+class BinaryCodecTests(unittest.TestCase):
+
+    def setUp(self):
+        self.names = NameTable()
+        self.server = BinaryCodec(self.names)
+        self.client = BinaryCodec()
+
+    def round_trip(self, obj):
+        data, name_ids = self.server.encode(obj)
+        self.client.names.define(self.names.lookup(name_ids))
+        return self.client.loads(data)
+
+    def test_every_class_has_a_sample(self):
+        self.assertEquals(set([value_class for value_class, fields in
+                               SCHEMAS]),
+                          set([obj.__class__ for obj in sample_messages()]))
+        for event_class in ALL_EVENTS:
+            self.assertTrue(event_class in [value_class for value_class,
+                                            fields in SCHEMAS])
+
+    def test_schemas_cover_every_attribute(self):
+        schemas = dict(SCHEMAS)
+        for obj in sample_messages():
+            self.assertEquals(sorted(obj.__dict__.keys()),
+                sorted([name for name, kind in schemas[obj.__class__]]))
+
+    def test_round_trip(self):
+        for obj in sample_messages():
+            new_obj = self.round_trip(obj)
+            self.assertEquals(obj.__class__, new_obj.__class__)
+            self.assertEquals(sorted(obj.__dict__.keys()),
+                sorted(new_obj.__dict__.keys()))
+            # Anything left different would serialize differently:
+            self.assertEquals(dumps(obj), dumps(new_obj))
+
+    def test_values(self):
+        values = [None, True, False, 0, 1, -1, 63, -64, 64, 2 ** 40,
+            -(2 ** 70), "", "text", u"\u2660", [], [1, [2]], (1, "a"),
+            {1: None, "a": [True]}, Currency(0), Currency('-0.01'),
+            Currency(10 ** 6), Card('As')]
+        self.assertEquals(values, self.round_trip(values))
+
+    def test_interned(self):
+        cards, amount = self.round_trip(([Card('As')], Currency(0)))
+        self.assertTrue(cards[0] is Card('As'))
+        self.assertTrue(amount is Currency(0))
+
+    def test_cards_one_byte(self):
+        three = len(self.server.dumps(CommunityCardsDealt(None,
+            [Card('As'), Card('Td'), Card('2c')])))
+        one = len(self.server.dumps(CommunityCardsDealt(None,
+            [Card('As')])))
+        self.assertEquals(2, three - one)
+
+    def test_name_ids(self):
+        data, name_ids = self.server.encode(PlayerFolded(None, 'player0'))
+        self.assertEquals(set([self.names.id_for('player0')]), name_ids)
+        data, name_ids = self.server.encode(PlayerFolded(None, 'player1'))
+        self.assertEquals(set([1]), name_ids)
+        data, name_ids = self.server.encode(Call(Currency(1)))
+        self.assertEquals(set(), name_ids)
+
+    def test_unknown_name(self):
+        data = self.server.dumps(PlayerFolded(None, 'player0'))
+        self.assertRaises(RounderException, self.client.loads, data)
+
+    def test_truncated(self):
+        data, name_ids = self.server.encode(sample_messages()[1])
+        self.client.names.define(self.names.lookup(name_ids))
+        for length in range(len(data)):
+            self.assertRaises(RounderException, self.client.loads,
+                data[:length])
+
+    def test_trailing_bytes(self):
+        data = self.server.dumps(Call(Currency(1)))
+        self.assertRaises(RounderException, self.client.loads, data + '\0')
+
+    def test_unknown_class(self):
+        self.assertRaises(RounderException, self.server.dumps, object())
+        self.assertRaises(RounderException, self.server.dumps, 1.5)
+
+    def test_smaller_than_cerealizer(self):
+        for obj in sample_messages():
+            self.assertTrue(len(self.server.dumps(obj)) < len(dumps(obj)))
+
+
+class NewCodecTests(unittest.TestCase):
+
+    def test_wire_formats(self):
+        self.assertTrue(isinstance(new_codec(CEREALIZER), CerealizerCodec))
+        codec = new_codec(BINARY)
+        self.assertTrue(isinstance(codec, BinaryCodec))
+        self.assertTrue(isinstance(codec.names, NameTable))
+
+    def test_shared_names(self):
+        names = NameTable()
+        self.assertTrue(new_codec(BINARY, names).names is names)
+
+    def test_unknown_wire_format(self):
+        self.assertRaises(RounderException, new_codec, "xml")
@@ -0,0 +1,127 @@
+#   Rounder - Poker for the GNOME Desktop
+#
+#   Copyright (C) 2006 Devan Goodwin <dgoodwin@dangerouslyinc.com>
+#   Copyright (C) 2006 James Bowes <jbowes@dangerouslyinc.com>
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+#   02110-1301  USA
+
+""" Tests for the rounder.currency module. """
+
+import copy
+import unittest
+
+from rounder.currency import Currency, CACHE_CENTS
+from rounder.fixedpoint import FixedPoint
+
+
+class ConstructorTests(unittest.TestCase):
+
+    def test_forms(self):
+        self.assertEquals(500, Currency(5).cents)
+        self.assertEquals(500, Currency(5L).cents)
+        self.assertEquals(5, Currency(0.05).cents)
+        self.assertEquals(1234, Currency('12.34').cents)
+        self.assertEquals(-150, Currency('-1.5').cents)
+        self.assertEquals(0, Currency().cents)
+        self.assertEquals(250, Currency(FixedPoint('2.5')).cents)
+        amount = Currency(7)
+        self.assertTrue(Currency(amount) is amount)
+
+    def test_rounds_like_fixedpoint(self):
+        for value in (0.125, 0.135, '0.125', '0.135', 1.005, -2.675, 1e-9):
+            self.assertEquals(str(FixedPoint(value)), str(Currency(value)))
+
+    def test_precision(self):
+        self.assertEquals(2, Currency(1, 2).precision)
+        self.assertRaises(ValueError, Currency, 1, 3)
+
+    def test_bad_value(self):
+        self.assertRaises(TypeError, Currency, None)
+        self.assertRaises(ValueError, Currency, 'lots')
+
+
+class FormattingTests(unittest.TestCase):
+
+    def test_str(self):
+        self.assertEquals("0.00", str(Currency(0)))
+        self.assertEquals("0.05", str(Currency(0.05)))
+        self.assertEquals("1000.00", str(Currency(1000)))
+        self.assertEquals("-0.50", str(Currency(-0.5)))
+        self.assertEquals("Currency('3.10')", repr(Currency(3.1)))
+
+
+class ArithmeticTests(unittest.TestCase):
+
+    def test_add_subtract(self):
+        self.assertEquals(Currency('1.01'), Currency(1) + 0.01)
+        self.assertEquals(Currency('1.01'), 0.01 + Currency(1))
+        self.assertEquals(Currency('0.99'), Currency(1) - Currency('0.01'))
+        self.assertEquals(Currency(-4), 1 - Currency(5))
+        self.assertEquals(Currency(3), -Currency(-3))
+        self.assertEquals(Currency(3), abs(Currency(-3)))
+
+    def test_multiply_divide(self):
+        self.assertEquals(Currency(30), Currency(10) * 3)
+        self.assertEquals(Currency('0.33'), Currency(1) / 3)
+        self.assertEquals(Currency('0.02'), Currency('0.05') / 2)
+        self.assertEquals(Currency('0.12'), Currency('0.25') / 2)
+        self.assertEquals(Currency(2), Currency(4) / Currency(2))
+        self.assertEquals(Currency('1.25'), Currency('2.5') * 0.5)
+        self.assertRaises(ZeroDivisionError, lambda: Currency(1) / 0)
+
+    def test_divmod(self):
+        quotient, remainder = divmod(Currency(10), 3)
+        self.assertEquals(3, quotient)
+        self.assertEquals(Currency(1), remainder)
+        self.assertEquals(Currency('0.01'), Currency('1.01') % 1)
+
+    def test_comparisons(self):
+        self.assertTrue(Currency(5) == 5)
+        self.assertTrue(Currency('0.5') == 0.5)
+        self.assertTrue(Currency(1) < 1.01)
+        self.assertTrue(Currency(2) >= Currency(2))
+        self.assertFalse(Currency(0))
+        self.assertTrue(Currency('0.01'))
+        self.assertFalse(Currency(0) == None)
+        self.assertTrue(Currency(0) != None)
+
+    def test_conversions(self):
+        self.assertEquals(2.5, float(Currency('2.5')))
+        self.assertEquals(2, int(Currency('2.99')))
+        self.assertEquals(-2, int(Currency('-2.99')))
+        self.assertEquals(Currency('0.99'), Currency('2.99').frac())
+
+
+class ValueTests(unittest.TestCase):
+
+    def test_hash_matches_numbers(self):
+        self.assertEquals(hash(5), hash(Currency(5)))
+        self.assertEquals(hash(0.5), hash(Currency(0.5)))
+        amounts = {10: 'ten'}
+        self.assertEquals('ten', amounts[Currency(10)])
+
+    def test_small_values_shared(self):
+        self.assertTrue(Currency(2) is Currency('2.00'))
+        self.assertTrue(Currency(1) + 1 is Currency(2))
+        large = Currency.from_cents(CACHE_CENTS + 1)
+        self.assertEquals(large, Currency.from_cents(CACHE_CENTS + 1))
+        self.assertFalse(large is Currency.from_cents(CACHE_CENTS + 1))
+
+    def test_immutable(self):
+        amount = Currency(1)
+        self.assertRaises(AttributeError, setattr, amount, 'cents', 5)
+        self.assertTrue(copy.copy(amount) is amount)
+        self.assertTrue(copy.deepcopy(amount) is amount)
@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+
+#   Rounder - Poker for the GNOME Desktop
+#
+#   Copyright (C) 2009 Devan Goodwin <dgoodwin@dangerouslyinc.com>
+#   Copyright (C) 2009 James Bowes <jbowes@dangerouslyinc.com>
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+#   02110-1301  USA
+
+""" Tests for the rounder.equity module. """
+
+import random
+import unittest
+
+from rounder.core import RounderException
+from rounder.equity import equity, equity_cache, sample_equity
+
+
+class ExhaustiveEquityTests(unittest.TestCase):
+
+    def test_complete_board(self):
+        results = equity([['ac', 'ah'], ['kc', 'kd']],
+                ['as', 'ks', '2d', '2s', '5c'])
+        self.assertEquals(1, results[0].runouts)
+        self.assertEquals(1.0, results[0].win)
+        self.assertEquals(1.0, results[1].lose)
+
+    def test_board_plays(self):
+        results = equity([['ac', 'kh'], ['as', 'qd']],
+                ['7s', '7d', '7c', 'ts', 'tc'])
+        for result in results:
+            self.assertEquals(1.0, result.tie)
+            self.assertEquals(0.5, result.equity)
+
+    def test_river_to_come(self):
+        # Kings need one of the two remaining kings in 44 cards:
+        results = equity([['ah', 'ad'], ['kh', 'kd']],
+                ['2c', '7d', '9s', 'js'])
+        self.assertEquals(44, results[0].runouts)
+        self.assertEquals(42, results[0].wins)
+        self.assertEquals(2, results[1].wins)
+        self.assertEquals(0, results[0].ties)
+
+    def test_dead_cards(self):
+        results = equity([['ah', 'ad'], ['kh', 'kd']],
+                ['2c', '7d', '9s', 'js'], dead=['ks'])
+        self.assertEquals(43, results[0].runouts)
+        self.assertEquals(1, results[1].wins)
+
+    def test_flop_equities_sum_to_one(self):
+        results = equity([['ah', 'kh'], ['qs', 'qd'], ['7c', '8c']],
+                ['2h', '9h', 'tc'])
+        self.assertEquals(903, results[0].runouts)
+        total = sum([result.equity for result in results])
+        self.assertAlmostEquals(1.0, total)
+
+    def test_process_pool_matches(self):
+        pockets = [['ah', 'kh'], ['qs', 'qd']]
+        board = ['2h', '9h', 'tc']
+        equity_cache.clear()
+        serial = equity(pockets, board, processes=1)
+        equity_cache.clear()
+        pooled = equity(pockets, board, processes=2)
+        for i in range(2):
+            self.assertEquals(serial[i].wins, pooled[i].wins)
+            self.assertEquals(serial[i].ties, pooled[i].ties)
+
+    def test_suit_permutation_hits_cache(self):
+        equity_cache.clear()
+        first = equity([['ah', 'kh'], ['qs', 'qd']], ['2h', '9h', 'tc'])
+        second = equity([['as', 'ks'], ['qh', 'qd']], ['2s', '9s', 'tc'])
+        self.assertEquals(1, equity_cache.misses)
+        self.assertEquals(1, equity_cache.hits)
+        self.assertEquals(first, second)
+
+        # The same cards in different pockets are a different deal:
+        third = equity([['qs', 'qd'], ['ah', 'kh']], ['2h', '9h', 'tc'])
+        self.assertEquals(2, equity_cache.misses)
+        self.assertEquals(first[0].wins, third[1].wins)
+
+    def test_same_card_twice(self):
+        self.assertRaises(RounderException, equity,
+                [['ah', 'ad'], ['ah', 'kd']], [])
+        self.assertRaises(RounderException, equity,
+                [['ah', 'ad']], ['ad', '2c', '3c'])
+
+    def test_bad_pocket(self):
+        self.assertRaises(RounderException, equity, [['ah']], [])
+
+
+class SampledEquityTests(unittest.TestCase):
+
+    def test_close_to_exhaustive(self):
+        pockets = [['ah', 'kh'], ['qs', 'qd']]
+        board = ['2h', '9h', 'tc']
+        exact = equity(pockets, board)
+        estimates = sample_equity(pockets, board, target_error=0.01,
+                rand=random.Random(42))
+        for i in range(2):
+            low, high = estimates[i].confidence_interval
+            self.assertTrue(estimates[i].standard_error <= 0.01)
+            self.assertTrue(abs(exact[i].equity - estimates[i].equity) <
+                    4 * estimates[i].standard_error)
+            self.assertTrue(low <= estimates[i].equity <= high)
+
+    def test_max_samples(self):
+        estimates = sample_equity([['ah', 'kh'], ['qs', 'qd']], [],
+                target_error=0.0, batch_size=300, max_samples=500,
+                rand=random.Random(1))
+        self.assertEquals(500, estimates[0].samples)
+
+    def test_time_limit(self):
+        estimates = sample_equity([['ah', 'kh'], ['qs', 'qd']], [],
+                target_error=0.0, time_limit=0, batch_size=100,
+                rand=random.Random(1))
+        self.assertEquals(100, estimates[0].samples)
+
+    def test_certain_winner_converges_immediately(self):
+        estimates = sample_equity([['ah', 'ad'], ['2c', '3d']],
+                ['as', 'ac', 'kd', 'qs'], batch_size=50,
+                rand=random.Random(1))
+        self.assertEquals(50, estimates[0].samples)
+        self.assertEquals(1.0, estimates[0].equity)
+        self.assertEquals(0.0, estimates[0].standard_error)
@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+
+#   Rounder - Poker for the GNOME Desktop
+#
+#   Copyright (C) 2009 Devan Goodwin <dgoodwin@dangerouslyinc.com>
+#   Copyright (C) 2009 James Bowes <jbowes@dangerouslyinc.com>
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+#   02110-1301  USA
+
+"""
+Hand evaluator throughput benchmark.
+
+Times FullHand evaluation, get_winners and PokerEval.winners over fixed
+seed random showdowns and over boards built to hit the slowest hand
+categories. The cost of constructing a FullHand without evaluating it is
+reported as a separate target, and every target reports the FullHand and
+HandValue objects it constructs per showdown. Not part of the test suite,
+run it directly:
+
+    PYTHONPATH=src python test/evaluator-benchmark.py -o results.json
+
+and diff the results file between releases.
+"""
+
+import random
+from optparse import OptionParser
+
+import settestpath
+
+from rounder import evaluator
+from rounder.evaluator import FullHand, HandValue, PokerEval, get_winners
+
+from benchutils import ConstructionCounter, measure, print_result, \
+        write_results
+
+SUITS = 'sdch'
+RANKS = '23456789tjqka'
+
+
+def make_deck():
+    return [rank + suit for suit in SUITS for rank in RANKS]
+
+
+def random_showdown(rand, players):
+    """ Deal a random board and pockets from a fresh deck. """
+    cards = rand.sample(make_deck(), 5 + 2 * players)
+    pockets = [cards[5 + 2 * i:7 + 2 * i] for i in range(players)]
+    return pockets, cards[:5]
+
+
+def straight_showdown(rand, players):
+    """ Deal a board holding four to a straight, without a flush. """
+    low = rand.randint(0, len(RANKS) - 5)
+    board = [RANKS[low + i] + SUITS[i % 4] for i in range(4)]
+    deck = [card for card in make_deck() if card not in board]
+    cards = rand.sample(deck, 1 + 2 * players)
+    pockets = [cards[1 + 2 * i:3 + 2 * i] for i in range(players)]
+    return pockets, board + cards[:1]
+
+
+def flush_showdown(rand, players):
+    """ Deal a board holding four cards of one suit. """
+    suit = rand.choice(SUITS)
+    board = [rank + suit for rank in rand.sample(RANKS, 4)]
+    deck = [card for card in make_deck() if card not in board]
+    cards = rand.sample(deck, 1 + 2 * players)
+    pockets = [cards[1 + 2 * i:3 + 2 * i] for i in range(players)]
+    return pockets, board + cards[:1]
+
+
+# FullHand has its own __init__, so HandValue's only counts plain values:
+ALLOCATIONS = [
+    ('FullHand', FullHand, '__init__'),
+    ('HandValue', HandValue, '__init__'),
+]
+
+SCENARIOS = [
+    ('random', random_showdown),
+    ('straights', straight_showdown),
+    ('flushes', flush_showdown),
+]
+
+
+def full_hand_call(pockets, board):
+    # FullHand evaluates lazily, comparing the hands forces the evaluation:
+    def call():
+        max([FullHand(pocket, board) for pocket in pockets])
+    return call
+
+
+def full_hand_construction_call(pockets, board):
+    def call():
+        for pocket in pockets:
+            FullHand(pocket, board)
+    return call
+
+
+def get_winners_call(pockets, board):
+    def call():
+        get_winners(pockets, board)
+    return call
+
+
+def poker_eval_call(pockets, board):
+    poker_eval = PokerEval()
+
+    def call():
+        poker_eval.winners(game="holdem", pockets=pockets, board=board)
+    return call
+
+
+TARGETS = [
+    ('FullHand', full_hand_call),
+    ('FullHand init only', full_hand_construction_call),
+    ('get_winners', get_winners_call),
+    ('PokerEval.winners', poker_eval_call),
+]
+
+
+def main():
+    parser = OptionParser()
+    parser.add_option("-s", "--seed", dest="seed", default=1234, type="int",
+        help="random seed for the deals (default: 1234)")
+    parser.add_option("-n", "--showdowns", dest="showdowns", default=2000,
+        type="int", help="showdowns per scenario (default: 2000)")
+    parser.add_option("-o", "--output", dest="output",
+        default="evaluator-benchmark.json",
+        help="results file (default: evaluator-benchmark.json)")
+    (options, args) = parser.parse_args()
+
+    # Table loading is a one off cost, keep it out of the timings:
+    evaluator.load_tables()
+
+    counter = ConstructionCounter(ALLOCATIONS)
+    results = []
+    for players in (2, 6, 10):
+        for scenario_name, scenario in SCENARIOS:
+            rand = random.Random(options.seed)
+            deals = [scenario(rand, players)
+                     for i in range(options.showdowns)]
+            for target_name, target in TARGETS:
+                calls = [target(pockets, board) for pockets, board in deals]
+                name = "%s %s %d-handed" % (target_name, scenario_name,
+                                            players)
+                result = measure(name, calls, units_per_call=players,
+                                 counter=counter, target=target_name,
+                                 scenario=scenario_name, players=players)
+                result['allocations_per_showdown'] = \
+                        result['allocations_per_call']
+                print_result(result, units="hands")
+                results.append(result)
+
+    write_results(options.output, results, seed=options.seed,
+                  showdowns=options.showdowns)
+    print "wrote %s" % options.output
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+
+#   Rounder - Poker for the GNOME Desktop
+#
+#   Copyright (C) 2009 Devan Goodwin <dgoodwin@dangerouslyinc.com>
+#   Copyright (C) 2009 James Bowes <jbowes@dangerouslyinc.com>
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+#   02110-1301  USA
+
+"""
+Differential check of two evaluator backends.
+
+Runs both backends over the same numbered random deals in a process pool
+and reports the first deal they pick different winners for. Not part of
+the test suite, run it directly:
+
+    PYTHONPATH=src python test/evaluator-differential.py -a python -b tables
+
+Exits non-zero if the backends disagree.
+"""
+
+import sys
+from optparse import OptionParser
+
+import settestpath
+
+from rounder.evaluator import BACKENDS
+from rounder.evalcheck import GAME_DEALS, compare_backends
+
+
+def main():
+    parser = OptionParser()
+    parser.add_option("-a", dest="first", default="python",
+        help="first backend (default: python)")
+    parser.add_option("-b", dest="second", default="tables",
+        help="second backend (default: tables)")
+    parser.add_option("-g", "--game", dest="game", default="holdem",
+        help="one of %s (default: holdem)" % ", ".join(sorted(GAME_DEALS)))
+    parser.add_option("-n", "--deals", dest="deals", default=100000,
+        type="int", help="deals to compare (default: 100000)")
+    parser.add_option("-s", "--seed", dest="seed", default=0, type="int",
+        help="random seed for the deals (default: 0)")
+    parser.add_option("-j", "--processes", dest="processes", default=None,
+        type="int", help="worker processes (default: one per CPU)")
+    (options, args) = parser.parse_args()
+
+    print "available backends: %s" % ", ".join(sorted(BACKENDS))
+    disagreement = compare_backends(options.first, options.second,
+            deals=options.deals, game=options.game, seed=options.seed,
+            processes=options.processes)
+    if disagreement is None:
+        print "%s and %s agree on %d %s deals" % (options.first,
+            options.second, options.deals, options.game)
+        return 0
+
+    print "first disagreement, %s" % disagreement
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
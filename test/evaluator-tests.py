@@ -21,9 +21,22 @@
 #   02110-1301  USA
 
 
+import itertools
+import random
 import unittest
 
-from rounder.evaluator import FullHand
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from rounder.card import get_card_id
+from rounder.core import RounderException
+from rounder import evaluator
+from rounder.evaluator import FullHand, HandState, HandValue, PokerEval, \
+        evaluate, evaluate_batch, evaluate_omaha, get_winners, \
+        get_omaha_winners, get_five_card_winners, range_strength, \
+        pack_tables, unpack_tables, RANK_KEYS
 
 
 class FullHandTest(unittest.TestCase):
@@ -484,3 +497,296 @@ class FullHandReprTests(unittest.TestCase):
         self.assertEquals("a high card (AQT76)", str(hand))
 
 
+
+
+class LazyFullHandTests(unittest.TestCase):
+
+    def testNothingComputedUntilNeeded(self):
+        hand = FullHand(('as', 'ks'), ('qs', 'js', '10s', '2d', '3c'))
+        self.assertEquals(None, hand._FullHand__relative_value)
+        self.assertEquals(None, hand._FullHand__ranks)
+
+        self.assertEquals(0x9EDCBA, hand._relative_value)
+        self.assertEquals(None, hand._FullHand__ranks)
+        self.assertTrue(hand.is_royal())
+
+    def testComparisonComputesValue(self):
+        board = ('7s', '7d', '7c', 'ts', 'tc')
+        hand1 = FullHand(('ac', 'kh'), board)
+        hand2 = FullHand(('2h', '5d'), board)
+        self.assertEquals(hand1, hand2)
+        self.assertEquals(0x67A000, hand1._FullHand__relative_value)
+
+
+class EvaluateTests(unittest.TestCase):
+
+    def testRoyal(self):
+        codes = [get_card_id(c) for c in ('as', 'ks', 'qs', 'js', 'ts')]
+        self.assertEquals(0x9EDCBA, evaluate(codes))
+
+    def testAceLowStraight(self):
+        codes = [get_card_id(c) for c in ('as', '2d', '3c', '4h', '5s', '9d')]
+        self.assertEquals(0x454321, evaluate(codes))
+
+    def testMatchesFullHand(self):
+        deck = [rank + suit for suit in 'sdch' for rank in '23456789tjqka']
+        rand = random.Random(1234)
+        for i in range(2000):
+            cards = rand.sample(deck, 7)
+            hand = FullHand(cards[:2], cards[2:])
+            self.assertEquals(hand._get_relative_value(),
+                    evaluate([get_card_id(c) for c in cards]))
+
+
+class EvaluateBatchTests(unittest.TestCase):
+
+    def setUp(self):
+        if numpy is None:
+            self.skipTest("NumPy not installed")
+
+    def testMatchesEvaluate(self):
+        rand = random.Random(99)
+        hands = [rand.sample(range(52), 7) for i in range(2000)]
+        # Make sure some of the rarer categories are in there:
+        hands.append([get_card_id(c) for c in
+            ('as', 'ks', 'qs', 'js', 'ts', '2d', '3c')])
+        hands.append([get_card_id(c) for c in
+            ('as', '2s', '3s', '4s', '5s', '5d', '5c')])
+
+        values = evaluate_batch(numpy.array(hands))
+        self.assertEquals((len(hands), ), values.shape)
+        for i in range(len(hands)):
+            self.assertEquals(evaluate(hands[i]), values[i])
+
+    def testFiveCards(self):
+        hands = numpy.array([[0, 1, 2, 3, 12], [0, 13, 26, 39, 1]])
+        values = evaluate_batch(hands)
+        self.assertEquals(0x854321, values[0])
+        self.assertEquals(0x720000 + 0x3000, values[1])
+
+    def testRepeatedCard(self):
+        self.assertRaises(RounderException, evaluate_batch,
+                numpy.array([[0, 0, 0, 0, 0, 1, 2]]))
+        # Possible ranks, but the same card twice:
+        self.assertRaises(RounderException, evaluate_batch,
+                numpy.array([[0, 1, 2, 3, 4, 5, 6],
+                             [0, 0, 13, 26, 1, 2, 3]]))
+
+    def testCardOutOfRange(self):
+        self.assertRaises(RounderException, evaluate_batch,
+                numpy.array([[0, 1, 2, 3, 52]]))
+        self.assertRaises(RounderException, evaluate_batch,
+                numpy.array([[0, 1, 2, 3, -1]]))
+
+    def testBadShape(self):
+        self.assertRaises(RounderException, evaluate_batch,
+                numpy.array([0, 1, 2, 3, 4, 5, 6]))
+
+
+class RangeStrengthTests(unittest.TestCase):
+
+    def setUp(self):
+        if numpy is None:
+            self.skipTest("NumPy not installed")
+
+    def testAllCombos(self):
+        strength = range_strength(['2s', '7d', '9c'])
+        self.assertEquals(1176, len(strength))
+        self.assertEquals(1176, sum(strength.category_counts.values()))
+        self.assertTrue((numpy.diff(strength.values) >= 0).all())
+        # Three combinations make each set, nines beat everything else:
+        self.assertEquals(9, strength.category_counts['trips'])
+        self.assertEquals([7, 7], [card % 13 for card in
+            strength.combos[-1].tolist()])
+        self.assertEquals(1.0 - 1.5 / 1176, strength.percentiles[-1])
+
+    def testValuesMatchEvaluate(self):
+        board = codes(['as', 'kd', '7c', '2h'])
+        strength = range_strength(board)
+        for i in range(0, len(strength), 97):
+            self.assertEquals(evaluate(strength.combos[i].tolist() + board),
+                    strength.values[i])
+
+    def testDeadCardsAndPocket(self):
+        strength = range_strength(['as', 'kd', '7c', '2h', '2s'],
+                dead=['qh'], pocket=['ah', '7d'])
+        self.assertEquals(946, len(strength))
+        blocked = set(codes(['as', 'kd', '7c', '2h', '2s', 'qh', 'ah',
+            '7d']))
+        for combo in strength.combos.tolist():
+            self.assertFalse(blocked & set(combo))
+        self.assertEquals(evaluate(codes(['ah', '7d', 'as', 'kd', '7c',
+            '2h', '2s'])), strength.value)
+
+    def testPercentile(self):
+        strength = range_strength(['as', 'ad', 'ac', 'ah', 'ks'],
+                pocket=['kd', 'kh'])
+        # Every hand plays quad aces with a king kicker or better:
+        self.assertEquals(0.5, strength.percentile())
+
+    def testBadBoard(self):
+        self.assertRaises(RounderException, range_strength, ['as', 'kd'])
+
+
+# Generated once, it takes a while:
+_generated_tables = []
+
+
+class TablesFileTests(unittest.TestCase):
+
+    def setUp(self):
+        if not _generated_tables:
+            _generated_tables.extend(evaluator._generate_tables())
+        self.tables = _generated_tables
+        self.data = pack_tables(*self.tables)
+
+    def testRoundTrip(self):
+        flush_table, suit_key_table, rank_tables, sections = \
+                unpack_tables(bytearray(self.data))
+        self.assertEquals(self.tables[0], list(flush_table))
+        self.assertEquals(self.tables[1], list(suit_key_table))
+        for size in (5, 6, 7):
+            for key, value in self.tables[2][size].items():
+                self.assertEquals(value,
+                        evaluator._rank_value(rank_tables[size], key))
+            self.assertRaises(KeyError, evaluator._rank_value,
+                    rank_tables[size], 7 * RANK_KEYS[12])
+        self.assertEquals((20, 0x2000), sections['flush'])
+
+    def testTablesViewData(self):
+        data = bytearray(self.data)
+        flush_table = unpack_tables(data)[0]
+        data[20:24] = '\x01\x00\x00\x00'
+        self.assertEquals(1, flush_table[0])
+
+    def testRankHashTablesHalfFull(self):
+        for size in (5, 6, 7):
+            keys, values = evaluator._rank_hash_table(self.tables[2][size])
+            self.assertEquals(0, len(keys) & (len(keys) - 1))
+            self.assertTrue(len(self.tables[2][size]) * 2 <= len(keys))
+
+    def testCorruptDataIsStale(self):
+        data = self.data[:-1] + chr((ord(self.data[-1]) + 1) % 256)
+        self.assertEquals(None, unpack_tables(data))
+
+    def testTruncatedDataIsStale(self):
+        self.assertEquals(None, unpack_tables(self.data[:-4]))
+        self.assertEquals(None, unpack_tables(self.data[:10]))
+
+    def testOtherVersionIsStale(self):
+        data = self.data[:8] + chr(0xFF) + self.data[9:]
+        self.assertEquals(None, unpack_tables(data))
+
+
+class HandStateTests(unittest.TestCase):
+
+    def testNoValueBeforeFiveCards(self):
+        state = HandState(['ah', 'kh'])
+        self.assertEquals(None, state.value())
+        self.assertEquals(None, state.hand())
+        state.add_cards(['qh', 'jh'])
+        self.assertEquals(None, state.value())
+
+    def testStreetByStreet(self):
+        rand = random.Random(7)
+        for i in range(200):
+            cards = rand.sample(range(52), 7)
+            state = HandState(cards[:2])
+            for street in ([cards[2], cards[3], cards[4]], [cards[5]],
+                    [cards[6]]):
+                state.add_cards(street)
+                self.assertEquals(evaluate(cards[:state.size]),
+                        state.value())
+
+    def testTracksCounts(self):
+        state = HandState(['ah', 'ad', '5h', '4h', '3c'])
+        self.assertEquals(2, state.rank_counts[12])
+        self.assertEquals(3, state.suit_counts[3])
+        self.assertEquals(0x100E, state.rank_mask)
+        self.assertEquals("one pair (AA543)", str(state.hand()))
+
+
+class GetWinnersTests(unittest.TestCase):
+
+    def testSplitPot(self):
+        board = ['7s', '7d', '7c', 'ts', 'tc']
+        winners = get_winners([['ac', 'kh'], ['as', 'qd'], ['2h', '5d']],
+                board)
+        self.assertEquals([0, 1, 2], [index for (index, hand) in winners])
+        self.assertEquals("a full house (777TT)", str(winners[0][1]))
+
+    def testNoBoard(self):
+        winners = get_winners([['ac', 'ah']], [])
+        self.assertEquals([0], [index for (index, hand) in winners])
+
+
+def codes(card_strings):
+    return [get_card_id(card) for card in card_strings]
+
+
+class OmahaTests(unittest.TestCase):
+
+    def testMustUseTwoPocketCards(self):
+        # Four spades in the pocket but only one on the board, no flush:
+        value = evaluate_omaha(codes(['as', 'ks', 'qs', 'js']),
+                codes(['2s', '7d', '8c', '9h', '3d']))
+        self.assertEquals(0x0ED987, value)
+
+    def testMustUseThreeBoardCards(self):
+        # Board straight flush is worthless without two pocket cards:
+        value = evaluate_omaha(codes(['2c', '2d', '3h', '4h']),
+                codes(['9s', 'ts', 'js', 'qs', 'ks']))
+        self.assertEquals("one pair (22KQJ)", str(HandValue(value)))
+
+    def testMatchesBestCombination(self):
+        rand = random.Random(12)
+        for i in range(200):
+            cards = rand.sample(range(52), 9)
+            expected = max(evaluate(list(pair) + list(triple))
+                    for pair in itertools.combinations(cards[:4], 2)
+                    for triple in itertools.combinations(cards[4:], 3))
+            self.assertEquals(expected, evaluate_omaha(cards[:4], cards[4:]))
+
+    def testTooFewBoardCards(self):
+        self.assertRaises(RounderException, evaluate_omaha,
+                codes(['as', 'ks', 'qs', 'js']), codes(['2s', '7d']))
+
+    def testWinners(self):
+        board = ['ah', 'kh', '7h', '7d', '2c']
+        winners = get_omaha_winners([['qh', 'jh', '3c', '4c'],
+            ['as', 'ad', '5c', '6c']], board)
+        self.assertEquals([1], [index for (index, hand) in winners])
+        self.assertEquals("a full house (AAA77)", str(winners[0][1]))
+
+    def testWinnersBeforeFlop(self):
+        winners = get_omaha_winners([['as', 'ad', '5c', '6c'],
+            ['2s', '3d', '5h', '9c']], [])
+        self.assertEquals([0], [index for (index, hand) in winners])
+
+
+class FiveCardTests(unittest.TestCase):
+
+    def testWinners(self):
+        winners = get_five_card_winners([['as', 'ad', '5c', '6c', '9h'],
+            ['2s', '3s', '4s', '5s', '7s']])
+        self.assertEquals([1], [index for (index, hand) in winners])
+
+    def testNoBoard(self):
+        self.assertRaises(RounderException, get_five_card_winners,
+                [['as', 'ad', '5c', '6c', '9h']], ['2s'])
+
+
+class PokerEvalTests(unittest.TestCase):
+
+    def testGames(self):
+        poker_eval = PokerEval()
+        board = ['kh', 'th', '7h', '7d', '2c']
+        self.assertEquals([0], poker_eval.winners(game='holdem',
+            pockets=[['as', 'ad'], ['qh', '3c']], board=board)['hi'])
+        self.assertEquals([1], poker_eval.winners(game='omaha',
+            pockets=[['as', 'ad', '5c', '6c'], ['qh', 'jh', '3c', '4c']],
+            board=board)['hi'])
+
+    def testUnknownGame(self):
+        self.assertRaises(RounderException, PokerEval().winners,
+                game='razz', pockets=[['as', 'ad']], board=[])
@@ -24,6 +24,7 @@
 from logging import getLogger
 logger = getLogger("rounder.test.gametests")
 
+import os
 import unittest
 
 from rounder.action import Call, Raise, Fold
@@ -31,19 +32,31 @@ from rounder.core import RounderException
 from rounder.limit import FixedLimit
 from rounder.table import Table
 from rounder.deck import Deck
-from rounder.game import TexasHoldemGame, GameStateMachine, find_next_to_act
+from rounder.evaluator import BACKENDS, BACKEND_ENV, EvaluatorBackend, \
+        evaluate, register_backend, set_default_backend
+from rounder.game import TexasHoldemGame, OmahaGame, GameStateMachine, \
+        find_next_to_act
 
 from rounder.game import STATE_PREFLOP, STATE_FLOP, STATE_TURN, STATE_RIVER, \
     STATE_GAMEOVER
 from rounder.currency import Currency
 from rounder.utils import find_action_in_list
-from rounder.pot import PotManager
+from rounder.pot import Pot, PotManager
 
 from utils import *
 
 CHIPS = 1000
 
 
+class FirstPocketBackend(EvaluatorBackend):
+    """ Deliberately wrong backend, the first pocket always wins. """
+
+    name = 'first-pocket'
+
+    def winners(self, game, pockets, board):
+        return [0]
+
+
 class NextToActTests(unittest.TestCase):
 
     def setUp(self):
@@ -168,7 +181,7 @@ class TexasHoldemTests(unittest.TestCase):
         self.game_over = True
 
     def __create_game(self, chip_counts, dealer_index, sb_index, bb_index,
-        deck=None):
+        deck=None, game_class=TexasHoldemGame):
 
         limit = FixedLimit(small_bet=Currency(2), big_bet=Currency(4))
 
@@ -181,7 +194,7 @@ class TexasHoldemTests(unittest.TestCase):
         players_copy = []
         players_copy.extend(self.players)
 
-        self.game = TexasHoldemGame(limit=limit, players=players_copy,
+        self.game = game_class(limit=limit, players=players_copy,
             dealer_index=dealer_index, sb_index=sb_index, bb_index=bb_index,
             callback=self.game_over_callback, table=table, deck=deck)
         self.game.advance()
@@ -287,6 +300,13 @@ class TexasHoldemTests(unittest.TestCase):
         self.assertEquals(STATE_FLOP, self.game.gsm.get_current_state())
         self.assertEquals(3, len(self.game.community_cards))
 
+        # Hand states follow the board as it is dealt:
+        for player in self.players:
+            codes = [card.id for card in
+                    player.cards + self.game.community_cards]
+            self.assertEquals(5, player.hand_state.size)
+            self.assertEquals(evaluate(codes), player.hand_state.value())
+
         self.__call(self.players[1], 0, CHIPS - 2)
         self.__call(self.players[2], 0, CHIPS - 2)
         self.__call(self.players[3], 0, CHIPS - 2)
@@ -384,6 +404,27 @@ class TexasHoldemTests(unittest.TestCase):
 
         # TODO check that there was a winner and they received the pot?
 
+    def test_omaha_hand(self):
+        self.__create_game([1000, 1000, 1000], 0, 1, 2,
+            game_class=OmahaGame)
+        for player in self.players:
+            self.assertEquals(4, len(player.cards))
+
+        self.__call(self.players[0], 2, CHIPS - 2)
+        self.__call(self.players[1], 1, CHIPS - 2)
+        self.__call(self.players[2], 0, CHIPS - 2)
+        for street in range(3):
+            for i in (1, 2, 0):
+                self.__call(self.players[i], 0)
+            # Hand states only make sense for two hole cards:
+            for player in self.players:
+                self.assertEquals(0, player.hand_state.size)
+
+        self.assertEquals(STATE_GAMEOVER, self.game.gsm.get_current_state())
+        self.assertTrue(self.game.finished)
+        total = sum([player.chips for player in self.players])
+        self.assertEquals(3 * CHIPS, total)
+
     def test_player_to_act_sits_out(self):
         self.__create_game([1000, 1000, 1000, 1000], 0, 1, 2)
         self.__call(self.players[3], 2, CHIPS - 2)
@@ -435,3 +476,45 @@ class TexasHoldemTests(unittest.TestCase):
         self.assertEquals(CHIPS + 2, self.players[2].chips)
         self.assertEquals(CHIPS + 2, self.players[1].chips)
 
+
+    def test_configured_backend_ranks_showdown(self):
+        cards = ['2c', 'As', 'Ks', # First Card
+                 '3d', 'Ad', 'Kd', # Second Card
+                 '7h', '8h', '9s',  # Flop
+                 'Jc',              # Turn
+                 'Qd']              # River
+        deck = Deck()
+        reorder_deck(deck, create_cards_from_list(cards))
+
+        saved_env = os.environ.pop(BACKEND_ENV, None)
+        register_backend(FirstPocketBackend)
+        set_default_backend('first-pocket')
+        try:
+            self.__create_game([1000, 1000, 1000], 0, 1, 2, deck)
+        finally:
+            set_default_backend(None)
+            del BACKENDS['first-pocket']
+            if saved_env is not None:
+                os.environ[BACKEND_ENV] = saved_env
+        self.assertEquals('first-pocket', self.game.evaluator.name)
+
+        for street in range(4):
+            self.__play_round(['c', 'c', 'c'])
+
+        # Aces would win, but the backend picks the first player:
+        self.assertTrue(self.game.finished)
+        self.assertEquals(CHIPS + 4, self.players[0].chips)
+        self.assertEquals(CHIPS - 2, self.players[1].chips)
+
+    def test_split_pot_odd_cents(self):
+        """ Odd cents of a split pot go one each to the first winners. """
+        self.__create_game([1000, 1000, 1000], 0, 1, 2)
+        pot = Pot(self.players)
+        pot += Currency('0.05')
+        winners = [(player, "a straight") for player in self.players]
+        for player in self.players:
+            player.chips = Currency(0)
+
+        self.game._TexasHoldemGame__payout_pot(pot, winners)
+        self.assertEquals([Currency('0.02'), Currency('0.02'),
+            Currency('0.01')], [player.chips for player in self.players])
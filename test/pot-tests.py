@@ -115,3 +115,67 @@ class PotTests(unittest.TestCase):
         self.assertEquals((31 - 15) * 2 + 20, pots[0].amount)
         self.assertEquals(45, pots[1].amount)
 
+
+    def test_ten_way_allin(self):
+        """ Test 10 players all in for different amounts in one round. """
+        potmgr = PotManager()
+        amounts = {}
+        for i, player in enumerate(self.players):
+            player.allin = True
+            amounts[Currency(10 * (i + 1))] = [player]
+        potmgr.add(amounts)
+        pots = potmgr.pots
+
+        self.assertEquals(10, len(pots))
+        self.assertTrue(pots[-1].is_main_pot)
+        for i, pot in enumerate(reversed(pots)):
+            self.assertEquals(set(self.players[i:]), set(pot.players))
+            self.assertEquals(10 * (10 - i), pot.amount)
+            self.assertFalse(i > 0 and pot.is_main_pot)
+        self.assertEquals(550, potmgr.total_value())
+
+    def test_ten_way_allin_same_amount(self):
+        """ Test 10 players all in for the same amount. """
+        potmgr = PotManager()
+        for player in self.players:
+            player.allin = True
+        potmgr.add({Currency(1000): self.players})
+        pots = potmgr.pots
+
+        self.assertEquals(1, len(pots))
+        self.assertEquals(self.players, pots[0].players)
+        self.assertEquals(10000, pots[0].amount)
+
+    def test_fold(self):
+        """ Test a folded player drops out of every pot. """
+        potmgr = PotManager()
+        self.players[2].allin = True
+        potmgr.add({15: self.players[:3]})
+        potmgr.add({10: self.players[:2]})
+        potmgr.fold(self.players[0])
+        pots = potmgr.pots
+
+        self.assertEquals(2, len(pots))
+        for pot in pots:
+            self.assertFalse(pot.is_player_eligible(self.players[0]))
+            self.assertTrue(pot.is_player_eligible(self.players[1]))
+        self.assertEquals([self.players[1]], pots[0].players)
+        self.assertEquals(self.players[1:3], pots[1].players)
+        self.assertFalse(pots[1].is_player_eligible(self.players[3]))
+
+        # Folded chips stay in the pot:
+        self.assertEquals(65, potmgr.total_value())
+
+    def test_fold_before_new_pot(self):
+        """ Test a player who folds is not eligible for later side pots. """
+        potmgr = PotManager()
+        potmgr.fold(self.players[2])
+        self.players[0].allin = True
+        potmgr.add({10: [self.players[0]], 20: self.players[1:3]})
+        pots = potmgr.pots
+
+        self.assertEquals(2, len(pots))
+        self.assertEquals(self.players[:2], pots[1].players)
+        self.assertEquals([self.players[1]], pots[0].players)
+        self.assertEquals(30, pots[1].amount)
+        self.assertEquals(20, pots[0].amount)
@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+
+#   Rounder - Poker for the GNOME Desktop
+#
+#   Copyright (C) 2009 Devan Goodwin <dgoodwin@dangerouslyinc.com>
+#   Copyright (C) 2009 James Bowes <jbowes@dangerouslyinc.com>
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+#   02110-1301  USA
+
+""" Tests for the rounder.preflop module. """
+
+import unittest
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from rounder.core import RounderException
+from rounder import preflop
+from rounder.preflop import CLASS_COUNT, CLASS_NAMES, class_combos, \
+        class_equity, class_index, pack_table, preflop_equity, unpack_table
+
+
+class ClassTests(unittest.TestCase):
+
+    def test_grid(self):
+        self.assertEquals(0, class_index(['as', 'ah']))
+        self.assertEquals(1, class_index(['ks', 'as']))
+        self.assertEquals(13, class_index(['as', 'kh']))
+        self.assertEquals(168, class_index(['2c', '2d']))
+
+    def test_names(self):
+        self.assertEquals(CLASS_COUNT, len(set(CLASS_NAMES)))
+        self.assertEquals('AKs', CLASS_NAMES[class_index(['ac', 'kc'])])
+        self.assertEquals('72o', CLASS_NAMES[class_index(['7c', '2d'])])
+        self.assertEquals('TT', CLASS_NAMES[class_index(['tc', 'th'])])
+
+    def test_combos(self):
+        counts = [len(class_combos(i)) for i in range(CLASS_COUNT)]
+        self.assertEquals(1326, sum(counts))
+        self.assertEquals(6, counts[class_index(['as', 'ah'])])
+        self.assertEquals(4, counts[class_index(['as', 'ks'])])
+        self.assertEquals(12, counts[class_index(['as', 'kh'])])
+
+    def test_bad_pockets(self):
+        self.assertRaises(RounderException, class_index, ['as'])
+        self.assertRaises(RounderException, class_index, ['as', 'as'])
+
+
+class TableFileTests(unittest.TestCase):
+
+    def setUp(self):
+        self.table = [(i % 1000) / 1000.0
+                      for i in range(CLASS_COUNT * CLASS_COUNT)]
+
+    def test_round_trip(self):
+        table = unpack_table(pack_table(self.table))
+        self.assertEquals(len(self.table), len(table))
+        for value, expected in zip(table, self.table):
+            self.assertTrue(abs(value - expected) < 0.00001)
+
+    def test_corrupt_data_is_stale(self):
+        data = pack_table(self.table)
+        self.assertEquals(None, unpack_table(data[:-1] + 'x'))
+        self.assertEquals(None, unpack_table(data[:-2]))
+        self.assertEquals(None, unpack_table(''))
+
+
+class LookupTests(unittest.TestCase):
+
+    def test_shipped_table(self):
+        preflop.load_table()
+        self.assertTrue(0.81 < class_equity('AA', 'KK') < 0.84)
+        self.assertAlmostEquals(0.5, class_equity('T9s', 'T9s'), 4)
+
+    def test_pockets(self):
+        equity = preflop_equity(['as', 'ad'], ['kc', 'kh'])
+        self.assertEquals(class_equity('AA', 'KK'), equity)
+        self.assertAlmostEquals(1.0, equity +
+                preflop_equity(['kc', 'kh'], ['as', 'ad']), 4)
+
+    def test_bad_pockets(self):
+        self.assertRaises(RounderException, preflop_equity,
+                ['as', 'ks'], ['as', 'qd'])
+        self.assertRaises(RounderException, preflop_equity,
+                ['as', 'ks', 'qs'], ['2c', '2d'])
+        self.assertRaises(RounderException, preflop_equity,
+                ['as', 'ks'], ['2c'])
+
+    def test_classic_race(self):
+        equity = preflop_equity(['qs', 'qd'], ['ac', 'kh'])
+        self.assertTrue(0.54 < equity < 0.58)
+
+
+class SampleRowTests(unittest.TestCase):
+
+    def test_last_row(self):
+        if numpy is None:
+            self.skipTest("NumPy not installed")
+        row, results = preflop._sample_row((CLASS_COUNT - 1, 2000, 0))
+        self.assertEquals(CLASS_COUNT - 1, row)
+        self.assertEquals(1, len(results))
+        self.assertTrue(0.45 < results[0] < 0.55)
@@ -23,16 +23,28 @@ Tests originally for exploring usage of the pypoker-eval library,
 now kept for testing rounder.evaluator's pypoker-eval compatibility
 """
 
+import os
 import unittest
+from StringIO import StringIO
 
-from rounder.evaluator import PokerEval
+from rounder.core import RounderException
+from rounder.evaluator import BACKENDS, BACKEND_ENV, EvaluatorBackend, \
+        PokerEval, configure_backend, get_backend, get_winners, \
+        read_backend_config, register_backend, set_default_backend
+from rounder.evalcheck import compare_backends, random_deal
 
 
 class PyPokerEvalCompatTests(unittest.TestCase):
     """ Tests for pypoker-eval compatibility. """
 
+    backend = 'tables'
+
+    def setUp(self):
+        if self.backend not in BACKENDS:
+            self.skipTest("%s backend unavailable" % self.backend)
+
     def test_single_winner(self):
-        evaluator = PokerEval()
+        evaluator = PokerEval(self.backend)
         cards1 = ["ac", "ah"]
         cards2 = ["kc", "kd"]
         cards3 = ["2h", "5d"]
@@ -43,7 +55,7 @@ class PyPokerEvalCompatTests(unittest.TestCase):
         self.assertEquals(0, result['hi'][0])
 
     def test_tie(self):
-        evaluator = PokerEval()
+        evaluator = PokerEval(self.backend)
         cards1 = ["ac", "ah"]
         cards2 = ["as", "ad"]
         cards3 = ["2h", "5d"]
@@ -55,7 +67,7 @@ class PyPokerEvalCompatTests(unittest.TestCase):
         self.assertEquals(1, result['hi'][1])
 
     def test_board_plays(self):
-        evaluator = PokerEval()
+        evaluator = PokerEval(self.backend)
         cards1 = ["ac", "kh"]
         cards2 = ["as", "qd"]
         cards3 = ["2h", "5d"]
@@ -65,7 +77,7 @@ class PyPokerEvalCompatTests(unittest.TestCase):
         self.assertEquals(3, len(result['hi']))
 
     def test_premature_hand_end(self):
-        evaluator = PokerEval()
+        evaluator = PokerEval(self.backend)
         cards1 = ["ac", "ah"]
         pockets = [cards1]
         board = []
@@ -74,3 +86,121 @@ class PyPokerEvalCompatTests(unittest.TestCase):
         self.assertEquals(0, result['hi'][0])
 
 
+class PythonCompatTests(PyPokerEvalCompatTests):
+    backend = 'python'
+
+
+class NumpyCompatTests(PyPokerEvalCompatTests):
+    backend = 'numpy'
+
+
+class PyPokerEvalLibraryTests(PyPokerEvalCompatTests):
+    backend = 'pypokereval'
+
+
+class FirstPocketBackend(EvaluatorBackend):
+    """ Deliberately wrong backend, the first pocket always wins. """
+
+    name = 'first-pocket'
+
+    def winners(self, game, pockets, board):
+        return [0]
+
+
+class BackendRegistryTests(unittest.TestCase):
+
+    def setUp(self):
+        self.saved_env = os.environ.pop(BACKEND_ENV, None)
+
+    def tearDown(self):
+        set_default_backend(None)
+        os.environ.pop(BACKEND_ENV, None)
+        if self.saved_env is not None:
+            os.environ[BACKEND_ENV] = self.saved_env
+
+    def test_default(self):
+        self.assertEquals('tables', PokerEval().backend.name)
+
+    def test_configured_default(self):
+        set_default_backend('python')
+        self.assertEquals('python', PokerEval().backend.name)
+        self.assertEquals('tables', PokerEval('tables').backend.name)
+
+    def test_environment_wins(self):
+        set_default_backend('python')
+        os.environ[BACKEND_ENV] = 'tables'
+        self.assertEquals('tables', get_backend().name)
+
+    def test_config_file(self):
+        read_backend_config(StringIO("[evaluator]\nbackend = python\n"))
+        self.assertEquals('python', get_backend().name)
+
+    def test_config_file_without_backend(self):
+        read_backend_config(StringIO("[evaluator]\n"))
+        self.assertEquals('tables', get_backend().name)
+
+    def test_no_config_file(self):
+        real_exists = os.path.exists
+        os.path.exists = lambda path: False
+        try:
+            configure_backend(["~/.rounder/rounder.conf", "./rounder.conf"])
+        finally:
+            os.path.exists = real_exists
+        self.assertEquals('tables', get_backend().name)
+
+    def test_abstract(self):
+        self.assertRaises(TypeError, EvaluatorBackend)
+
+    def test_showdown(self):
+        board = ['7h', '8h', '9s', 'Jc', 'Qd']
+        pockets = [['2c', '3d'], ['As', 'Ad']]
+        result = FirstPocketBackend().showdown('holdem', pockets, board)
+        self.assertEquals(1, len(result))
+        self.assertEquals(0, result[0][0])
+        self.assertEquals(get_winners([pockets[0]], board)[0][1],
+                          result[0][1])
+        self.assertEquals(get_winners(pockets, board),
+                          get_backend('tables').showdown('holdem', pockets,
+                                                         board))
+
+    def test_unknown(self):
+        self.assertRaises(RounderException, get_backend, 'nonsense')
+        self.assertRaises(RounderException, set_default_backend, 'nonsense')
+
+
+class DifferentialTests(unittest.TestCase):
+
+    def test_python_agrees(self):
+        for game in ('holdem', 'omaha', '5draw'):
+            self.assertEquals(None, compare_backends('python', 'tables',
+                deals=50, game=game, processes=1))
+
+    def test_numpy_agrees(self):
+        if 'numpy' not in BACKENDS:
+            self.skipTest("numpy backend unavailable")
+        for game in ('holdem', 'omaha', '5draw'):
+            self.assertEquals(None, compare_backends('numpy', 'tables',
+                deals=300, game=game, processes=1))
+
+    def test_pypokereval_agrees(self):
+        if 'pypokereval' not in BACKENDS:
+            self.skipTest("pypokereval backend unavailable")
+        self.assertEquals(None, compare_backends('pypokereval', 'tables',
+            deals=300, processes=1))
+
+    def test_reports_first_disagreement(self):
+        register_backend(FirstPocketBackend)
+        try:
+            disagreement = compare_backends('first-pocket', 'tables',
+                    deals=100, processes=1)
+        finally:
+            del BACKENDS['first-pocket']
+
+        self.assertNotEqual(None, disagreement)
+        for deal_number in range(disagreement.deal_number):
+            pockets, board = random_deal('holdem', 0, deal_number)
+            self.assertEquals([0], get_backend().winners('holdem', pockets,
+                board))
+        self.assertEquals(random_deal('holdem', 0,
+            disagreement.deal_number), (disagreement.pockets,
+            disagreement.board))
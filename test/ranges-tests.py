@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+
+#   Rounder - Poker for the GNOME Desktop
+#
+#   Copyright (C) 2009 Devan Goodwin <dgoodwin@dangerouslyinc.com>
+#   Copyright (C) 2009 James Bowes <jbowes@dangerouslyinc.com>
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+#   02110-1301  USA
+
+""" Tests for the rounder.ranges module. """
+
+import random
+import unittest
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from rounder.card import get_card_id
+from rounder.core import RounderException
+from rounder.equity import equity
+from rounder.ranges import HandRange, parse_range, range_equity
+
+
+def combo(first, second):
+    ids = [get_card_id(first), get_card_id(second)]
+    return (min(ids), max(ids))
+
+
+class ParseRangeTests(unittest.TestCase):
+
+    def test_pairs(self):
+        self.assertEquals(6, len(parse_range('AA')))
+        self.assertEquals(18, len(parse_range('QQ+')))
+        self.assertEquals(18, len(parse_range('66-44')))
+        self.assertEquals(18, len(parse_range('44-66')))
+
+    def test_unpaired(self):
+        self.assertEquals(4, len(parse_range('AKs')))
+        self.assertEquals(12, len(parse_range('AKo')))
+        self.assertEquals(16, len(parse_range('AK')))
+        self.assertEquals(8, len(parse_range('AQs+')))
+        self.assertEquals(12, len(parse_range('T9s-T7s')))
+        self.assertEquals(12, len(parse_range('KJo')))
+
+    def test_request_example(self):
+        hand_range = parse_range("TT+, AQs+, KJo")
+        self.assertEquals(30 + 8 + 12, len(hand_range))
+        self.assertTrue(['kh', 'jd'] in hand_range)
+        self.assertFalse(['kh', 'jh'] in hand_range)
+
+    def test_specific_combos(self):
+        hand_range = parse_range("AhKh, kdqs")
+        self.assertEquals([combo('ah', 'kh'), combo('kd', 'qs')],
+                sorted(hand_range.combos, reverse=True))
+
+    def test_deduplicated(self):
+        hand_range = parse_range("AK, AKs, AhKh, QQ+, KK")
+        self.assertEquals(16 + 18, len(hand_range))
+        self.assertEquals(len(hand_range.combos), len(set(hand_range.combos)))
+        self.assertEquals(sorted(hand_range.combos), hand_range.combos)
+        for i, pocket in enumerate(hand_range.combos):
+            self.assertEquals(i, hand_range.indexes[pocket])
+
+    def test_weights(self):
+        hand_range = parse_range("AK:0.5, AhKh")
+        self.assertEquals(16, len(hand_range))
+        self.assertEquals(1.0, hand_range.weight(['kh', 'ah']))
+        self.assertEquals(0.5, hand_range.weight(['kd', 'ah']))
+        self.assertEquals(0, hand_range.weight(['qd', 'ah']))
+        self.assertEquals(8.5, hand_range.total_weight())
+
+    def test_zero_weight_dropped(self):
+        self.assertEquals(12, len(parse_range("AK, AKs:0")))
+
+    def test_bad_notation(self):
+        for text in ('AAs', 'AKx', 'ZZ', 'AsAs', 'AK:2', 'AK:x', 'AKs-QJs',
+                'AKs-AJo', 'TT+-88'):
+            self.assertRaises(RounderException, parse_range, text)
+
+
+class RemoveDeadTests(unittest.TestCase):
+
+    def test_remove_dead(self):
+        hand_range = parse_range("AA, AKs:0.5").remove_dead(['as', '2c'])
+        self.assertEquals(3 + 3, len(hand_range))
+        self.assertFalse(['as', 'ah'] in hand_range)
+        self.assertEquals(0.5, hand_range.weight(['kh', 'ah']))
+
+    def test_nothing_left(self):
+        hand_range = HandRange({combo('as', 'ah'): 1.0})
+        self.assertEquals(0, len(hand_range.remove_dead(['ah'])))
+
+
+class RangeEquityTests(unittest.TestCase):
+
+    def setUp(self):
+        if numpy is None:
+            self.skipTest("NumPy not installed")
+
+    def test_river(self):
+        board = ['2c', '7d', '9h', 'ts', 'jc']
+        expected = equity([['as', 'ah'], ['8c', '8d']], board)[0].equity
+        self.assertEquals(expected, range_equity(parse_range('AsAh'),
+            parse_range('8c8d'), board))
+
+    def test_flop_matches_enumeration(self):
+        board = ['2c', '7d', '9h']
+        expected = equity([['as', 'ah'], ['kc', 'kd']], board)[0].equity
+        self.assertAlmostEquals(expected, range_equity(parse_range('AsAh'),
+            parse_range('KcKd'), board), 10)
+
+    def test_weighted_combos(self):
+        board = ['2c', '7d', '9h', 'ts']
+        first = equity([['as', 'ah'], ['qs', 'qh']], board)[0].equity
+        second = equity([['kc', 'kd'], ['qs', 'qh']], board)[0].equity
+        self.assertAlmostEquals((first + 3 * second) / 4, range_equity(
+            parse_range('AsAh:0.25, KcKd:0.75'), parse_range('QsQh'),
+            board), 10)
+
+    def test_conflicting_combos_ignored(self):
+        board = ['2c', '7d', '9h', 'ts']
+        expected = equity([['as', 'ah'], ['kc', 'kd']], board)[0].equity
+        self.assertAlmostEquals(expected, range_equity(
+            parse_range('AsAh'), parse_range('KcKd, AsKs'), board), 10)
+
+    def test_symmetric(self):
+        first = parse_range('TT+, AQs+, KJo')
+        second = parse_range('22+, A2s+, KTs+')
+        board = ['2c', '7d', '9h', 'ts']
+        self.assertAlmostEquals(1.0, range_equity(first, second, board) +
+            range_equity(second, first, board), 10)
+
+    def test_sampled_preflop(self):
+        value = range_equity(parse_range('AA'), parse_range('KK'),
+                max_boards=500, rand=random.Random(1))
+        self.assertTrue(0.75 < value < 0.9)
+
+    def test_dead_cards(self):
+        self.assertRaises(RounderException, range_equity,
+                parse_range('AsAh'), parse_range('KcKd'), dead=['kd'])
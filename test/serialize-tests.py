@@ -27,6 +27,8 @@ import unittest
 
 from rounder.network.serialize import dumps, loads, register_message_classes
 from rounder.dto import TableState
+from rounder.card import Card
+from rounder.currency import Currency
 
 from utils import create_table
 
@@ -49,3 +51,17 @@ class CerealizerTests(unittest.TestCase):
         self.assertEquals(10, len(new_state.seats))
 
 
+
+    def test_card_serialize(self):
+        cards = [Card('As'), Card('Td'), Card('As')]
+        new_cards = loads(dumps(cards))
+        self.assertEquals(3, len(new_cards))
+        for i in range(3):
+            self.assertTrue(cards[i] is new_cards[i])
+
+    def test_currency_serialize(self):
+        amounts = [Currency(0), Currency('12.34'), Currency(-5),
+            Currency(10 ** 6)]
+        new_amounts = loads(dumps(amounts))
+        self.assertEquals(amounts, new_amounts)
+        self.assertTrue(new_amounts[0] is Currency(0))
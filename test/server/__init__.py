@@ -22,7 +22,7 @@ import unittest
 import random
 
 from rounder.network.server import RounderNetworkServer, User
-from rounder.network.serialize import loads
+from rounder.network.codec import new_codec
 from rounder.action import Raise, Call, Fold
 
 __all__ = []
@@ -59,15 +59,38 @@ class TestUser(User):
     def __init__(self, username, server):
         User.__init__(self, username, server)
 
-        # Queue of all events received.
+        # Queue of all events received, and their serialized forms:
         self.events = []
+        self.serialized_events = []
+
+        # Table states as of the last event received, by table id:
+        self.states = {}
+
+        # Decodes what the server sends, as the client would, and the
+        # username ids sent for it:
+        self.codec = new_codec(self.wire_format)
+        self.sent_names = []
+
+    def perspective_set_wire_format(self, wire_format):
+        User.perspective_set_wire_format(self, wire_format)
+        self.codec = new_codec(wire_format)
+
+    def perspective_open_table(self, table_id):
+        result = User.perspective_open_table(self, table_id)
+        self.states[table_id] = self.codec.loads(result[1])
+        return result
+
+    def send_names(self, names):
+        User.send_names(self, names)
+        self.codec.names.define(names)
+        self.sent_names.append(names)
 
     def prompt(self, table_id, serialized_actions):
 
         # TODO: refactor to list of pending actions per table
         self.pending_actions = []
         for a in serialized_actions:
-            action = loads(a)
+            action = self.codec.loads(a)
             self.pending_actions.append(action)
 
     def act_randomly(self, table_id):
@@ -99,12 +122,16 @@ class TestUser(User):
 
         raise Exception("Unable to find action of type %s" % action_type)
 
-    def notify(self, table_id, serialized_event):
+    def notify(self, table_id, serialized_event, observer_only=False):
         """
         Override the parent to track events sent.
         """
-        User.notify(self, table_id, serialized_event)
-        self.events.append(loads(serialized_event))
+        User.notify(self, table_id, serialized_event, observer_only)
+        event = self.codec.loads(serialized_event)
+        if event.state_delta is not None:
+            event.state_delta.apply(self.states[table_id])
+        self.events.append(event)
+        self.serialized_events.append(serialized_event)
 
     def act(self, table_id, action_type, param=None):
         """
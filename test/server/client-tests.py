@@ -25,6 +25,18 @@ logger = getLogger("rounder.test.network.clienttests")
 
 import unittest
 
+from twisted.internet import defer
+
+from rounder.core import RounderException
+from rounder.dto import TableState
+from rounder.event import PlayerSentChatMessage
+from rounder.network.client import RounderNetworkClient, TableUplink
+from rounder.network.serialize import dumps, loads, \
+        register_message_classes
+register_message_classes()
+
+from utils import create_table
+
 
 class RounderNetworkClientTests(unittest.TestCase):
 
@@ -33,4 +45,120 @@ class RounderNetworkClientTests(unittest.TestCase):
     def test_login(self):
         pass
 
+    def test_notify_many(self):
+        (limit, table, players) = create_table([1000, 1000], 0)
+        client = RounderNetworkClient(None)
+        client.tables[table.id] = FakeClientTable()
+        client.remote_notify_many([
+            (table.id, dumps(PlayerSentChatMessage(table, "player0", "a"))),
+            (table.id, dumps(PlayerSentChatMessage(table, "player1", "b")))])
+        self.assertEquals(["a", "b"], [event.message for event in
+                                       client.tables[table.id].events])
+
+
+class FakeTableView(object):
+
+    """ Stands in for the server's TableView, serving snapshots. """
+
+    def __init__(self, table):
+        self.table = table
+        self.calls = []
+        self.fail_snapshots = False
+
+    def callRemote(self, name, *args):
+        self.calls.append(name)
+        if self.fail_snapshots:
+            return defer.fail(RounderException("Snapshot failed"))
+        return defer.succeed(dumps(self.table.state_snapshot()))
+
+
+class FakeClientTable(object):
+
+    def __init__(self):
+        self.events = []
+        self.errors = []
+
+    def process_event(self, event):
+        self.events.append(event)
+
+    def log_error(self, failure):
+        self.errors.append(failure)
+
+
+class TableUplinkTests(unittest.TestCase):
+
+    """ Tests for applying table state deltas on the client. """
+
+    def setUp(self):
+        (self.limit, self.table, self.players) = create_table([1000, 1000],
+                                                              0)
+        self.view = FakeTableView(self.table)
+        # Sent over the wire, as when the table is opened:
+        state = loads(dumps(self.table.state_snapshot()))
+        self.uplink = TableUplink(self.view, state)
+        self.uplink.ui = FakeClientTable()
+
+    def send_event(self):
+        """ Change the table, and return an event with the delta. """
+        self.players[0].chips -= 1
+        event = PlayerSentChatMessage(self.table, "player0", "hi")
+        event.state_delta = self.table.state_delta()
+        return event
+
+    def test_apply_delta(self):
+        event = self.send_event()
+        self.uplink.process_event(event)
+
+        self.assertEquals(1, self.uplink.state.sequence)
+        self.assertEquals(999, self.uplink.state.seats[0].chips)
+        self.assertEquals([0], event.state_delta.seats.keys())
+        self.assertEquals({}, event.state_delta.changes)
+        self.assertEquals([event], self.uplink.ui.events)
+        self.assertEquals([], self.view.calls)
+
+    def test_missed_delta(self):
+        self.send_event()
+        event = self.send_event()
+        self.uplink.process_event(event)
+
+        # The snapshot replaces the state:
+        self.assertEquals(['snapshot'], self.view.calls)
+        self.assertEquals(2, self.uplink.state.sequence)
+        self.assertEquals(998, self.uplink.state.seats[0].chips)
+        self.assertFalse(self.uplink.resyncing)
+
+        self.uplink.process_event(self.send_event())
+        self.assertEquals(3, self.uplink.state.sequence)
+        self.assertEquals(997, self.uplink.state.seats[0].chips)
+
+    def test_snapshot_failed(self):
+        self.view.fail_snapshots = True
+        self.send_event()
+        self.uplink.process_event(self.send_event())
+        self.assertEquals(['snapshot'], self.view.calls)
+        self.assertFalse(self.uplink.resyncing)
+        self.assertEquals(1, len(self.uplink.ui.errors))
+
+        # The next delta still finds the gap, and asks again:
+        self.view.fail_snapshots = False
+        self.uplink.process_event(self.send_event())
+        self.assertEquals(['snapshot', 'snapshot'], self.view.calls)
+        self.assertEquals(3, self.uplink.state.sequence)
+        self.assertEquals(997, self.uplink.state.seats[0].chips)
+
+        self.uplink.process_event(self.send_event())
+        self.assertEquals(4, self.uplink.state.sequence)
+        self.assertEquals(996, self.uplink.state.seats[0].chips)
+
+    def test_stale_delta_ignored(self):
+        event = self.send_event()
+        self.uplink.process_event(event)
+        self.uplink.process_event(event)
+        self.assertEquals(1, self.uplink.state.sequence)
+        self.assertEquals([], self.view.calls)
 
+    def test_delta_out_of_order(self):
+        state = TableState(self.table)
+        delta = self.table.state_delta()
+        delta = self.table.state_delta()
+        self.assertRaises(RounderException, delta.apply, state)
@@ -25,13 +25,21 @@ logger = getLogger("rounder.test.network.servertests")
 
 import unittest
 
-from rounder.network.server import TableView
+from twisted.internet import defer, task
+
+from rounder.core import RounderException
+from rounder.dto import TableState
+from rounder.event import HoleCardsDealt
+from rounder.network.codec import BINARY, CEREALIZER
+from rounder.network import server as network_server
+from rounder.network.server import TableView, User
+from rounder.network.serialize import dumps, loads
 from rounder.table import STATE_SMALL_BLIND
 
 from rounder.network.serialize import register_message_classes
 register_message_classes()
 
-from server import BaseServerFixture
+from server import BaseServerFixture, TestUser
 
 class RounderNetworkServerTests(BaseServerFixture):
 
@@ -51,7 +59,7 @@ class RounderNetworkServerTests(BaseServerFixture):
             TableView))
 
     def test_list_tables(self):
-        table_list = self.server.list_tables()
+        table_list = self.server.list_tables(self.user1)
 
     def test_seat_player(self):
         self.server.seat_player(self.user1, self.table, 0)
@@ -86,3 +94,476 @@ class RounderNetworkServerTests(BaseServerFixture):
         self.user1.detached(None)
         self.assertFalse(self.user1.username in self.server.users.keys())
 
+    def test_broadcast_serializes_once(self):
+        self.user1_table.view_sit(self.user1, 0)
+
+        counter = self.server.event_counters[CEREALIZER]['PlayerJoinedTable']
+        self.assertEquals(1, counter.events)
+        self.assertEquals(2, counter.recipients)
+        self.assertEquals(len(self.user1.serialized_events[-1]),
+            counter.bytes)
+
+        # Both observers were handed the very same string:
+        self.assertTrue(self.user1.serialized_events[-1] is
+            self.user2.serialized_events[-1])
+
+    def test_notify_counted(self):
+        self.user1_table.view_sit(self.user1, 0)
+        self.user2_table.view_sit(self.user2, 1)
+        self.user1_table.view_start_game(self.user1)
+        self.user1.act_randomly(self.table.id)
+        self.user2.act_randomly(self.table.id)
+        while self.table.hand_underway():
+            user = self.find_user_with_pending_actions()
+            user.act_randomly(self.table.id)
+
+        # Hole cards go to each player alone:
+        counters = self.server.event_counters[CEREALIZER]
+        self.assertEquals(2, counters['HoleCardsDealt'].recipients)
+        for counter in counters.values():
+            self.assertTrue(counter.events > 0)
+            self.assertTrue(counter.bytes > 0)
+            self.assertTrue(counter.serialize_seconds >= 0)
+
+    def assert_states_equal(self, expected, state):
+        self.assertEquals(expected.sequence, state.sequence)
+        for field in ('name', 'hand_underway', 'community_cards',
+                'dealer_seat_num', 'round_bets'):
+            self.assertEquals(getattr(expected, field), getattr(state, field))
+        self.assertEquals([(pot.amount, pot.is_main_pot)
+                           for pot in expected.pots],
+                          [(pot.amount, pot.is_main_pot)
+                           for pot in state.pots])
+        self.assertEquals([seat and seat.__dict__ for seat in expected.seats],
+                          [seat and seat.__dict__ for seat in state.seats])
+
+    def test_state_deltas(self):
+        self.user1_table.view_sit(self.user1, 0)
+        self.user2_table.view_sit(self.user2, 1)
+        self.user1_table.view_start_game(self.user1)
+        self.user1.act_randomly(self.table.id)
+        self.user2.act_randomly(self.table.id)
+        while self.table.hand_underway():
+            # Clients stay in step with the table as the hand goes on:
+            for user in self.users:
+                self.assert_states_equal(self.table.state_snapshot(),
+                    user.states[self.table.id])
+            user = self.find_user_with_pending_actions()
+            user.act_randomly(self.table.id)
+
+        for user in self.users:
+            self.assert_states_equal(self.table.state_snapshot(),
+                user.states[self.table.id])
+            # Deltas are numbered one after another:
+            sequences = [event.state_delta.sequence for event in user.events
+                         if event.state_delta is not None]
+            self.assertEquals(range(1, len(sequences) + 1), sequences)
+            # Hole cards are private and carry no delta:
+            for event in user.events:
+                if isinstance(event, HoleCardsDealt):
+                    self.assertEquals(None, event.state_delta)
+
+    def test_late_observer(self):
+        self.user1_table.view_sit(self.user1, 0)
+        self.user2_table.view_sit(self.user2, 1)
+        self.user1_table.view_start_game(self.user1)
+        self.user1.act_randomly(self.table.id)
+        self.user2.act_randomly(self.table.id)
+
+        user3 = TestUser("Test Player 3", self.server)
+        user3.perspective_open_table(self.table.id)
+        self.assertEquals(self.table.state_snapshot().sequence,
+            user3.states[self.table.id].sequence)
+
+        user = self.find_user_with_pending_actions()
+        user.act_randomly(self.table.id)
+        self.assert_states_equal(self.table.state_snapshot(),
+            user3.states[self.table.id])
+
+    def test_snapshot(self):
+        self.user1_table.view_sit(self.user1, 0)
+        snapshot = loads(self.user1_table.view_snapshot(self.user1))
+        self.assert_states_equal(self.table.state_snapshot(), snapshot)
+
+    def test_delta_smaller_than_state(self):
+        self.user1_table.view_sit(self.user1, 0)
+        self.user2_table.view_sit(self.user2, 1)
+        self.user1_table.view_start_game(self.user1)
+        self.user1.act_randomly(self.table.id)
+        self.user2.act_randomly(self.table.id)
+
+        delta = self.user1.events[-1].state_delta
+        self.assertTrue(len(dumps(delta)) <
+            len(dumps(TableState(self.table))))
+
+    def play_hand(self):
+        self.user1_table.view_sit(self.user1, 0)
+        self.user2_table.view_sit(self.user2, 1)
+        self.user1_table.view_start_game(self.user1)
+        self.user1.act_randomly(self.table.id)
+        self.user2.act_randomly(self.table.id)
+        while self.table.hand_underway():
+            user = self.find_user_with_pending_actions()
+            user.act_randomly(self.table.id)
+
+    def test_binary_wire_format(self):
+        self.user1.perspective_set_wire_format(BINARY)
+        self.play_hand()
+
+        self.assert_states_equal(self.table.state_snapshot(),
+            self.user1.states[self.table.id])
+        # Same events as the cerealizer user, hole cards aside:
+        self.assertEquals(self.event_contents(self.user2.events),
+            self.event_contents(self.user1.events))
+
+    def event_contents(self, events):
+        contents = []
+        for event in events:
+            if isinstance(event, HoleCardsDealt):
+                continue
+            attributes = event.__dict__.copy()
+            del attributes['state_delta']
+            contents.append((event.__class__,
+                             repr(sorted(attributes.items()))))
+        return contents
+
+    def test_mixed_wire_formats(self):
+        self.user1.perspective_set_wire_format(BINARY)
+        self.user1_table.view_sit(self.user1, 0)
+
+        # One serialization per format in use:
+        for wire_format in (BINARY, CEREALIZER):
+            counter = self.server.event_counters[wire_format][
+                'PlayerJoinedTable']
+            self.assertEquals(1, counter.events)
+            self.assertEquals(1, counter.recipients)
+        self.assertTrue(len(self.user1.serialized_events[-1]) <
+            len(self.user2.serialized_events[-1]))
+
+    def test_names_sent_once(self):
+        self.user1.perspective_set_wire_format(BINARY)
+        self.play_hand()
+
+        names = {}
+        for sent in self.user1.sent_names:
+            for name_id, name in sent.items():
+                self.assertFalse(name_id in names)
+                names[name_id] = name
+        self.assertEquals(sorted([self.user1.username, self.user2.username]),
+            sorted(names.values()))
+
+        # Cerealizer users are sent the names in full:
+        self.assertEquals([], self.user2.sent_names)
+
+    def test_binary_snapshot(self):
+        self.user1.perspective_set_wire_format(BINARY)
+        self.user1_table.view_sit(self.user1, 0)
+        snapshot = self.user1.codec.loads(
+            self.user1_table.view_snapshot(self.user1))
+        self.assert_states_equal(self.table.state_snapshot(), snapshot)
+
+    def test_unknown_wire_format(self):
+        self.assertRaises(RounderException,
+            self.user1.perspective_set_wire_format, "xml")
+        self.assertEquals(CEREALIZER, self.user1.wire_format)
+
+
+class FakeMind(object):
+
+    """ Stands in for a client's remote reference, recording calls. """
+
+    def __init__(self):
+        self.calls = []
+
+    def callRemote(self, name, *args):
+        self.calls.append((name, args))
+        return defer.succeed(None)
+
+
+class OutboundQueueTests(BaseServerFixture):
+
+    """ Tests for batching the events sent to each user. """
+
+    def setUp(self):
+        BaseServerFixture.setUp(self)
+        self.clock = task.Clock()
+        self.mind = FakeMind()
+        self.user1.clock = self.clock
+        self.user1.attached(self.mind)
+
+    def test_events_batched(self):
+        self.user1_table.view_sit(self.user1, 0)
+        self.user2_table.view_sit(self.user2, 1)
+        self.assertEquals([], self.mind.calls)
+
+        self.clock.advance(0)
+        expected = [(self.table.id, event)
+                    for event in self.user1.serialized_events]
+        self.assertEquals(2, len(expected))
+        self.assertEquals([("notify_many", (expected, ))], self.mind.calls)
+        self.assertEquals([], self.user1.outbound.events)
+
+    def test_batch_per_tick(self):
+        self.user1_table.view_sit(self.user1, 0)
+        self.clock.advance(0)
+        self.user2_table.view_sit(self.user2, 1)
+        self.clock.advance(0)
+        self.assertEquals(["notify_many", "notify_many"],
+            [name for name, args in self.mind.calls])
+
+    def test_prompt_sends_events_first(self):
+        self.user1_table.view_sit(self.user1, 0)
+        # TestUser keeps prompts to itself, go around it:
+        User.prompt(self.user1, self.table.id, ["action"])
+        self.assertEquals(["notify_many", "prompt"],
+            [name for name, args in self.mind.calls])
+
+        # Nothing is left to send:
+        self.clock.advance(0)
+        self.assertEquals(2, len(self.mind.calls))
+
+    def test_detached(self):
+        self.user1_table.view_sit(self.user1, 0)
+        self.user1.detached(self.mind)
+        self.clock.advance(0)
+        self.assertEquals([], self.mind.calls)
+        self.assertEquals([], self.clock.getDelayedCalls())
+
+
+class FakeTransport(object):
+
+    def __init__(self):
+        self.producer = None
+        self.lost = False
+
+    def registerProducer(self, producer, streaming):
+        if self.producer is not None:
+            raise RuntimeError("Producer already registered")
+        self.producer = producer
+
+    def unregisterProducer(self):
+        self.producer = None
+
+    def loseConnection(self):
+        self.lost = True
+
+
+class BareTransport(object):
+
+    """ Transport that takes no producers. """
+
+    def __init__(self):
+        self.lost = False
+
+    def loseConnection(self):
+        self.lost = True
+
+
+class FakeBroker(object):
+
+    def __init__(self, transport=None):
+        if transport is None:
+            transport = FakeTransport()
+        self.transport = transport
+
+
+class StalledMind(object):
+
+    """ Remote reference of a client that never answers. """
+
+    def __init__(self, transport=None):
+        self.calls = []
+        self.deferreds = []
+        self.broker = FakeBroker(transport)
+
+    def callRemote(self, name, *args):
+        self.calls.append((name, args))
+        d = defer.Deferred()
+        self.deferreds.append(d)
+        return d
+
+    def answer_all(self):
+        deferreds = self.deferreds
+        self.deferreds = []
+        for d in deferreds:
+            d.callback(None)
+
+
+class SendQueueLimitTests(BaseServerFixture):
+
+    """ Tests for holding back events from clients who fall behind. """
+
+    LIMITS = {
+        'HIGH_WATER_MESSAGES': 3,
+        'LOW_WATER_MESSAGES': 0,
+        'HIGH_WATER_BYTES': 100000,
+    }
+
+    def setUp(self):
+        BaseServerFixture.setUp(self)
+        self.saved_limits = {}
+        for name, value in self.LIMITS.items():
+            self.saved_limits[name] = getattr(network_server, name)
+            setattr(network_server, name, value)
+
+        self.clock = task.Clock()
+        self.observer = TestUser("Observer", self.server)
+        self.observer.perspective_open_table(self.table.id)
+        self.observer.clock = self.clock
+        self.observer_mind = StalledMind()
+        self.observer.attached(self.observer_mind)
+
+        self.user1.clock = self.clock
+        self.player_mind = StalledMind()
+        self.user1.attached(self.player_mind)
+        self.user1_table.view_sit(self.user1, 0)
+        self.user2_table.view_sit(self.user2, 1)
+        self.clock.advance(0)
+
+    def tearDown(self):
+        for name, value in self.saved_limits.items():
+            setattr(network_server, name, value)
+
+    def chat(self, count):
+        for i in range(count):
+            self.table.chat_message(self.user2.username, "message %d" % i)
+
+    def sent_events(self, mind):
+        sent = []
+        for name, args in mind.calls:
+            if name == "notify_many":
+                sent.extend(args[0])
+        return sent
+
+    def test_observer_events_dropped(self):
+        # Two events sent and unanswered, three more puts it over:
+        self.chat(3)
+        self.clock.advance(0)
+        queue = self.observer.outbound
+        self.assertTrue(queue.over_limit)
+        self.assertEquals(3, queue.dropped)
+        self.assertEquals([], queue.events)
+        self.assertEquals(2, len(self.sent_events(self.observer_mind)))
+
+        # Further events are dropped as they come:
+        self.chat(1)
+        self.assertEquals(4, queue.dropped)
+        self.assertEquals([], queue.events)
+
+    def test_catch_up(self):
+        self.chat(3)
+        self.clock.advance(0)
+        self.observer_mind.answer_all()
+        self.clock.advance(network_server.RETRY_SECONDS)
+        queue = self.observer.outbound
+        self.assertFalse(queue.over_limit)
+        self.assertEquals(0, queue.unanswered)
+
+        self.chat(1)
+        self.clock.advance(0)
+        self.assertEquals(3, len(self.sent_events(self.observer_mind)))
+
+    def test_player_events_held(self):
+        self.chat(3)
+        self.clock.advance(0)
+        queue = self.user1.outbound
+        self.assertTrue(queue.over_limit)
+        self.assertEquals(0, queue.dropped)
+        self.assertEquals(3, len(queue.events))
+        self.assertEquals(2, len(self.sent_events(self.player_mind)))
+
+        # Everything goes out in order once the client catches up:
+        self.player_mind.answer_all()
+        self.clock.advance(network_server.RETRY_SECONDS)
+        self.assertEquals(self.user1.serialized_events,
+            [event for table_id, event in
+             self.sent_events(self.player_mind)])
+
+    def test_write_buffer_full(self):
+        self.player_mind.answer_all()
+        transport = self.player_mind.broker.transport
+        self.assertTrue(transport.producer is self.user1.write_buffer)
+
+        # The transport pauses its producer once its buffer fills up:
+        transport.producer.pauseProducing()
+        self.chat(1)
+        self.clock.advance(0)
+        self.assertTrue(self.user1.outbound.over_limit)
+        self.assertEquals(1, len(self.user1.outbound.events))
+
+        # Still full:
+        self.clock.advance(network_server.RETRY_SECONDS)
+        self.assertTrue(self.user1.outbound.over_limit)
+
+        # And resumes it once the buffer has drained:
+        transport.producer.resumeProducing()
+        self.clock.advance(network_server.RETRY_SECONDS)
+        self.assertFalse(self.user1.outbound.over_limit)
+        self.assertEquals([], self.user1.outbound.events)
+
+    def test_write_buffer_unwatched(self):
+        # Without a producer the backlog is measured on messages alone:
+        user = TestUser("Unwatched", self.server)
+        user.clock = self.clock
+        mind = StalledMind(BareTransport())
+        user.attached(mind)
+        self.assertTrue(user.write_buffer.transport is None)
+        self.assertFalse(user.check_backlog())
+
+        for i in range(network_server.HIGH_WATER_MESSAGES + 1):
+            user.outbound.add(self.table.id, "event", False)
+        self.assertTrue(user.check_backlog())
+
+    def test_write_buffer_producer_taken(self):
+        transport = FakeTransport()
+        transport.registerProducer(object(), True)
+        user = TestUser("Unwatched", self.server)
+        user.attached(StalledMind(transport))
+        self.assertTrue(user.write_buffer.transport is None)
+        self.assertFalse(user.check_backlog())
+
+    def test_write_buffer_unregistered(self):
+        transport = self.player_mind.broker.transport
+        self.user1.detached(self.player_mind)
+        self.assertEquals(None, transport.producer)
+
+    def test_write_buffer_connection_lost(self):
+        self.user1.write_buffer.pauseProducing()
+        self.user1.write_buffer.stopProducing()
+        self.assertFalse(self.user1.write_buffer.paused)
+        # Nothing left to unregister from:
+        self.user1.write_buffer.unregister()
+
+    def test_prompt_sent_over_limit(self):
+        self.chat(3)
+        self.clock.advance(0)
+        self.assertTrue(self.user1.outbound.over_limit)
+        User.prompt(self.user1, self.table.id, ["action"])
+        self.assertEquals("prompt", self.player_mind.calls[-1][0])
+        self.assertEquals(5, len(self.sent_events(self.player_mind)))
+
+    def test_slow_player_sat_out(self):
+        self.chat(3)
+        self.clock.advance(0)
+        player = self.table.seats.players_by_username[self.user1.username]
+        self.clock.pump([network_server.RETRY_SECONDS] *
+            int(network_server.SIT_OUT_SECONDS /
+                network_server.RETRY_SECONDS))
+        self.assertTrue(player.sitting_out)
+        self.assertFalse(self.player_mind.broker.transport.lost)
+
+        self.clock.pump([network_server.RETRY_SECONDS] *
+            int((network_server.DISCONNECT_SECONDS -
+                 network_server.SIT_OUT_SECONDS) /
+                network_server.RETRY_SECONDS))
+        self.assertTrue(self.player_mind.broker.transport.lost)
+        self.assertEquals(None, self.player_mind.broker.transport.producer)
+
+    def test_queue_depths(self):
+        self.chat(3)
+        self.clock.advance(0)
+        depths = self.server.queue_depths()
+        self.assertTrue(depths[self.user1.username] is self.user1.outbound)
+        self.assertEquals(5, depths[self.user1.username].peak_messages)
+        self.assertEquals(1, depths[self.user1.username].calls)
+        repr(depths[self.user1.username])
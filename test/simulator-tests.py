@@ -0,0 +1,103 @@
+#   Rounder - Poker for the GNOME Desktop
+#
+#   Copyright (C) 2006 Devan Goodwin <dgoodwin@dangerouslyinc.com>
+#   Copyright (C) 2006 James Bowes <jbowes@dangerouslyinc.com>
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+#   02110-1301  USA
+
+""" Tests for the rounder.simulator module. """
+
+import random
+import unittest
+
+from rounder.action import Call, Fold, Raise
+from rounder.core import RounderException
+from rounder.currency import Currency
+from rounder.game import OmahaGame
+from rounder.simulator import Simulator, always_call, random_strategy
+
+
+def random_strategies(count, seed):
+    return [random_strategy(random.Random(seed + seat))
+            for seat in range(count)]
+
+
+class SimulatorTests(unittest.TestCase):
+
+    def test_chips_conserved(self):
+        simulator = Simulator(random_strategies(6, 0),
+                              rand=random.Random(0))
+        for i in range(50):
+            results = simulator.play_hand()
+            self.assertEquals(Currency(0), sum(results, Currency(0)))
+        self.assertEquals(50, simulator.hands)
+        self.assertEquals(Currency(0), sum(simulator.winnings, Currency(0)))
+
+    def test_repeatable(self):
+        results = []
+        for i in range(2):
+            simulator = Simulator(random_strategies(4, 10),
+                                  rand=random.Random(3))
+            simulator.run(20)
+            results.append(simulator.winnings)
+        self.assertEquals(results[0], results[1])
+
+    def test_strategy_prompted(self):
+        prompts = []
+
+        def strategy(game, player, actions):
+            prompts.append((player.seat, actions))
+            return always_call(game, player, actions)
+
+        simulator = Simulator([strategy, strategy], rand=random.Random(1))
+        simulator.play_hand()
+
+        # Heads up calling down, both players act on every street:
+        self.assertEquals(8, len(prompts))
+        for seat, actions in prompts:
+            self.assertEquals([Raise, Call, Fold],
+                              [action.__class__ for action in actions])
+
+        # The button moves:
+        self.assertEquals(1, simulator.dealer_index)
+
+    def test_fold_to_blind(self):
+        def fold(game, player, actions):
+            return actions[-1]
+
+        simulator = Simulator([fold, always_call], rand=random.Random(1))
+        # Heads up the button posts the small blind and folds it:
+        self.assertEquals([Currency(-1), Currency(1)],
+                          simulator.play_hand())
+
+    def test_short_stacks(self):
+        simulator = Simulator(random_strategies(5, 20),
+            stacks=[Currency(3), Currency(7), Currency('2.50'),
+                    Currency(1000), Currency(12)],
+            rand=random.Random(2))
+        for i in range(40):
+            results = simulator.play_hand()
+            self.assertEquals(Currency(0), sum(results, Currency(0)))
+
+    def test_omaha(self):
+        simulator = Simulator(random_strategies(4, 30),
+                              game_class=OmahaGame, rand=random.Random(4))
+        simulator.run(20)
+        self.assertEquals(Currency(0), sum(simulator.winnings, Currency(0)))
+        self.assertTrue(simulator.hands_per_sec > 0)
+
+    def test_one_strategy(self):
+        self.assertRaises(RounderException, Simulator, [always_call])
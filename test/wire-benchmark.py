@@ -0,0 +1,210 @@
+#   Rounder - Poker for the GNOME Desktop
+#
+#   Copyright (C) 2009 Devan Goodwin <dgoodwin@dangerouslyinc.com>
+#   Copyright (C) 2009 James Bowes <jbowes@dangerouslyinc.com>
+#
+#   This program is free software; you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation; either version 2 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program; if not, write to the Free Software
+#   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+#   02110-1301  USA
+
+"""
+Wire format benchmark.
+
+Plays fixed seed hands through a server with no network underneath,
+recording every message the server sends: events, with the number of users
+each went to, and prompts. Each wire format then encodes and decodes the
+recorded hands. Reports messages per second both ways and bytes sent per
+hand, counting every recipient. Not part of the test suite, run it
+directly:
+
+    PYTHONPATH=src python test/wire-benchmark.py -o results.json
+"""
+
+import random
+from optparse import OptionParser
+
+import settestpath
+
+from rounder.action import PostBlind, Raise
+from rounder.network.codec import WIRE_FORMATS, BinaryCodec, NameTable, \
+        new_codec
+from rounder.network.serialize import loads, register_message_classes
+from rounder.network.server import RounderNetworkServer, User
+from rounder.simulator import random_strategy
+
+from benchutils import measure, print_result, write_results
+
+
+class RecordingServer(RounderNetworkServer):
+
+    """ Server keeping every message it sends, and to how many users. """
+
+    def __init__(self):
+        RounderNetworkServer.__init__(self)
+        self.messages = []
+
+    def notify(self, table_id, username, event):
+        self.messages.append((event, 1))
+        RounderNetworkServer.notify(self, table_id, username, event)
+
+    def broadcast(self, table_id, usernames, event):
+        if usernames:
+            self.messages.append((event, len(usernames)))
+        RounderNetworkServer.broadcast(self, table_id, usernames, event)
+
+    def prompt_player(self, table, username, actions):
+        for action in actions:
+            self.messages.append((action, 1))
+        RounderNetworkServer.prompt_player(self, table, username, actions)
+
+
+class BenchUser(User):
+
+    """ User acting on its prompts with the random bot strategy. """
+
+    def __init__(self, username, server, rand):
+        User.__init__(self, username, server)
+        self.strategy = random_strategy(rand)
+        self.pending_actions = []
+
+    def prompt(self, table_id, serialized_actions):
+        self.pending_actions = [loads(action) for action in
+                                serialized_actions]
+
+    def act(self, table):
+        actions = self.pending_actions
+        self.pending_actions = []
+        if isinstance(actions[0], PostBlind):
+            # Always post the blinds:
+            action = actions[0]
+        else:
+            action = self.strategy(None, None, actions)
+        params = []
+        if isinstance(action, Raise):
+            params.append(str(action.min_bet))
+        self.server.process_action(table, self, actions.index(action),
+                                   params)
+
+
+def record_hands(seed, hands, players, observers):
+    """
+    Play hands at one table and return the server, and the messages it
+    sent during each hand.
+    """
+    random.seed(seed)
+    rand = random.Random(seed)
+    server = RecordingServer()
+    table = server.create_table("Benchmark")
+    view = server.table_views[table.id]
+
+    users = [BenchUser("player%d" % i, server, rand) for i in range(players)]
+    users.extend([BenchUser("observer%d" % i, server, rand)
+                  for i in range(observers)])
+    for user in users:
+        user.perspective_open_table(table.id)
+    for seat, user in enumerate(users[:players]):
+        view.view_sit(user, seat)
+
+    recorded = []
+    for i in range(hands):
+        server.messages = []
+        view.view_start_game(users[0])
+        # Blinds are posted before the hand is underway:
+        while True:
+            acting = [user for user in users if user.pending_actions]
+            if not acting:
+                break
+            acting[0].act(table)
+        if table.hand_underway():
+            raise Exception("Hand stopped with no one to act")
+        recorded.append(server.messages)
+    return server, recorded
+
+
+def encode_call(codec, messages):
+    def call():
+        for obj, recipients in messages:
+            codec.encode(obj)
+    return call
+
+
+def decode_call(codec, encoded):
+    def call():
+        for data in encoded:
+            codec.loads(data)
+    return call
+
+
+def main():
+    parser = OptionParser()
+    parser.add_option("-s", "--seed", dest="seed", default=1234, type="int",
+        help="random seed for the cards and actions (default: 1234)")
+    parser.add_option("-n", "--hands", dest="hands", default=200,
+        type="int", help="hands to play (default: 200)")
+    parser.add_option("-p", "--players", dest="players", default=6,
+        type="int", help="players at the table (default: 6)")
+    parser.add_option("-b", "--observers", dest="observers", default=4,
+        type="int", help="users watching the table (default: 4)")
+    parser.add_option("-o", "--output", dest="output",
+        default="wire-benchmark.json",
+        help="results file (default: wire-benchmark.json)")
+    (options, args) = parser.parse_args()
+
+    register_message_classes()
+    server, hands = record_hands(options.seed, options.hands,
+                                 options.players, options.observers)
+    messages_per_hand = float(sum([len(messages) for messages in hands])) \
+            / len(hands)
+
+    results = []
+    for wire_format in WIRE_FORMATS:
+        codec = new_codec(wire_format, NameTable())
+        encoded = []
+        bytes_sent = 0
+        for messages in hands:
+            hand_encoded = []
+            for obj, recipients in messages:
+                data = codec.encode(obj)[0]
+                hand_encoded.append(data)
+                bytes_sent += len(data) * recipients
+            encoded.append(hand_encoded)
+        bytes_per_hand = float(bytes_sent) / len(hands)
+
+        # Clients decode with names learned from the server:
+        decoder = new_codec(wire_format)
+        if isinstance(codec, BinaryCodec):
+            decoder.names.define(codec.names.names)
+
+        for direction, calls in (
+                ('encode', [encode_call(codec, messages)
+                            for messages in hands]),
+                ('decode', [decode_call(decoder, hand_encoded)
+                            for hand_encoded in encoded])):
+            name = "%s %s" % (wire_format, direction)
+            result = measure(name, calls, units_per_call=messages_per_hand,
+                             wire_format=wire_format, direction=direction,
+                             messages_per_hand=messages_per_hand,
+                             bytes_per_hand=bytes_per_hand)
+            print_result(result, units="msgs")
+            results.append(result)
+        print "%-40s %10.0f bytes/hand" % (wire_format, bytes_per_hand)
+
+    write_results(options.output, results, seed=options.seed,
+                  hands=options.hands, players=options.players,
+                  observers=options.observers)
+    print "wrote %s" % options.output
+
+
+if __name__ == "__main__":
+    main()